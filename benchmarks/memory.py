@@ -0,0 +1,55 @@
+"""实例清单内存基准测试: 对比完整dict与字段投影后的__slots__记录
+用法: python -m ali_api.benchmarks.memory [实例数]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+from ..records import project
+
+FIELDS = ['InstanceId', 'InstanceName', 'Status', 'ZoneId', 'private_ip=VpcAttributes.PrivateIpAddress.IpAddress.0']
+
+
+def instance(i):
+    """模拟DescribeInstances返回的单个实例"""
+    return {
+        'InstanceId': 'i-%016x' % i, 'InstanceName': 'worker-%05d' % i, 'Status': 'Running',
+        'RegionId': 'ap-south-1', 'ZoneId': 'ap-south-1a', 'InstanceType': 'ecs.g6.large',
+        'InstanceTypeFamily': 'ecs.g6', 'Cpu': 2, 'Memory': 8192, 'ImageId': 'ubuntu_20_04_x64_20G_alibase_20210420.vhd',
+        'OSName': 'Ubuntu  20.04 64位', 'OSType': 'linux', 'CreationTime': '2021-05-01T08:00Z',
+        'ExpiredTime': '2099-12-31T15:59Z', 'InternetChargeType': 'PayByTraffic', 'InstanceChargeType': 'PostPaid',
+        'SpotStrategy': 'SpotAsPriceGo', 'SecurityGroupIds': {'SecurityGroupId': ['sg-%012x' % (i % 7)]},
+        'VpcAttributes': {'VpcId': 'vpc-0001', 'VSwitchId': 'vsw-%04d' % (i % 16), 'NatIpAddress': '',
+                          'PrivateIpAddress': {'IpAddress': ['10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255)]}},
+        'EipAddress': {'AllocationId': '', 'IpAddress': '', 'InternetChargeType': ''},
+        'PublicIpAddress': {'IpAddress': []}, 'InnerIpAddress': {'IpAddress': []},
+        'NetworkInterfaces': {'NetworkInterface': [{'NetworkInterfaceId': 'eni-%012x' % i, 'MacAddress': '00:16:3e:00:00:00',
+                                                    'PrimaryIpAddress': '10.0.0.1', 'Type': 'Primary'}]},
+        'OperationLocks': {'LockReason': []}, 'Tags': {'Tag': [{'TagKey': 'env', 'TagValue': 'prod'}]},
+        'DedicatedHostAttribute': {}, 'EcsCapacityReservationAttr': {}, 'HibernationOptions': {'Configured': False},
+    }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return data, size
+
+
+def main(count=20000):
+    # json往返, 使每条记录为独立对象, 与接口返回一致
+    raw = lambda: json.loads(json.dumps([instance(i) for i in range(count)]))
+    dicts, dict_size = measure(raw)
+    del dicts
+    records, record_size = measure(lambda: project(raw(), FIELDS))
+    print('instances : %d' % count)
+    print('dict      : %8.1f MiB' % (dict_size / 2 ** 20))
+    print('records   : %8.1f MiB (%s)' % (record_size / 2 ** 20, ', '.join(records[0]._fields)))
+    print('ratio     : %.1fx' % (dict_size / record_size))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,62 @@
+"""client池基准测试
+tea core 按 协议://host:port 在进程内复用 requests Session, 是否复用sdk client都不会新建tcp连接;
+ClientPool 省下的是每次调用新建sdk client的开销(Config复制, endpoint解析, 凭证client初始化), 分两项测量:
+    1. 新建一个client 与 从池中取出并归还一个client 的耗时
+    2. 每次调用新建client(改造前的做法) 与 复用池中client 的每秒调用数, 两种方式各用一个StubServer, 分别统计连接数
+用法: python -m ali_api.benchmarks.pool [调用次数]
+"""
+import sys
+import time
+from ..client import ClientPool
+from ..ecs import ECS
+from .server import StubServer
+
+RESPONSES = {
+    'DescribeInstances': {'TotalCount': 0, 'PageNumber': 1, 'PageSize': 100, 'Instances': {'Instance': []}},
+}
+
+
+def per_client(endpoint, calls):
+    """(新建client的微秒数, 池中取还client的微秒数)"""
+    ecs = ECS('ak', 'sk', endpoint, pool=ClientPool(), protocol='http')
+    start = time.perf_counter()
+    for _ in range(calls):
+        ecs._new_client()
+    construct = (time.perf_counter() - start) / calls * 1e6
+    pool = ecs.pool
+    pool.release(ecs._key, ecs._new_client())
+    start = time.perf_counter()
+    for _ in range(calls):
+        pool.release(ecs._key, pool.acquire(ecs._key, ecs._new_client))
+    reuse = (time.perf_counter() - start) / calls * 1e6
+    return construct, reuse
+
+
+def calls_per_second(pool, calls):
+    """在独立的StubServer上调用DescribeInstances, 返回 (每秒调用数, 新建的client数, 连接数)"""
+    with StubServer(RESPONSES) as server:
+        ecs = ECS('ak', 'sk', server.endpoint, pool=pool, protocol='http')
+        ecs.get('cn-local')  # 预热, 建立连接
+        misses = pool.misses
+        start = time.perf_counter()
+        for _ in range(calls):
+            ecs.get('cn-local')
+        rate = calls / (time.perf_counter() - start)
+        return rate, pool.misses - misses, server.connections
+
+
+def main(calls=500):
+    with StubServer(RESPONSES) as server:
+        construct, reuse = per_client(server.endpoint, calls)
+    print('new client    : %8.1f us' % construct)
+    print('pooled client : %8.1f us' % reuse)
+    # max_size=0 时client用完即丢弃, 每次调用新建client, 与改造前一致
+    before, created, before_conns = calls_per_second(ClientPool(max_size=0), calls)
+    after, reused, after_conns = calls_per_second(ClientPool(), calls)
+    print('no pool : %8.1f calls/s, %d clients created, %d connections' % (before, created, before_conns))
+    print('pooled  : %8.1f calls/s, %d clients created, %d connections' % (after, reused, after_conns))
+    print('speedup : %.2fx' % (after / before))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,75 @@
+"""响应解析的CPU基准测试: 对比sdk模型路径与raw模式
+sdk路径: json解析 -> 响应模型from_map -> to_map; raw模式: 一次json解析(安装了orjson时使用orjson)
+用法: python -m ali_api.benchmarks.raw [每页记录数] [重复次数]
+"""
+import json
+import sys
+import time
+from ..client import RawResponse
+from ..paginate import dig
+from ..utils import LazyModule
+from .memory import instance
+
+ecs_models = LazyModule('alibabacloud_ecs20140526.models')
+vpc_models = LazyModule('alibabacloud_vpc20160428.models')
+
+
+def eip(i):
+    return {'AllocationId': 'eip-%012x' % i, 'IpAddress': '47.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255),
+            'Status': 'InUse', 'RegionId': 'ap-south-1', 'Bandwidth': '5', 'InstanceId': 'ngw-%08x' % (i % 4),
+            'InstanceType': 'Nat', 'ChargeType': 'PostPaid', 'InternetChargeType': 'PayByTraffic', 'ISP': 'BGP',
+            'AllocationTime': '2021-05-01T08:00:00Z', 'Name': 'eip-%d' % i, 'Descritpion': '',
+            'OperationLocks': {'LockReason': []}, 'Tags': {'Tag': [{'Key': 'env', 'Value': 'prod'}]}}
+
+
+def forward_entry(i):
+    return {'ForwardEntryId': 'fwd-%012x' % i, 'ForwardTableId': 'ftb-0001', 'ExternalIp': '47.0.0.1',
+            'ExternalPort': str(2000 + i), 'InternalIp': '10.0.%d.%d' % (i >> 8 & 255, i & 255), 'InternalPort': '22',
+            'IpProtocol': 'TCP', 'Status': 'Available', 'ForwardEntryName': 'ssh-%d' % i}
+
+
+# 接口 -> (sdk响应模型, 结果列表路径, 记录生成函数)
+CASES = {
+    'DescribeInstances': (lambda: ecs_models.DescribeInstancesResponse(), 'Instances.Instance', instance),
+    'DescribeEipAddresses': (lambda: vpc_models.DescribeEipAddressesResponse(), 'EipAddresses.EipAddress', eip),
+    'DescribeForwardTableEntries': (lambda: vpc_models.DescribeForwardTableEntriesResponse(),
+                                    'ForwardTableEntries.ForwardTableEntry', forward_entry),
+}
+
+
+def payload(path, make, count):
+    outer, inner = path.split('.')
+    body = {'RequestId': 'bench', 'TotalCount': count, 'PageNumber': 1, 'PageSize': count, outer: {inner: [make(i) for i in range(count)]}}
+    return json.dumps(body)
+
+
+def model_path(response, text):
+    # 与sdk一致: 解析响应文本后构建模型, wrapper中再调用to_map()
+    res = response().from_map({'headers': {}, 'statusCode': 200, 'body': json.loads(text)})
+    return res.to_map()['body']
+
+
+def raw_path(text):
+    return RawResponse({'headers': {}, 'statusCode': 200, 'body': text}).to_map()['body']
+
+
+def cpu_time(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat
+
+
+def main(count=100, repeat=200):
+    print('%-28s %12s %12s %8s' % ('action (%d records)' % count, 'sdk ms', 'raw ms', 'speedup'))
+    for action, (response, path, make) in CASES.items():
+        text = payload(path, make, count)
+        # sdk模型会丢弃未定义的字段, 只校验记录数一致
+        assert len(dig(model_path(response, text), path)) == len(dig(raw_path(text), path)) == count
+        sdk = cpu_time(lambda: model_path(response, text), repeat)
+        raw = cpu_time(lambda: raw_path(text), repeat)
+        print('%-28s %12.3f %12.3f %7.1fx' % (action, sdk * 1000, raw * 1000, sdk / raw))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
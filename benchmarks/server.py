@@ -0,0 +1,318 @@
+"""本地模拟的阿里云OpenAPI endpoint, 用于基准测试
+StubServer 按Action返回固定响应; FakeCloud 模拟ECS, VPC, SLB常用接口,
+支持分页, 延迟, 限流和失败注入:
+    with FakeCloud(instances=1000, latency=(0.005, 0.02), throttle=0.01) as cloud:
+        ecs = ECS('ak', 'sk', cloud.endpoint, protocol='http')
+        list(ecs.iter_instances('cn-local'))
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 保持长连接
+    # 响应头和body分两次写入, 开启Nagle时与客户端的延迟ack叠加, 每个请求多出约40ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._reply(dict(parse_qsl(urlsplit(self.path).query)))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        params.update(parse_qsl(body))
+        self._reply(params)
+
+    def _reply(self, params):
+        server = self.server.owner
+        with server.lock:
+            server.clients.add(self.client_address)
+            server.calls += 1
+            action = params.get('Action')
+            server.actions[action] = server.actions.get(action, 0) + 1
+        status, data = server.handle(action, params)
+        data['RequestId'] = str(uuid.uuid4())
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """按Action返回固定响应的http服务
+    responses: {'DescribeInstances': {...}}
+    """
+    def __init__(self, responses=None, host='127.0.0.1', port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self.responses = responses or {}
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.actions = {}
+        self.clients = set()
+        self._thread = None
+
+    def handle(self, action, params):
+        """返回 (http状态码, 响应body)"""
+        return 200, dict(self.responses.get(action, {}))
+
+    @property
+    def endpoint(self):
+        host, port = self.httpd.server_address[:2]
+        return '%s:%s' % (host, port)
+
+    @property
+    def connections(self):
+        # 不同的客户端地址数, 约等于建立过的tcp连接数
+        return len(self.clients)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def _error(status, code, message):
+    return status, {'Code': code, 'Message': message}
+
+
+def _ids(params, name):
+    # InstanceIds='["i-1"]' 或 InstanceId.1=i-1 形式的id列表
+    if name + 's' in params:
+        return set(json.loads(params[name + 's']))
+    prefix = name + '.'
+    return {v for k, v in params.items() if k.startswith(prefix)} or None
+
+
+# Describe接口 -> (资源类型, 结果列表路径, 最大分页大小)
+COLLECTIONS = {
+    'DescribeInstances': ('instances', 'Instances.Instance', 100),
+    'DescribeInstanceStatus': ('instances', 'InstanceStatuses.InstanceStatus', 50),
+    'DescribeSecurityGroups': ('security_groups', 'SecurityGroups.SecurityGroup', 50),
+    'DescribeVpcs': ('vpcs', 'Vpcs.Vpc', 50),
+    'DescribeVSwitches': ('vswitches', 'VSwitches.VSwitch', 50),
+    'DescribeNatGateways': ('nat_gateways', 'NatGateways.NatGateway', 50),
+    'DescribeEipAddresses': ('eips', 'EipAddresses.EipAddress', 100),
+    'DescribeForwardTableEntries': ('forward_entries', 'ForwardTableEntries.ForwardTableEntry', 50),
+    'DescribeLoadBalancers': ('load_balancers', 'LoadBalancers.LoadBalancer', 100),
+}
+
+
+class FakeCloud(StubServer):
+    """模拟ECS, VPC, SLB常用接口的http服务, 资源保存在内存中
+    latency: 每次请求的延迟秒数, 或 (最小, 最大) 均匀分布; latencies 按Action覆盖
+    throttle: 随机返回Throttling.User的概率; qps: 每秒最多处理的请求数, 超出的返回Throttling.User
+    failures: 随机返回InternalError的概率; fail: {Action: 概率} 按接口注入失败
+    instances, eips, load_balancers, forward_entries: 预置的资源数量
+    seed: 随机数种子, 相同参数下注入的错误可复现
+    未模拟的接口返回responses中的固定响应
+    """
+    def __init__(self, instances=100, eips=20, load_balancers=10, forward_entries=0, latency=0, latencies=None,
+                 throttle=0.0, qps=None, failures=0.0, fail=None, seed=0, responses=None, **kwargs):
+        super().__init__(responses, **kwargs)
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.throttle = throttle
+        self.qps = qps
+        self.failures = failures
+        self.fail = fail or {}
+        self.random = random.Random(seed)
+        self.errors = {}
+        self._window = (0, 0)
+        self._serial = max(instances, eips, load_balancers)
+        self.resources = {
+            'instances': [self._instance(i) for i in range(instances)],
+            'eips': [self._eip(i) for i in range(eips)],
+            'load_balancers': [self._load_balancer(i) for i in range(load_balancers)],
+            'forward_entries': [self._forward_entry('47.0.0.1', 2000 + i, '10.0.0.%d' % (i % 250 + 1), 22) for i in range(forward_entries)],
+            'vpcs': [{'VpcId': 'vpc-local', 'VpcName': 'local', 'CidrBlock': '10.0.0.0/8', 'Status': 'Available'}],
+            'vswitches': [{'VSwitchId': 'vsw-local', 'VpcId': 'vpc-local', 'ZoneId': 'cn-local-a',
+                           'CidrBlock': '10.0.0.0/16', 'Status': 'Available'}],
+            'security_groups': [{'SecurityGroupId': 'sg-local', 'VpcId': 'vpc-local', 'SecurityGroupName': 'local'}],
+            'nat_gateways': [{'NatGatewayId': 'ngw-local', 'VpcId': 'vpc-local', 'Status': 'Available',
+                              'ForwardTableIds': {'ForwardTableId': ['ftb-local']}}],
+        }
+
+    # 预置资源
+
+    def _next(self):
+        with self.lock:
+            self._serial += 1
+            return self._serial
+
+    @staticmethod
+    def _instance(i, status='Running', **extra):
+        return dict({
+            'InstanceId': 'i-%016x' % i, 'InstanceName': 'fake-%05d' % i, 'Status': status,
+            'RegionId': 'cn-local', 'ZoneId': 'cn-local-a', 'InstanceType': 'ecs.g6.large', 'Cpu': 2, 'Memory': 8192,
+            'ImageId': 'ubuntu_20_04_x64', 'CreationTime': '2021-05-01T08:00Z',
+            'SecurityGroupIds': {'SecurityGroupId': ['sg-local']},
+            'VpcAttributes': {'VpcId': 'vpc-local', 'VSwitchId': 'vsw-local',
+                              'PrivateIpAddress': {'IpAddress': ['10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255)]}},
+            'Tags': {'Tag': [{'TagKey': 'env', 'TagValue': 'bench'}]},
+        }, **extra)
+
+    @staticmethod
+    def _eip(i):
+        return {'AllocationId': 'eip-%012x' % i, 'IpAddress': '47.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255),
+                'Status': 'Available', 'RegionId': 'cn-local', 'Bandwidth': '5', 'InstanceId': ''}
+
+    @staticmethod
+    def _load_balancer(i):
+        return {'LoadBalancerId': 'lb-%012x' % i, 'LoadBalancerName': 'fake-%d' % i, 'LoadBalancerStatus': 'active',
+                'RegionId': 'cn-local', 'VpcId': 'vpc-local', 'VSwitchId': 'vsw-local', 'MasterZoneId': 'cn-local-a',
+                'Address': '47.1.0.%d' % (i % 250)}
+
+    def _forward_entry(self, external_ip, external_port, internal_ip, internal_port, protocol='tcp'):
+        return {'ForwardEntryId': 'fwd-%012x' % self._next(),
+                'ForwardTableId': 'ftb-local', 'ExternalIp': external_ip, 'ExternalPort': str(external_port),
+                'InternalIp': internal_ip, 'InternalPort': str(internal_port), 'IpProtocol': protocol, 'Status': 'Available'}
+
+    # 请求处理
+
+    def handle(self, action, params):
+        delay = self.latencies.get(action, self.latency)
+        if isinstance(delay, (tuple, list)):
+            delay = self.random.uniform(*delay)
+        if delay:
+            time.sleep(delay)
+        error = self._inject(action)
+        if error:
+            with self.lock:
+                self.errors[error[1]['Code']] = self.errors.get(error[1]['Code'], 0) + 1
+            return error
+        method = getattr(self, '_' + action, None)
+        if method is not None:
+            return method(params)
+        if action in COLLECTIONS:
+            return self._describe(action, params)
+        return super().handle(action, params)
+
+    def _inject(self, action):
+        with self.lock:
+            if self.qps:
+                second = int(time.monotonic())
+                start, count = self._window
+                self._window = (second, count + 1) if start == second else (second, 1)
+                if self._window[1] > self.qps:
+                    return _error(400, 'Throttling.User', 'Request was denied due to user flow control.')
+            roll = self.random.random()
+        if roll < self.throttle:
+            return _error(400, 'Throttling.User', 'Request was denied due to user flow control.')
+        if roll < self.throttle + self.fail.get(action, self.failures):
+            return _error(500, 'InternalError', 'The request processing has failed due to some unknown error.')
+        return None
+
+    def _describe(self, action, params):
+        kind, path, max_size = COLLECTIONS[action]
+        items = self.resources[kind]
+        if kind == 'instances':
+            ids = _ids(params, 'InstanceId')
+            if ids is not None:
+                items = [i for i in items if i['InstanceId'] in ids]
+            if params.get('Status'):
+                items = [i for i in items if i['Status'] == params['Status']]
+            if action == 'DescribeInstanceStatus':
+                items = [{'InstanceId': i['InstanceId'], 'Status': i['Status']} for i in items]
+        page_size = min(int(params.get('PageSize') or 10), max_size)
+        page_number = int(params.get('PageNumber') or 1)
+        page = items[(page_number - 1) * page_size:page_number * page_size]
+        outer, inner = path.split('.')
+        return 200, {'TotalCount': len(items), 'PageNumber': page_number, 'PageSize': page_size, outer: {inner: page}}
+
+    def _CreateInstance(self, params):
+        instance = self._instance(self._next(), 'Stopped', InstanceName=params.get('InstanceName', ''),
+                                  InstanceType=params.get('InstanceType', 'ecs.g6.large'))
+        with self.lock:
+            self.resources['instances'].append(instance)
+        return 200, {'InstanceId': instance['InstanceId']}
+
+    def _RunInstances(self, params):
+        amount = int(params.get('Amount') or 1)
+        if amount > 100:
+            return _error(400, 'InvalidParameter.Amount', 'The specified parameter Amount is not valid.')
+        instances = [self._instance(self._next(), 'Pending', InstanceType=params.get('InstanceType', 'ecs.g6.large'))
+                     for _ in range(amount)]
+        with self.lock:
+            self.resources['instances'].extend(instances)
+        return 200, {'InstanceIdSets': {'InstanceIdSet': [i['InstanceId'] for i in instances]}}
+
+    def _set_status(self, params, status):
+        ids = _ids(params, 'InstanceId') or set()
+        responses = []
+        for instance in self.resources['instances']:
+            if instance['InstanceId'] in ids:
+                responses.append({'InstanceId': instance['InstanceId'], 'Code': '200', 'Message': 'success',
+                                  'PreviousStatus': instance['Status'], 'CurrentStatus': status})
+                instance['Status'] = status
+        return 200, {'InstanceResponses': {'InstanceResponse': responses}}
+
+    def _StartInstances(self, params):
+        return self._set_status(params, 'Running')
+
+    def _StopInstances(self, params):
+        return self._set_status(params, 'Stopped')
+
+    def _RebootInstances(self, params):
+        return self._set_status(params, 'Running')
+
+    def _DeleteInstances(self, params):
+        ids = _ids(params, 'InstanceId') or set()
+        with self.lock:
+            self.resources['instances'] = [i for i in self.resources['instances'] if i['InstanceId'] not in ids]
+        return 200, {}
+
+    def _AllocateEipAddress(self, params):
+        eip = self._eip(self._next())
+        with self.lock:
+            self.resources['eips'].append(eip)
+        return 200, {'AllocationId': eip['AllocationId'], 'EipAddress': eip['IpAddress']}
+
+    def _CreateForwardEntry(self, params):
+        entry = self._forward_entry(params.get('ExternalIp'), params.get('ExternalPort'), params.get('InternalIp'),
+                                    params.get('InternalPort'), params.get('IpProtocol', 'tcp'))
+        key = (entry['ExternalIp'], entry['ExternalPort'], entry['IpProtocol'].lower())
+        with self.lock:
+            entries = self.resources['forward_entries']
+            if any((e['ExternalIp'], e['ExternalPort'], e['IpProtocol'].lower()) == key for e in entries):
+                return _error(400, 'Forward.EntryAlreadyExist', 'The forward entry already exists.')
+            entries.append(entry)
+        return 200, {'ForwardEntryId': entry['ForwardEntryId']}
+
+    def _ModifyForwardEntry(self, params):
+        for entry in self.resources['forward_entries']:
+            if entry['ForwardEntryId'] == params.get('ForwardEntryId'):
+                entry.update({k: params[k] for k in ('InternalIp', 'InternalPort', 'ExternalPort') if k in params})
+                return 200, {}
+        return _error(404, 'InvalidForwardEntryId.NotFound', 'The specified forward entry does not exist.')
+
+    def _DeleteForwardEntry(self, params):
+        with self.lock:
+            entries = self.resources['forward_entries']
+            self.resources['forward_entries'] = [e for e in entries if e['ForwardEntryId'] != params.get('ForwardEntryId')]
+        return 200, {}
+
+    def _DescribeHealthStatus(self, params):
+        return 200, {'BackendServers': {'BackendServer': []}}
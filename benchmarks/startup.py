@@ -0,0 +1,49 @@
+"""启动耗时基准测试, 基于 python -X importtime
+检查导入各模块时不会加载无关产品的sdk, 并输出导入耗时
+用法: python -m ali_api.benchmarks.startup [耗时上限毫秒]
+"""
+import os
+import subprocess
+import sys
+
+PACKAGE = __package__.rpartition('.')[0]
+
+# 模块 -> 导入时不应加载的sdk
+CASES = {
+    'client': ('alibabacloud_ecs20140526', 'alibabacloud_vpc20160428', 'alibabacloud_slb20140515', 'alibabacloud_tea_openapi'),
+    'vpc': ('alibabacloud_ecs20140526', 'alibabacloud_slb20140515', 'alibabacloud_vpc20160428'),
+    'ecs': ('alibabacloud_vpc20160428', 'alibabacloud_slb20140515', 'alibabacloud_ecs20140526'),
+    'slb': ('alibabacloud_ecs20140526', 'alibabacloud_vpc20160428', 'alibabacloud_slb20140515'),
+}
+
+
+def importtime(module):
+    """返回 (总耗时微秒, 导入的模块名列表)"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                          env=env, capture_output=True, text=True, check=True)
+    modules, total = [], 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = [p.strip() for p in line[len('import time:'):].split('|')]
+        modules.append(name.strip())
+        if name.strip() == module:
+            total = int(cumulative)
+    return total, modules
+
+
+def main(budget_ms=None):
+    failed = False
+    for name, forbidden in CASES.items():
+        module = '%s.%s' % (PACKAGE, name)
+        total, modules = importtime(module)
+        loaded = sorted({m.split('.')[0] for m in modules if m.split('.')[0] in forbidden})
+        slow = budget_ms is not None and total / 1000 > float(budget_ms)
+        failed = failed or bool(loaded) or slow
+        print('%-20s %8.1f ms  %s' % (module, total / 1000, 'loaded ' + ', '.join(loaded) if loaded else 'ok'))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
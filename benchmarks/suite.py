@@ -0,0 +1,151 @@
+"""各wrapper类的基准测试, 请求发往本地FakeCloud, 不访问真实云
+输出每个用例的每秒调用数, p50/p99延迟, 失败数和内存峰值;
+指定 --baseline 时与保存的结果比较, 吞吐下降或p99上升超过 --tolerance 时返回非0, 用于检查性能退化
+用法:
+    python -m ali_api.benchmarks.suite --save baseline.json
+    python -m ali_api.benchmarks.suite --baseline baseline.json --tolerance 0.2
+    python -m ali_api.benchmarks.suite --latency 0.01 --throttle 0.01 --failures 0.01 -k ECS
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from ..ecs import ECS, SecurityGroup
+from ..vpc import VPC, VSwitch, NAT, EIP
+from ..slb import SLB
+from .server import FakeCloud
+
+REGION = 'cn-local'
+_ports = itertools.count(10000)
+
+# 用例名 -> (wrapper类, 单次调用)
+CASES = {
+    'ECS.get': (ECS, lambda c: c.get(REGION, page_size=100)),
+    'ECS.iter_instances': (ECS, lambda c: sum(1 for _ in c.iter_instances(REGION))),
+    'ECS.get_status': (ECS, lambda c: c.get_status(REGION)),
+    'ECS.create': (ECS, lambda c: c.create(REGION, 'bench', 'ubuntu_20_04_x64', 'ecs.g6.large', 'vsw-local', 'sg-local')),
+    'SecurityGroup.get': (SecurityGroup, lambda c: c.get(REGION)),
+    'VPC.get': (VPC, lambda c: c.get(REGION)),
+    'VSwitch.get': (VSwitch, lambda c: c.get(REGION, 'vpc-local')),
+    'EIP.get': (EIP, lambda c: c.get(REGION, page_size=100)),
+    'EIP.iter_eips': (EIP, lambda c: sum(1 for _ in c.iter_eips(REGION))),
+    'NAT.get_dnat': (NAT, lambda c: c.get_dnat(REGION, 'ftb-local', page_size=50)),
+    'NAT.add_dnat': (NAT, lambda c: c.add_dnat(REGION, 'ftb-local', '47.0.0.2', next(_ports), '10.0.0.1', 22)),
+    'SLB.get': (SLB, lambda c: c.get(REGION, page_size=100)),
+}
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+def _warmup(client, call):
+    # 建立连接并加载sdk, 注入的错误不影响
+    try:
+        call(client)
+    except Exception:
+        pass
+
+
+def run_case(endpoint, cls, call, calls, parallel):
+    """返回 {'calls_per_s', 'p50_ms', 'p99_ms', 'errors'}"""
+    client = cls('ak', 'sk', endpoint, protocol='http')
+    latencies, errors = [], []
+
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            call(client)
+        except Exception as e:
+            errors.append(e)
+        latencies.append(time.perf_counter() - start)
+
+    _warmup(client, call)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        list(executor.map(timed, range(calls)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'calls_per_s': round(calls / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'errors': len(errors),
+    }
+
+
+def measure_memory(endpoint, cls, call, calls):
+    """单线程执行calls次的内存峰值KiB, tracemalloc开销较大, 与计时分开执行"""
+    client = cls('ak', 'sk', endpoint, protocol='http')
+    _warmup(client, call)
+    tracemalloc.start()
+    for _ in range(calls):
+        try:
+            call(client)
+        except Exception:
+            pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def compare(results, baseline, tolerance):
+    """返回退化的用例说明列表"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['calls_per_s'] < base['calls_per_s'] * (1 - tolerance):
+            regressions.append('%s: calls/s %.1f -> %.1f' % (name, base['calls_per_s'], result['calls_per_s']))
+        if result['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append('%s: p99 %.2fms -> %.2fms' % (name, base['p99_ms'], result['p99_ms']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ali_api.benchmarks.suite')
+    parser.add_argument('--calls', type=int, default=500, help='每个用例的调用次数')
+    parser.add_argument('--parallel', type=int, default=8, help='并发线程数')
+    parser.add_argument('--memory-calls', type=int, default=50, help='测量内存时的调用次数, 0为不测量')
+    parser.add_argument('--instances', type=int, default=500, help='FakeCloud预置的实例数')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟的接口延迟秒数')
+    parser.add_argument('--throttle', type=float, default=0.0, help='返回限流错误的概率')
+    parser.add_argument('--failures', type=float, default=0.0, help='返回InternalError的概率')
+    parser.add_argument('-k', dest='match', default='', help='只执行名称包含该字符串的用例')
+    parser.add_argument('--save', help='将结果保存为json')
+    parser.add_argument('--baseline', help='与该json中的结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的退化比例')
+    args = parser.parse_args(argv)
+
+    results = {}
+    cloud = FakeCloud(instances=args.instances, forward_entries=200, latency=args.latency,
+                      throttle=args.throttle, failures=args.failures)
+    with cloud:
+        print('%-22s %10s %9s %9s %7s %10s' % ('case', 'calls/s', 'p50 ms', 'p99 ms', 'errors', 'peak KiB'))
+        for name, (cls, call) in CASES.items():
+            if args.match not in name:
+                continue
+            result = run_case(cloud.endpoint, cls, call, args.calls, args.parallel)
+            if args.memory_calls:
+                result['peak_kib'] = measure_memory(cloud.endpoint, cls, call, args.memory_calls)
+            results[name] = result
+            print('%-22s %10.1f %9.2f %9.2f %7d %10s' % (name, result['calls_per_s'], result['p50_ms'],
+                                                        result['p99_ms'], result['errors'], result.get('peak_kib', '-')))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
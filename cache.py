@@ -0,0 +1,171 @@
+"""查询结果缓存
+用于镜像, 可用区, 实例规格等很少变化的查询, 默认不开启:
+    cache = TTLCache(maxsize=512, ttls={'images': 3600})
+    ecs = ECS(ak, sk, endpoint, cache=cache)
+同一个cache可被多个wrapper实例共享, 缓存按ak区分账号, 写操作成功后自动清除受影响的缓存
+"""
+import copy
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+__all__ = ('TTLCache', 'cached', 'invalidates')
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class TTLCache:
+    """线程安全的TTL + LRU缓存
+    maxsize: 最大条目数, 超出时淘汰最久未使用的条目
+    ttl: 默认过期秒数, ttls按tag覆盖, 如 {'images': 3600}
+    """
+    def __init__(self, maxsize=256, ttl=300, ttls=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (过期时间, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回 (是否命中, 值)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return True, copy.deepcopy(item[1])
+
+    def set(self, key, value, ttl=None):
+        # 优先级: ttls[tag] > cached(ttl=) > 默认ttl
+        ttl = self.ttls.get(key[0], self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, tag, endpoint=None, ak=None, **match):
+        """清除tag下的缓存, 可按endpoint, ak及参数值过滤, 如 invalidate('sg_rules', sg_id='sg-xx')"""
+        with self._lock:
+            for key in list(self._data):
+                if key[0] != tag or (ak is not None and key[1] != ak) or (endpoint is not None and key[2] != endpoint):
+                    continue
+                params = dict(key[3])
+                if all(params.get(k) == _freeze(v) for k, v in match.items()):
+                    del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+CO_COROUTINE = 0x80  # inspect.CO_COROUTINE, inspect模块导入较慢, 只在首次调用时导入
+
+
+def _is_async(func):
+    return bool(func.__code__.co_flags & CO_COROUTINE)
+
+
+@functools.lru_cache(maxsize=None)
+def _signature(func):
+    import inspect
+    return inspect.signature(func)
+
+
+def _bind(func, self, args, kwargs):
+    sig = _signature(func)
+    bound = sig.bind(self, *args, **kwargs)
+    bound.apply_defaults()
+    params = dict(bound.arguments)
+    params.pop('self', None)
+    for name, p in sig.parameters.items():
+        if p.kind is p.VAR_KEYWORD:
+            params.update(params.pop(name, {}))
+    return params
+
+
+def cached(tag, ttl=None):
+    """缓存读方法的返回值, 实例未设置cache时直接调用
+    tag: 缓存分组, invalidates按tag清除
+    """
+    def decorator(func):
+        def lookup(self, args, kwargs):
+            params = _bind(func, self, args, kwargs)
+            # 同一个cache可被不同账号的wrapper共享, key包含ak
+            key = (tag, self._key[0], self.endpoint, _freeze(params))
+            return key, self.cache.get(key)
+
+        if _is_async(func):
+            @functools.wraps(func)
+            async def wrapper(self, *args, **kwargs):
+                if self.cache is None:
+                    return await func(self, *args, **kwargs)
+                key, (hit, value) = lookup(self, args, kwargs)
+                if not hit:
+                    value = await func(self, *args, **kwargs)
+                    self.cache.set(key, value, ttl)
+                return value
+        else:
+            @functools.wraps(func)
+            def wrapper(self, *args, **kwargs):
+                if self.cache is None:
+                    return func(self, *args, **kwargs)
+                key, (hit, value) = lookup(self, args, kwargs)
+                if not hit:
+                    value = func(self, *args, **kwargs)
+                    self.cache.set(key, value, ttl)
+                return value
+        return wrapper
+    return decorator
+
+
+def invalidates(*rules):
+    """写方法成功后清除相关缓存
+    rules: tag 或 (tag, 参数名...) , 如 ('sg_rules', 'sg_id') 只清除同一安全组的缓存
+    参数名需同时出现在读写方法的签名中
+    """
+    rules = [(r,) if isinstance(r, str) else tuple(r) for r in rules]
+
+    def decorator(func):
+        def clear(self, args, kwargs):
+            params = _bind(func, self, args, kwargs)
+            for tag, *names in rules:
+                self.cache.invalidate(tag, self.endpoint, self._key[0], **{n: params[n] for n in names if n in params})
+
+        if _is_async(func):
+            @functools.wraps(func)
+            async def wrapper(self, *args, **kwargs):
+                res = await func(self, *args, **kwargs)
+                if self.cache is not None:
+                    clear(self, args, kwargs)
+                return res
+        else:
+            @functools.wraps(func)
+            def wrapper(self, *args, **kwargs):
+                res = func(self, *args, **kwargs)
+                if self.cache is not None:
+                    clear(self, args, kwargs)
+                return res
+        return wrapper
+    return decorator
@@ -0,0 +1,221 @@
+"""命令行入口, 结果以JSON Lines逐行输出到stdout, 可直接接 jq:
+    python -m ali_api inventory --regions all --types ecs,eip | jq .InstanceId
+    python -m ali_api stop --regions ap-south-1 i-xxx i-yyy
+    python -m ali_api inventory --regions ap-south-1 --types ecs | jq -c 'select(.Status=="Stopped")' | python -m ali_api start --regions ap-south-1
+    python -m ali_api sg-sync --regions ap-south-1 --sg sg-xxx --rule tcp:22 --rule tcp:443:10.0.0.0/8 --dry-run
+    python -m ali_api slb-health --regions ap-south-1
+ak/sk 取自 --ak/--sk 或环境变量 ALIBABA_CLOUD_ACCESS_KEY_ID, ALIBABA_CLOUD_ACCESS_KEY_SECRET
+错误以JSON Lines输出到stderr, 有错误时返回1
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .ecs import ECS, SecurityGroup
+from .slb import SLB
+from .region import Fleet, RESOURCES
+from .records import field_getter
+from .utils import error_info
+
+__all__ = ('main',)
+
+
+class Output:
+    """线程安全的JSON Lines输出, 每条记录写入后立即flush"""
+    def __init__(self, out=None, err=None):
+        self.out = out or sys.stdout
+        self.err = err or sys.stderr
+        self.errors = 0
+        self.closed = False  # stdout的读取方已退出, 如 | head
+        self._lock = threading.Lock()
+
+    def _write(self, stream, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            try:
+                stream.write(line)
+                stream.flush()
+            except BrokenPipeError:
+                self.closed = True
+                raise
+
+    def write(self, record):
+        self._write(self.out, record)
+
+    def error(self, e, **context):
+        self.count_errors()
+        self._write(self.err, dict(context, **error_info(e)))
+
+    def count_errors(self, n=1):
+        # 记录已写入stdout的失败结果, 决定返回码
+        with self._lock:
+            self.errors += n
+
+
+def stream(jobs, parallel, output):
+    """并发执行jobs, 每个job为 (上下文dict, 函数), 函数返回记录的迭代器, 记录逐条输出
+    上下文中的字段合并到每条记录, 并在出错时输出
+    """
+    def run(job):
+        context, fn = job
+        for record in fn():
+            output.write(dict(context, **record) if isinstance(record, dict) else record)
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        futures = {executor.submit(run, job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                if not output.closed:
+                    output.error(e, **futures[future])
+
+
+def _project(fields):
+    if not fields:
+        return lambda record: record
+    getters = [(f.rpartition('=')[0] or f, field_getter(f)) for f in fields.split(',')]
+    return lambda record: {name: get(record) for name, get in getters}
+
+
+def _ids(args):
+    # 命令行中的实例id, 没有时从stdin读取, 每行为实例id或含InstanceId的json
+    ids = list(args.ids)
+    if not ids and not sys.stdin.isatty():
+        for line in sys.stdin:
+            line = line.strip()
+            if line:
+                ids.append(json.loads(line)['InstanceId'] if line.startswith('{') else line)
+    return ids
+
+
+def _rule(text):
+    # 协议:端口[:源地址段[:策略]], 如 tcp:22, tcp:8000/9000:10.0.0.0/8, tcp:23:0.0.0.0/0:drop
+    type, port, *rest = text.split(':', 3)
+    rule = {'type': type, 'port': port}
+    if rest and rest[0]:
+        rule['source_cidr_ip'] = rest[0]
+    if len(rest) > 1 and rest[1]:
+        rule['policy'] = rest[1]
+    return rule
+
+
+def inventory(fleet, args, output):
+    project = _project(args.fields)
+    jobs = []
+    for type in args.types.split(','):
+        cls, method = RESOURCES[type]
+        for region_id in fleet.regions:
+            iterate = lambda cli=fleet.client(cls, region_id), method=method, region_id=region_id: (
+                project(r) for r in getattr(cli, method)(region_id))
+            jobs.append(({'Type': type, 'RegionId': region_id}, iterate))
+    stream(jobs, fleet.parallel, output)
+
+
+def instances(fleet, args, output):
+    ids = _ids(args)
+    if not ids:
+        return
+    regions = fleet.regions
+    if len(regions) != 1:
+        raise SystemExit('%s needs exactly one region' % args.command)
+    region_id = regions[0]
+    ecs = fleet.client(ECS, region_id)
+    result = ecs.bulk_options(args.command, region_id, ids, parallel=fleet.parallel)
+    for item in result.results:
+        output.write(dict(item, RegionId=region_id, Action=args.command))
+        if not item['Success']:
+            output.count_errors()
+
+
+def sg_sync(fleet, args, output):
+    rules = [_rule(r) for r in args.rule]
+    jobs = []
+    for region_id in fleet.regions:
+        sg = fleet.client(SecurityGroup, region_id)
+        for sg_id in args.sg:
+            def sync(sg=sg, region_id=region_id, sg_id=sg_id):
+                plan = sg.sync(region_id, sg_id, rules, prune=not args.no_prune, dry_run=args.dry_run, parallel=fleet.parallel)
+                result = plan.pop('result', None)
+                plan['add'] = [' '.join(k) for k in plan['add']]
+                if result is not None:
+                    plan['results'] = result.results
+                    plan['ok'] = result.ok
+                    output.count_errors(len(result.failed))
+                yield plan
+            jobs.append(({'RegionId': region_id, 'SecurityGroupId': sg_id}, sync))
+    stream(jobs, fleet.parallel, output)
+
+
+def slb_health(fleet, args, output):
+    def health(slb, region_id):
+        slb_ids = args.slb or [lb['LoadBalancerId'] for lb in slb.iter_load_balancers(region_id)]
+        for slb_id in slb_ids:
+            try:
+                body = slb.get_health_status(region_id, slb_id)
+            except Exception as e:
+                output.error(e, RegionId=region_id, LoadBalancerId=slb_id)
+                continue
+            for server in body.get('BackendServers', {}).get('BackendServer', []):
+                yield dict(server, LoadBalancerId=slb_id)
+
+    jobs = [({'RegionId': r}, lambda r=r: health(fleet.client(SLB, r), r)) for r in fleet.regions]
+    stream(jobs, fleet.parallel, output)
+
+
+COMMANDS = {
+    'inventory': inventory,
+    'start': instances,
+    'stop': instances,
+    'restart': instances,
+    'delete': instances,
+    'sg-sync': sg_sync,
+    'slb-health': slb_health,
+}
+
+
+def parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--ak', default=os.environ.get('ALIBABA_CLOUD_ACCESS_KEY_ID'))
+    common.add_argument('--sk', default=os.environ.get('ALIBABA_CLOUD_ACCESS_KEY_SECRET'))
+    common.add_argument('--regions', default=os.environ.get('ALIBABA_CLOUD_REGION_ID', 'all'),
+                        help='逗号分隔的地域id, 或all')
+    common.add_argument('--parallel', type=int, default=8, help='并发数')
+
+    root = argparse.ArgumentParser(prog='ali-api', description='阿里云ECS, VPC, SLB批量操作, 结果以JSON Lines输出')
+    sub = root.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('inventory', parents=[common], help='查询资源清单')
+    p.add_argument('--types', default='ecs', help='逗号分隔, 可选 %s' % ', '.join(RESOURCES))
+    p.add_argument('--fields', help='逗号分隔的字段路径, 如 InstanceId,ip=VpcAttributes.PrivateIpAddress.IpAddress.0')
+    for name in ('start', 'stop', 'restart', 'delete'):
+        p = sub.add_parser(name, parents=[common], help='批量%s实例, id取自参数或stdin' % name)
+        p.add_argument('ids', nargs='*')
+    p = sub.add_parser('sg-sync', parents=[common], help='将安全组入方向规则同步为指定规则')
+    p.add_argument('--sg', action='append', required=True, help='安全组id, 可重复')
+    # 不允许空规则列表, 否则默认的prune会撤销全部按地址段授权的规则
+    p.add_argument('--rule', action='append', required=True, help='协议:端口[:源地址段[:策略]], 可重复, 至少一条')
+    p.add_argument('--no-prune', action='store_true', help='不删除多余的规则')
+    p.add_argument('--dry-run', action='store_true', help='只输出计划')
+    p = sub.add_parser('slb-health', parents=[common], help='查询负载均衡后端服务器健康状态')
+    p.add_argument('--slb', action='append', help='负载均衡id, 可重复, 默认地域内全部')
+    return root
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if not args.ak or not args.sk:
+        raise SystemExit('missing credentials: set --ak/--sk or ALIBABA_CLOUD_ACCESS_KEY_ID/ALIBABA_CLOUD_ACCESS_KEY_SECRET')
+    regions = 'all' if args.regions == 'all' else args.regions.split(',')
+    fleet = Fleet(args.ak, args.sk, regions, parallel=args.parallel)
+    output = Output()
+    try:
+        COMMANDS[args.command](fleet, args, output)
+    except BrokenPipeError:
+        pass
+    if output.closed:
+        # 下游如 head 提前退出, 避免解释器退出时flush stdout再次报错
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    return 1 if output.errors else 0
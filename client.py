@@ -1,77 +1,447 @@
-from alibabacloud_tea_openapi import models as open_api_models
-from alibabacloud_ecs20140526.client import Client as Ecs # ecs client
-from alibabacloud_slb20140515.client import Client as Slb # slb client
-from alibabacloud_vpc20160428.client import Client as Vpc # vpc client
-
-__all__ = ('ECSClient', 'VPCClient', 'SLBClient')
-
-
-class Client:
-    """阿里云client api接口"""
-    def __init__(self, ak, sk, endpoint):
-        # 注意: 每个产品的endpoint 不同，如 ecs的ecs.[区域id].aliyuncs.com
-        self.config = open_api_models.Config(
-            access_key_id=ak,
-            access_key_secret=sk
-            )
-        self.endpoint = endpoint
-        self.client = None
-
-    def _set_client(self, type):
-        # type: 阿里云产品类型所属client
-        if self.client is not None:
-            return self.client
-        self.config.endpoint = self.endpoint
-        self.client = type(self.config)
-        return self.client
-
-
-class ECSClient(Client):
-    """ECS client"""
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def get_client(self):
-        return self._set_client(Ecs)
-
-    def __enter__(self):
-        if self.client is not None:
-            raise RuntimeError('Already connected')
-        return self.get_client()
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.client = None
-
-
-class VPCClient(Client):
-    """VPC client"""
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def get_client(self):
-        return self._set_client(Vpc)
-
-    def __enter__(self):
-        if self.client is not None:
-            raise RuntimeError('Already connected')
-        return self.get_client()
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.client = None
-
-
-class SLBClient(Client):
-    """SLB client"""
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def get_client(self):
-        return self._set_client(Slb)
-
-    def __enter__(self):
-        if self.client is not None:
-            raise RuntimeError('Already connected')
-        return self.get_client()
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.client = None
\ No newline at end of file
+import contextlib
+import functools
+import hashlib
+import threading
+import time
+from .ratelimit import is_throttling
+from .utils import LazyModule, error_info
+
+# sdk模块在首次使用时才导入, 只用到vpc时不会加载ecs, slb的sdk
+open_api_models = LazyModule('alibabacloud_tea_openapi.models')
+util_models = LazyModule('alibabacloud_tea_util.models')
+Ecs = LazyModule('alibabacloud_ecs20140526.client') # ecs client
+Slb = LazyModule('alibabacloud_slb20140515.client') # slb client
+Vpc = LazyModule('alibabacloud_vpc20160428.client') # vpc client
+
+__all__ = ('ECSClient', 'VPCClient', 'SLBClient', 'AsyncClient', 'ClientPool', 'default_pool', 'get_endpoint')
+
+
+class ClientPool:
+    """进程级的sdk client池
+    按(ak, sk摘要, endpoint, 产品)缓存已初始化的client, 省去每次调用新建client的开销,
+    tcp连接由tea core按host在进程内复用, 与是否复用client无关
+    空闲超过idle_timeout秒的client会被回收, 空闲client总数不超过max_size
+    """
+    def __init__(self, max_size=64, idle_timeout=300):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self._idle = {}  # key -> [(client, 最后使用时间)]
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, key, factory):
+        """取出一个空闲client, 没有则调用factory新建"""
+        with self._lock:
+            self._evict(time.monotonic())
+            idle = self._idle.get(key)
+            if idle:
+                cli, _ = idle.pop()
+                self._size -= 1
+                self.hits += 1
+                return cli
+            self.misses += 1
+        return factory()
+
+    def release(self, key, cli):
+        """归还client, 池满时淘汰最久未使用的client"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            if self.max_size <= 0:
+                return
+            if self._size >= self.max_size:
+                oldest = min(self._idle, key=lambda k: self._idle[k][0][1])
+                self._idle[oldest].pop(0)
+                self._size -= 1
+                if not self._idle[oldest]:
+                    del self._idle[oldest]
+            self._idle.setdefault(key, []).append((cli, now))
+            self._size += 1
+
+    def _evict(self, now):
+        # 调用方需持有锁
+        deadline = now - self.idle_timeout
+        for key in list(self._idle):
+            alive = [item for item in self._idle[key] if item[1] > deadline]
+            self._size -= len(self._idle[key]) - len(alive)
+            if alive:
+                self._idle[key] = alive
+            else:
+                del self._idle[key]
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'idle': self._size, 'keys': len(self._idle), 'hits': self.hits, 'misses': self.misses}
+
+
+default_pool = ClientPool()
+
+
+def get_endpoint(type, region_id):
+    """产品在地域下的endpoint, 如 ecs.ap-south-1.aliyuncs.com
+    type: 产品类型 ecs, slb, vpc
+    """
+    if type.lower() not in ('ecs', 'slb', 'vpc'):
+        raise Exception('type value is not isvalid')
+    return '.'.join([type.lower(), region_id, 'aliyuncs.com'])
+
+
+_loads = None
+
+
+def loads(data):
+    """解析json, 安装了orjson时使用orjson"""
+    global _loads
+    if _loads is None:
+        try:
+            import orjson
+            _loads = orjson.loads
+        except ImportError:
+            import json
+            _loads = json.loads
+    return _loads(data)
+
+
+class RawResponse:
+    """raw模式的响应, body为直接解析的dict, to_map()与sdk响应的结构一致
+    第一次to_map()直接交出body不复制; singleflight合并的调用共用同一个响应, 之后的to_map()重新解析响应文本,
+    各调用方得到独立的dict
+    """
+    __slots__ = ('headers', 'status_code', 'body', '_text', '_unclaimed')
+
+    def __init__(self, res):
+        self.headers = res.get('headers') or {}
+        self.status_code = res.get('statusCode', 200)
+        self._text = res.get('body')
+        self.body = loads(self._text) if self._text else {}
+        self._unclaimed = [self.body]
+
+    def to_map(self) -> dict:
+        try:
+            # list.pop是原子操作, 并发调用时只有一个调用方取得已解析的body
+            body = self._unclaimed.pop()
+        except IndexError:
+            body = loads(self._text) if self._text else {}
+        return {'headers': dict(self.headers), 'statusCode': self.status_code, 'body': body}
+
+
+def action_name(req):
+    """请求对应的OpenAPI接口名, 如 DescribeInstancesRequest -> DescribeInstances"""
+    name = type(req).__name__
+    return name[:-len('Request')] if name.endswith('Request') else name
+
+
+class _Proxy:
+    """sdk client代理, wrapper中 cli.xxx(req) 的调用都经过 Client._invoke"""
+    def __init__(self, owner, cli):
+        self._owner = owner
+        self._cli = cli
+
+    def __getattr__(self, name):
+        attr = getattr(self._cli, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        return functools.partial(self._owner._invoke, self._cli, name)
+
+
+class Client:
+    """阿里云client api接口"""
+    product = None  # sdk client所在模块
+    endpoint_type = None  # endpoint中的产品类型
+    api_version = None  # OpenAPI版本, raw模式使用
+    limiter = None  # ratelimit.RateLimiter, 设置在Client上时所有产品共享
+    metrics = None  # metrics.Metrics 或任意有 record(span) 方法的对象, 同上
+    singleflight = None  # singleflight.SingleFlight, 同上
+
+    def __init__(self, ak, sk, endpoint, pool=None, cache=None, limiter=None, timeouts=None, hedge=None, metrics=None,
+                 singleflight=None, raw=False, **kwargs):
+        # 注意: 每个产品的endpoint 不同，如 ecs的ecs.[区域id].aliyuncs.com
+        # cache: cache.TTLCache, 缓存镜像, 可用区等很少变化的查询结果
+        # limiter: ratelimit.RateLimiter, 不设置时使用 Client.limiter
+        # timeouts: 按接口设置超时(毫秒), 如 {'DescribeHealthStatus': 3000} 为读超时,
+        #           {'DescribeInstances': (1000, 10000)} 为(连接超时, 读超时)
+        # hedge: hedge.HedgePolicy, Describe*接口的对冲请求
+        # metrics: metrics.Metrics, 不设置时使用 Client.metrics
+        # singleflight: singleflight.SingleFlight, 合并并发的相同查询, 不设置时使用 Client.singleflight
+        # raw: 不经过sdk的响应模型, 直接取响应文本解析为dict, 省去 模型 -> to_map() 的两次遍历和复制,
+        #      适合返回数据量大的Describe*查询
+        # kwargs 透传给 open_api_models.Config, 如 protocol, read_timeout
+        self.config = open_api_models.Config(
+            access_key_id=ak,
+            access_key_secret=sk,
+            **kwargs
+            )
+        self.endpoint = endpoint
+        self.client = None
+        self.pool = default_pool if pool is None else pool
+        self.cache = cache
+        if limiter is not None:
+            self.limiter = limiter
+        self.timeouts = dict(timeouts or {})
+        self.hedge = hedge
+        if metrics is not None:
+            self.metrics = metrics
+        if singleflight is not None:
+            self.singleflight = singleflight
+        self.raw = raw
+        # 池的key包含sk的摘要, 轮换sk后不会取到用旧sk创建的client
+        secret = hashlib.sha256((sk or '').encode()).hexdigest()[:16]
+        self._key = (ak, secret, endpoint, self.product, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+        self._local = threading.local()
+        self._held = {}  # id(client) -> 仍在使用的方数, 见 _hand_off
+        self._held_lock = threading.Lock()
+
+    @classmethod
+    def for_region(cls, ak, sk, region_id, **kwargs):
+        """按地域创建实例, endpoint由get_endpoint生成"""
+        return cls(ak, sk, get_endpoint(cls.endpoint_type, region_id), **kwargs)
+
+    def _new_client(self):
+        self.config.endpoint = self.endpoint
+        return self.product.Client(self.config)
+
+    def _set_client(self):
+        # get_client取得的client由实例长期持有, 不归还到池中
+        if self.client is not None:
+            return self.client
+        self.client = self.pool.acquire(self._key, self._new_client)
+        return self.client
+
+    def get_client(self):
+        return self._set_client()
+
+    def _region(self, req):
+        region_id = getattr(req, 'region_id', None)
+        if region_id:
+            return region_id
+        # 请求中没有地域时从endpoint中取, 如 ecs.ap-south-1.aliyuncs.com
+        parts = self.endpoint.split('.')
+        return parts[1] if len(parts) > 2 else self.endpoint
+
+    def _runtime(self, action):
+        # 接口设置了超时时返回RuntimeOptions, 否则使用sdk默认超时
+        timeout = self.timeouts.get(action)
+        if timeout is None:
+            return None
+        connect, read = timeout if isinstance(timeout, (tuple, list)) else (None, timeout)
+        return util_models.RuntimeOptions(connect_timeout=connect, read_timeout=read)
+
+    @contextlib.contextmanager
+    def _borrow(self):
+        # 对冲请求从池中另取一个client
+        cli = self.pool.acquire(self._key, self._new_client)
+        try:
+            yield cli
+        finally:
+            self.pool.release(self._key, cli)
+
+    def _hand_off(self, cli, future):
+        # 对冲请求先返回时主请求仍在使用cli, 调用方和主请求都结束后才归还到池中
+        with self._held_lock:
+            self._held[id(cli)] = 2
+        future.add_done_callback(lambda _: self._release(cli))
+
+    def _release(self, cli):
+        with self._held_lock:
+            holders = self._held.get(id(cli))
+            if holders is not None:
+                if holders > 1:
+                    self._held[id(cli)] = holders - 1
+                    return
+                del self._held[id(cli)]
+        self.pool.release(self._key, cli)
+
+    def _raw_args(self, req, runtime):
+        # do_rpcrequest的参数, body_type为string时sdk只读取响应文本, 不解析
+        request = open_api_models.OpenApiRequest(body=req.to_map())
+        return (action_name(req), self.api_version, 'HTTPS', 'POST', 'AK', 'string', request,
+                runtime or util_models.RuntimeOptions())
+
+    def _send(self, cli, method, req, runtime):
+        if self.raw:
+            return RawResponse(cli.do_rpcrequest(*self._raw_args(req, runtime)))
+        if runtime is None:
+            return getattr(cli, method)(req)
+        return getattr(cli, method + '_with_options')(req, runtime)
+
+    def _span(self, req, start, began, res=None, error=None):
+        # 一次调用的监控记录, 见 metrics.Metrics
+        span = {'action': action_name(req), 'region': self._region(req), 'endpoint': self.endpoint, 'start': start,
+                'duration': time.perf_counter() - began, 'status': 'ok', 'code': None, 'request_id': None, 'size': 0}
+        if error is not None:
+            info = error_info(error)
+            span.update(status='throttled' if is_throttling(error) else 'error', code=info['Code'], request_id=info['RequestId'])
+            return span
+        headers = getattr(res, 'headers', None) or {}
+        span['size'] = int(headers.get('content-length') or 0)
+        body = getattr(res, 'body', None)
+        # raw模式的body为dict
+        span['request_id'] = headers.get('x-acs-request-id') or (
+            body.get('RequestId') if isinstance(body, dict) else getattr(body, 'request_id', None))
+        return span
+
+    def _measured(self, cli, method, req, runtime):
+        start, began = time.time(), time.perf_counter()
+        try:
+            res = self._send(cli, method, req, runtime)
+        except Exception as e:
+            self.metrics.record(self._span(req, start, began, error=e))
+            raise
+        self.metrics.record(self._span(req, start, began, res))
+        return res
+
+    def _invoke(self, cli, method, req):
+        """执行一次sdk调用, 按接口设置超时, Describe*接口可合并和对冲"""
+        action = action_name(req)
+        flight = self.singleflight
+        if flight is not None and flight.applies(action):
+            return flight.do(flight.key(self._key, action, req), lambda: self._execute(cli, method, req, action))
+        return self._execute(cli, method, req, action)
+
+    def _execute(self, cli, method, req, action):
+        runtime = self._runtime(action)
+        if self.hedge is not None and self.hedge.applies(action):
+            return self.hedge.run(action, lambda c: self._attempt(c, method, req, action, runtime), cli, self._borrow,
+                                  self._hand_off)
+        return self._attempt(cli, method, req, action, runtime)
+
+    def _attempt(self, cli, method, req, action, runtime):
+        """限流器开启时先获取令牌, 遇到限流错误降速重试; 设置了metrics时记录每次请求"""
+        send = self._send if self.metrics is None else self._measured
+        limiter = self.limiter
+        if limiter is None:
+            return send(cli, method, req, runtime)
+        region = self._region(req)
+        attempt = 0
+        while True:
+            limiter.acquire(action, region)
+            try:
+                res = send(cli, method, req, runtime)
+            except Exception as e:
+                if not is_throttling(e):
+                    raise
+                limiter.on_throttle(action, region)
+                if attempt >= limiter.retries:
+                    raise
+                attempt += 1
+                continue
+            limiter.on_success(action, region)
+            return res
+
+    def __enter__(self):
+        # 每次调用从池中取client, 退出时归还, 同一实例可被多线程并发使用
+        cli = self.pool.acquire(self._key, self._new_client)
+        self._local.__dict__.setdefault('stack', []).append(cli)
+        return _Proxy(self, cli)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._release(self._local.stack.pop())
+
+
+class AsyncClient(Client):
+    """异步client, 基于sdk生成的 *_async 方法
+    limit: 单个实例同时进行中的请求数上限
+    """
+    def __init__(self, *args, limit=10, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit = limit
+        self._semaphore = None
+
+    async def _call(self, action, req):
+        """调用sdk client的 {action}_async 方法, 返回to_map()的结果"""
+        if self._semaphore is None:
+            # asyncio只在异步调用时导入, 减少同步脚本的启动耗时
+            import asyncio
+            self._semaphore = asyncio.Semaphore(self.limit)
+        async with self._semaphore:
+            cli = self.pool.acquire(self._key, self._new_client)
+            try:
+                res = await self._invoke_async(cli, action + '_async', req)
+            finally:
+                self._release(cli)
+        return res.to_map()
+
+    async def _invoke_async(self, cli, method, req):
+        action = action_name(req)
+        flight = self.singleflight
+        if flight is not None and flight.applies(action):
+            return await flight.do_async(flight.key(self._key, action, req), lambda: self._execute_async(cli, method, req, action))
+        return await self._execute_async(cli, method, req, action)
+
+    async def _execute_async(self, cli, method, req, action):
+        runtime = self._runtime(action)
+        if self.hedge is not None and self.hedge.applies(action):
+            return await self.hedge.run_async(action, lambda c: self._attempt_async(c, method, req, action, runtime), cli,
+                                              self._borrow, self._hand_off)
+        return await self._attempt_async(cli, method, req, action, runtime)
+
+    async def _send_raw_async(self, cli, req, runtime):
+        return RawResponse(await cli.do_rpcrequest_async(*self._raw_args(req, runtime)))
+
+    def _send_async(self, cli, method, req, runtime):
+        # method 形如 describe_instances_async, 带超时时调用 describe_instances_with_options_async
+        if self.raw:
+            return self._send_raw_async(cli, req, runtime)
+        if runtime is None:
+            return getattr(cli, method)(req)
+        return getattr(cli, method[:-len('_async')] + '_with_options_async')(req, runtime)
+
+    async def _measured_async(self, cli, method, req, runtime):
+        start, began = time.time(), time.perf_counter()
+        try:
+            res = await self._send_async(cli, method, req, runtime)
+        except Exception as e:
+            self.metrics.record(self._span(req, start, began, error=e))
+            raise
+        self.metrics.record(self._span(req, start, began, res))
+        return res
+
+    async def _attempt_async(self, cli, method, req, action, runtime):
+        send = self._send_async if self.metrics is None else self._measured_async
+        limiter = self.limiter
+        if limiter is None:
+            return await send(cli, method, req, runtime)
+        region = self._region(req)
+        attempt = 0
+        while True:
+            await limiter.acquire_async(action, region)
+            try:
+                res = await send(cli, method, req, runtime)
+            except Exception as e:
+                if not is_throttling(e):
+                    raise
+                limiter.on_throttle(action, region)
+                if attempt >= limiter.retries:
+                    raise
+                attempt += 1
+                continue
+            limiter.on_success(action, region)
+            return res
+
+
+class ECSClient(Client):
+    """ECS client"""
+    product = Ecs
+    endpoint_type = 'ecs'
+    api_version = '2014-05-26'
+
+
+class VPCClient(Client):
+    """VPC client"""
+    product = Vpc
+    endpoint_type = 'vpc'
+    api_version = '2016-04-28'
+
+
+class SLBClient(Client):
+    """SLB client"""
+    product = Slb
+    endpoint_type = 'slb'
+    api_version = '2014-05-15'
@@ -0,0 +1,93 @@
+"""两次资源清单之间的变化检测
+对每条记录的指定字段计算指纹, 只输出新增, 删除和变化的资源:
+    tracker = Tracker('InstanceId', fields=['Status', 'InstanceType', 'VpcAttributes.PrivateIpAddress'])
+    tracker.subscribe(lambda delta: print(delta))
+    tracker.update(ecs.iter_instances(region_id))
+"""
+import hashlib
+import json
+import threading
+from .records import field_getter
+
+__all__ = ('fingerprint', 'Delta', 'Tracker')
+
+
+def _projector(fields):
+    if fields is None:
+        return lambda record: record
+    getters = [field_getter(f) for f in fields]
+    return lambda record: [get(record) for get in getters]
+
+
+def _digest(value):
+    data = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode(), digest_size=16).digest()
+
+
+def fingerprint(record, fields=None) -> bytes:
+    """记录的指纹, fields为空时对整条记录计算"""
+    if hasattr(record, 'to_map'):
+        record = record.to_map()
+    return _digest(_projector(fields)(record))
+
+
+class Delta:
+    """一次刷新的变化
+    added, changed: 新增和变化的记录; removed: 删除的资源id
+    """
+    __slots__ = ('added', 'changed', 'removed')
+
+    def __init__(self, added=None, changed=None, removed=None):
+        self.added = added or []
+        self.changed = changed or []
+        self.removed = removed or []
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def __repr__(self):
+        return '<Delta added=%d changed=%d removed=%d>' % (len(self.added), len(self.changed), len(self.removed))
+
+
+class Tracker:
+    """按资源id保存上次的指纹, 每次update只返回变化
+    key: 资源id的字段路径, 如 'InstanceId', 'ForwardEntryId', 或 函数 key(record)
+    fields: 参与比较的字段路径, 默认比较整条记录
+    """
+    def __init__(self, key, fields=None):
+        self.key = key if callable(key) else field_getter(key)
+        self.fields = fields
+        self._project = _projector(fields)
+        self._fingerprints = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """有变化时调用callback(delta), 返回取消订阅的函数"""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def update(self, records) -> Delta:
+        """传入本次完整的记录列表(或迭代器), 返回并通知变化"""
+        delta = Delta()
+        current = {}
+        with self._lock:
+            previous = self._fingerprints
+            for record in records:
+                data = record.to_map() if hasattr(record, 'to_map') else record
+                rid = self.key(data)
+                fp = current[rid] = _digest(self._project(data))
+                old = previous.get(rid)
+                if old is None:
+                    delta.added.append(record)
+                elif old != fp:
+                    delta.changed.append(record)
+            delta.removed = [rid for rid in previous if rid not in current]
+            self._fingerprints = current
+        if delta:
+            for callback in list(self._subscribers):
+                callback(delta)
+        return delta
+
+    def __len__(self):
+        return len(self._fingerprints)
@@ -1,287 +1,735 @@
-from alibabacloud_ecs20140526 import models
-from .client import ECSClient
-from pprint import pprint
-
-
-class ECS(ECSClient):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def get(self, region_id, page_size=100, **kwargs) -> list:
-        """查询所属地域下的ecs实例详细信息
-        接口文档 https://next.api.aliyun.com/api/Ecs/2014-05-26/DescribeInstances?params={}
-        返回值参考 https://next.api.aliyun.com/api/Ecs/2014-05-26/DescribeInstances?params={}
-        :param region_id:实例所属的地域ID
-        """
-        with self as cli:
-            req = models.DescribeInstancesRequest(region_id=region_id, page_size=page_size, **kwargs)
-            res = cli.describe_instances(req).to_map()
-            return res['body']
-
-    def get_status(self, region_id, page_size=50, **kwargs) -> list:
-        """查询ECS实例的状态信息
-        接口文档 https://next.api.alibabacloud.com/api/Ecs/2014-05-26/DescribeInstanceStatus?params={%22RegionId%22:%22ap-south-1%22}&tab=DEMO&lang=PYTHON
-        :param region_id:实例所属的地域ID
-        """
-        with self as cli:
-            req = models.DescribeInstanceStatusRequest(region_id=region_id, page_size=page_size, **kwargs)
-            res = cli.describe_instance_status(req).to_map()
-            return res['body']
-
-    def get_instance_type(self, region_id, image_id, **kwargs) -> list:
-        """查询指定镜像支持的实例规格
-        接口文档 https://next.api.alibabacloud.com/api/Ecs/2014-05-26/DescribeImageSupportInstanceTypes?params='
-        """
-        with self as cli:
-            req = models.DescribeImageSupportInstanceTypesRequest(region_id=region_id, image_id=image_id, **kwargs)
-            res = cli.describe_image_support_instance_types(req)
-            return res.to_map()['body']
-
-    def get_images(self, region_id, **kwargs):
-        """查询可以使用的镜像资源
-        https://next.api.alibabacloud.com/api/Ecs/2014-05-26/DescribeImages?params={}
-        """
-        with self as cli:
-            req = models.DescribeImagesRequest(region_id=region_id, **kwargs)
-            res = cli.describe_images(req)
-            return res.to_map()['body']
-
-
-    def create(self, region_id, name, image_id, instance_type, v_switch_id, sg_id, size=40, category='cloud_efficiency', spot_strategy='SpotAsPriceGo', **kwargs):
-        """创建实例https://next.api.alibabacloud.com/api/Ecs/2014-05-26/CreateInstance?params={}
-        image_id: 镜像id
-        instance_type: 实例规格
-        v_switch_id: vpc实例id
-        磁盘默认 40G，高效磁盘, SpotAsPriceGo抢占式实例
-        """
-        with self as cli:
-            system_disk = models.CreateInstanceRequestSystemDisk(
-                    size=size,
-                    category=category,
-                )
-            req = models.CreateInstanceRequest(
-                    region_id=region_id,
-                    instance_name=name,
-                    image_id=image_id,
-                    instance_type=instance_type, 
-                    v_switch_id=v_switch_id,
-                    security_group_id=sg_id,
-                    spot_strategy=spot_strategy,
-                    system_disk=system_disk,
-                    **kwargs)
-            res = cli.create_instance(req)
-            return res.to_map()['body']
-
-    def delete(self, region_id, in_id, **kwargs):
-        """删除实例
-        in_id: 实例id;
-        in_id为list时,支持批量删除
-        """
-        with self as cli:
-            if isinstance(in_id, str):
-                req = models.DeleteInstanceRequest(instance_id=in_id, **kwargs)
-                res = cli.delete_instance(req)
-            if isinstance(in_id, list):
-                req = models.DeleteInstancesRequest(region_id=region_id, instance_id=in_id, **kwargs)
-                res = cli.delete_instances(req)
-            return res.to_map()['body']
-
-    def update(self):
-        pass
-
-    def options_ecs(self, option, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
-        """实例操作, 启动, 停止, 重启
-        """
-        with self as cli:
-            if isinstance(in_id, str):
-                if option == 'start':
-                    req = models.StartInstanceRequest(instance_id=in_id, **kwargs)
-                    res = cli.start_instance(req)
-                if option == 'stop':
-                    req = models.StopInstanceRequest(instance_id=in_id, **kwargs)
-                    res = cli.stop_instance(req)
-                if option == 'restart':
-                    req = models.RebootInstanceRequest(instance_id=in_id, **kwargs)
-                    res = cli.reboot_instance(req)
-            if isinstance(in_id, list):
-                if option == 'start':
-                    req = models.StartInstancesRequest(region_id=region_id, instance_id=in_id, batch_optimization=batch_optimization, **kwargs)
-                    res = cli.start_instances(req)
-                if option == 'stop':
-                    req = models.StopInstancesRequest(region_id=region_id, instance_id=in_id, batch_optimization=batch_optimization, **kwargs)
-                    res = cli.stop_instances(req)
-                if option == 'restart':
-                    req = models.RebootInstancesRequest(region_id=region_id, instance_id=in_id, batch_optimization=batch_optimization, **kwargs)
-                    res = cli.reboot_instances(req)
-            return res.to_map()['body']
-
-    def start(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
-        return self.options_ecs('start', region_id, in_id, batch_optimization='SuccessFirst', **kwargs)
-
-    def stop(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
-        return self.options_ecs('stop',  region_id, in_id, batch_optimization='SuccessFirst', **kwargs)
-
-    def restart(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
-        return self.options_ecs('restart',  region_id, in_id, batch_optimization='SuccessFirst', **kwargs)
-
-class PubKey(ECSClient):
-    """
-    密钥对 api
-    接口文档 https://next.api.alibabacloud.com/api/Ecs/2014-05-26/CreateKeyPair?params={}
-    """
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def create(self, region_id, key_name, **kwargs):
-        """新建
-        """
-        with self as cli:
-            req = models.CreateKeyPairRequest(region_id=region_id, key_pair_name=key_name, **kwargs)
-            res = cli.create_key_pair(req)
-            return res.to_map()['body']
-
-    def delete(self, region_id, key_name):
-        """删除"""
-        if isinstance(key_name, str):
-            key_name = str([key_name])
-        if isinstance(key_name, list):
-            key_name = str(key_name)
-        with self as cli:
-            req = models.DeleteKeyPairsRequest(region_id=region_id, key_pair_names=key_name)
-            res = cli.delete_key_pairs(req)
-            return res.to_map()['body']
-
-    def get(self, region_id, **kwargs):
-        with self as cli:
-            req = models.DescribeKeyPairsRequest(region_id=region_id, **kwargs)
-            res = cli.describe_key_pairs(req)
-            return res.to_map()['body']
-
-class SecurityGroup(ECSClient):
-    """
-    安全组api接口
-    接口文档https://next.api.alibabacloud.com/api/Ecs/2014-05-26/CreateSecurityGroup?params={}
-    """
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        
-
-    def create(self, region_id, vpcid, sg_name, **kwargs):
-        """新建安全组
-        """
-        with self as cli:
-            req = models.CreateSecurityGroupRequest(region_id=region_id, security_group_name=sg_name, vpc_id=vpcid, **kwargs)
-            res = cli.create_security_group(req)
-            return res.to_map()['body']
-
-    def delete(self, region_id, sg_id):
-        """删除安全组
-        """
-        with self as cli:
-            req = models.DeleteSecurityGroupRequest(region_id=region_id, security_group_id=sg_id)
-            res = cli.delete_security_group(req)
-            return res.to_map()['body']
-
-    def get(self, region_id, **kwargs) -> list:
-        """获取安全组
-        """
-        with self as cli:
-            req = models.DescribeSecurityGroupsRequest(region_id=region_id, **kwargs)
-            res = cli.describe_security_groups(req)
-            return res.to_map()['body']
-
-    def add(self, sg_id, in_id):
-        """将实例添加进安全组
-        :param sg_id: 安全组id
-        :param in_id: 实例id
-        """
-        with self as cli:
-            req = models.JoinSecurityGroupRequest(security_group_id=sg_id, instance_id=in_id)
-            res = cli.join_security_group(req)
-            return res.to_map()['body']
-
-    def remove(self, sg_id, in_id):
-        """将实例移出安全组
-        """
-        with self as cli:
-            req = models.LeaveSecurityGroupRequest(security_group_id=sg_id, instance_id=in_id)
-            res = cli.leave_security_group(req)
-            return res.to_map()['body']
-
-    types = ['tcp', 'udp', 'icmp', 'gre', 'all']
-    def open_port(self, region_id, sg_id, type, port, source_cidr_ip='0.0.0.0/0', **kwargs):
-        """增加一条入方向组规则,开放端口
-        type: 协议['tcp', 'udp', 'icmp', 'gre', 'all']
-        """
-        if type not in self.types:
-            raise Exception('type param error')
-        # port 处理下格式,如设置8080,格式后为 8080/8080
-        if isinstance(port, int):
-            port = str(port) + '/' + str(port)
-        if isinstance(port, str):
-            if '/' not in port:
-                port = port + '/' + port
-        with self as cli:
-            req = models.AuthorizeSecurityGroupRequest(
-                        region_id=region_id,
-                        security_group_id=sg_id, 
-                        ip_protocol=type, 
-                        port_range=port,
-                        source_port_range=port,
-                        source_cidr_ip=source_cidr_ip,
-                        **kwargs)
-            res = cli.authorize_security_group(req)
-            return res.to_map()['body']
-
-    def close_port(self, region_id, sg_id, type, port, source_cidr_ip='0.0.0.0/0', **kwargs):
-        """删除入方向的组规则,关闭端口
-        """
-        if type not in self.types:
-            raise Exception('type param error')
-        # port 处理下格式,如设置8080,格式后为 8080/8080
-        if isinstance(port, int):
-            port = str(port) + '/' + str(port)
-        if isinstance(port, str):
-            if '/' not in port:
-                port = port + '/' + port
-        with self as cli:
-            req = models.RevokeSecurityGroupRequest(
-                        region_id=region_id,
-                        security_group_id=sg_id, 
-                        ip_protocol=type, 
-                        port_range=port,
-                        source_port_range=port,
-                        source_cidr_ip=source_cidr_ip,
-                        **kwargs)
-            res = cli.revoke_security_group(req)
-            return res.to_map()['body']
-
-    def get_ports(self, region_id, sg_id, **kwargs):
-        """获取安全组规则
-        """
-        with self as cli:
-            req = models.DescribeSecurityGroupAttributeRequest(region_id=region_id, security_group_id=sg_id)
-            res = cli.describe_security_group_attribute(req)
-            return res.to_map()['body']
-
-
-class Image(ECSClient):
-    """镜像操作
-    doc: https://next.api.aliyun.com/api/Ecs/2014-05-26/DescribeImages?params={}
-    """
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-
-    def get(self, region_id, **kwargs):
-        with self as cli:
-            req = models.DescribeImagesRequest(region_id=region_id, **kwargs)
-            res = cli.describe_images(req)
-            return res.to_map()['body']
-
-    def create(self, region_id, in_id, name, **kwargs):
-        with self as cli:
-            req = models.CreateImageRequest(region_id=region_id, instance_id=in_id, image_name=name, **kwargs)
-            res = cli.create_image(req)
-            return res.to_map()['body']
-
+import time
+from .client import ECSClient, AsyncClient
+from .paginate import paginate, apaginate, dig
+from .cache import cached, invalidates
+from .utils import LazyModule, chunked, run_parallel, error_info, backoff, BulkResult, WaitTimeout
+
+models = LazyModule('alibabacloud_ecs20140526.models')
+
+
+def port_range(port):
+    """port 处理下格式,如设置8080,格式后为 8080/8080"""
+    if isinstance(port, int):
+        port = str(port) + '/' + str(port)
+    if isinstance(port, str):
+        if '/' not in port:
+            port = port + '/' + port
+    return port
+
+
+class ECS(ECSClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def get(self, region_id, page_size=100, **kwargs) -> list:
+        """查询所属地域下的ecs实例详细信息
+        接口文档 https://next.api.aliyun.com/api/Ecs/2014-05-26/DescribeInstances?params={}
+        返回值参考 https://next.api.aliyun.com/api/Ecs/2014-05-26/DescribeInstances?params={}
+        :param region_id:实例所属的地域ID
+        """
+        with self as cli:
+            req = models.DescribeInstancesRequest(region_id=region_id, page_size=page_size, **kwargs)
+            res = cli.describe_instances(req).to_map()
+            return res['body']
+
+    def iter_instances(self, region_id, page_size=100, fields=None, **kwargs):
+        """逐条返回地域下的全部ecs实例, 自动翻页, 后台预取下一页
+        :param fields: 只保留的字段, 如 ['InstanceId', 'Status', 'ip=VpcAttributes.PrivateIpAddress.IpAddress.0'],
+                       返回__slots__记录, 见records.record_type
+        :param kwargs: DescribeInstances的过滤参数, 如 v_switch_id, status
+        """
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)
+        return paginate(fetch, 'Instances.Instance', page_size, fields=fields)
+
+    def get_status(self, region_id, page_size=50, **kwargs) -> list:
+        """查询ECS实例的状态信息
+        接口文档 https://next.api.alibabacloud.com/api/Ecs/2014-05-26/DescribeInstanceStatus?params={%22RegionId%22:%22ap-south-1%22}&tab=DEMO&lang=PYTHON
+        :param region_id:实例所属的地域ID
+        """
+        with self as cli:
+            req = models.DescribeInstanceStatusRequest(region_id=region_id, page_size=page_size, **kwargs)
+            res = cli.describe_instance_status(req).to_map()
+            return res['body']
+
+    def iter_status(self, region_id, page_size=50, fields=None, **kwargs):
+        """逐条返回地域下全部实例的状态, 自动翻页"""
+        fetch = lambda n: self.get_status(region_id, page_size=page_size, page_number=n, **kwargs)
+        return paginate(fetch, 'InstanceStatuses.InstanceStatus', page_size, fields=fields)
+
+    def get_regions(self, **kwargs):
+        """查询可用的地域列表
+        接口文档 https://next.api.alibabacloud.com/api/Ecs/2014-05-26/DescribeRegions?params={}
+        """
+        with self as cli:
+            req = models.DescribeRegionsRequest(**kwargs)
+            res = cli.describe_regions(req)
+            return res.to_map()['body']
+
+    @cached('instance_types', ttl=3600)
+    def get_instance_type(self, region_id, image_id, **kwargs) -> list:
+        """查询指定镜像支持的实例规格
+        接口文档 https://next.api.alibabacloud.com/api/Ecs/2014-05-26/DescribeImageSupportInstanceTypes?params='
+        """
+        with self as cli:
+            req = models.DescribeImageSupportInstanceTypesRequest(region_id=region_id, image_id=image_id, **kwargs)
+            res = cli.describe_image_support_instance_types(req)
+            return res.to_map()['body']
+
+    @cached('images', ttl=3600)
+    def get_images(self, region_id, **kwargs):
+        """查询可以使用的镜像资源
+        https://next.api.alibabacloud.com/api/Ecs/2014-05-26/DescribeImages?params={}
+        """
+        with self as cli:
+            req = models.DescribeImagesRequest(region_id=region_id, **kwargs)
+            res = cli.describe_images(req)
+            return res.to_map()['body']
+
+
+    def create(self, region_id, name, image_id, instance_type, v_switch_id, sg_id, size=40, category='cloud_efficiency', spot_strategy='SpotAsPriceGo', **kwargs):
+        """创建实例https://next.api.alibabacloud.com/api/Ecs/2014-05-26/CreateInstance?params={}
+        image_id: 镜像id
+        instance_type: 实例规格
+        v_switch_id: vpc实例id
+        磁盘默认 40G，高效磁盘, SpotAsPriceGo抢占式实例
+        """
+        with self as cli:
+            system_disk = models.CreateInstanceRequestSystemDisk(
+                    size=size,
+                    category=category,
+                )
+            req = models.CreateInstanceRequest(
+                    region_id=region_id,
+                    instance_name=name,
+                    image_id=image_id,
+                    instance_type=instance_type, 
+                    v_switch_id=v_switch_id,
+                    security_group_id=sg_id,
+                    spot_strategy=spot_strategy,
+                    system_disk=system_disk,
+                    **kwargs)
+            res = cli.create_instance(req)
+            return res.to_map()['body']
+
+    # RunInstances 单次最多创建100台
+    run_limit = 100
+
+    def run(self, region_id, name, image_id, instance_type, v_switch_id, sg_id, amount=1, size=40, category='cloud_efficiency', spot_strategy='SpotAsPriceGo', **kwargs):
+        """RunInstances 创建并启动amount台实例, 默认值与create一致
+        https://next.api.alibabacloud.com/api/Ecs/2014-05-26/RunInstances
+        返回body, 实例id在 InstanceIdSets.InstanceIdSet
+        """
+        with self as cli:
+            system_disk = models.RunInstancesRequestSystemDisk(size=str(size), category=category)
+            req = models.RunInstancesRequest(
+                    region_id=region_id,
+                    instance_name=name,
+                    image_id=image_id,
+                    instance_type=instance_type,
+                    v_switch_id=v_switch_id,
+                    security_group_id=sg_id,
+                    spot_strategy=spot_strategy,
+                    system_disk=system_disk,
+                    amount=amount,
+                    **kwargs)
+            res = cli.run_instances(req)
+            return res.to_map()['body']
+
+    def iter_run(self, region_id, name, image_id, instance_type, v_switch_ids, sg_id, count, chunk_size=100, parallel=4, **kwargs):
+        """批量创建并启动count台实例, 逐批返回结果
+        v_switch_ids: 交换机id或列表, count平均分配到各交换机(可跨可用区), 每个交换机再按chunk_size切分, 并发请求
+        实例名为 name-0001 起的顺序编号
+        每个请求完成时返回 {'VSwitchId', 'Amount', 'InstanceIds', 'Success', 'Code', 'Message', 'RequestId'}
+        """
+        if isinstance(v_switch_ids, str):
+            v_switch_ids = [v_switch_ids]
+        if not v_switch_ids:
+            raise ValueError('v_switch_ids is empty')
+        if chunk_size <= 0 or parallel <= 0:
+            raise ValueError('chunk_size and parallel must be positive')
+        # 参数检查在调用时立即进行, 不等到第一次迭代
+        return self._iter_run(region_id, name, image_id, instance_type, list(v_switch_ids), sg_id, count,
+                              chunk_size, parallel, **kwargs)
+
+    def _iter_run(self, region_id, name, image_id, instance_type, v_switch_ids, sg_id, count, chunk_size, parallel, **kwargs):
+        size = min(chunk_size, self.run_limit)
+        chunks, offset = [], 0
+        for i, v_switch_id in enumerate(v_switch_ids):
+            share = count // len(v_switch_ids) + (i < count % len(v_switch_ids))
+            for amount in [size] * (share // size) + ([share % size] if share % size else []):
+                chunks.append((v_switch_id, offset, amount))
+                offset += amount
+
+        def send(chunk):
+            v_switch_id, offset, amount = chunk
+            # 有序命名 name-[起始编号,位数]
+            instance_name = '%s-[%d,4]' % (name, offset + 1) if count > 1 and '[' not in name else name
+            return self.run(region_id, instance_name, image_id, instance_type, v_switch_id, sg_id, amount, **kwargs)
+
+        for (v_switch_id, _, amount), body, e in run_parallel(send, chunks, parallel):
+            item = {'VSwitchId': v_switch_id, 'Amount': amount, 'InstanceIds': [], 'Success': e is None,
+                    'Code': None, 'Message': None, 'RequestId': None}
+            if e is None:
+                item.update(InstanceIds=dig(body, 'InstanceIdSets.InstanceIdSet'), RequestId=body.get('RequestId'))
+            else:
+                info = error_info(e)
+                item.update(Code=info['Code'], Message=info['Message'], RequestId=info['RequestId'])
+            yield item
+
+    def bulk_run(self, region_id, name, image_id, instance_type, v_switch_ids, sg_id, count, callback=None, **kwargs) -> dict:
+        """批量创建并启动count台实例, 参数同iter_run
+        callback(item): 每个请求完成时调用, 可在全部完成前处理已创建的实例
+        返回 {'InstanceIds': 全部实例id, 'failed': 失败的请求}
+        """
+        result = {'InstanceIds': [], 'failed': []}
+        for item in self.iter_run(region_id, name, image_id, instance_type, v_switch_ids, sg_id, count, **kwargs):
+            result['InstanceIds'] += item['InstanceIds']
+            if not item['Success']:
+                result['failed'].append(item)
+            if callback is not None:
+                callback(item)
+        return result
+
+    def delete(self, region_id, in_id, **kwargs):
+        """删除实例
+        in_id: 实例id;
+        in_id为list时,支持批量删除
+        """
+        with self as cli:
+            if isinstance(in_id, str):
+                req = models.DeleteInstanceRequest(instance_id=in_id, **kwargs)
+                res = cli.delete_instance(req)
+            if isinstance(in_id, list):
+                req = models.DeleteInstancesRequest(region_id=region_id, instance_id=in_id, **kwargs)
+                res = cli.delete_instances(req)
+            return res.to_map()['body']
+
+    def update(self):
+        pass
+
+    def options_ecs(self, option, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
+        """实例操作, 启动, 停止, 重启
+        """
+        with self as cli:
+            if isinstance(in_id, str):
+                if option == 'start':
+                    req = models.StartInstanceRequest(instance_id=in_id, **kwargs)
+                    res = cli.start_instance(req)
+                if option == 'stop':
+                    req = models.StopInstanceRequest(instance_id=in_id, **kwargs)
+                    res = cli.stop_instance(req)
+                if option == 'restart':
+                    req = models.RebootInstanceRequest(instance_id=in_id, **kwargs)
+                    res = cli.reboot_instance(req)
+            if isinstance(in_id, list):
+                if option == 'start':
+                    req = models.StartInstancesRequest(region_id=region_id, instance_id=in_id, batch_optimization=batch_optimization, **kwargs)
+                    res = cli.start_instances(req)
+                if option == 'stop':
+                    req = models.StopInstancesRequest(region_id=region_id, instance_id=in_id, batch_optimization=batch_optimization, **kwargs)
+                    res = cli.stop_instances(req)
+                if option == 'restart':
+                    req = models.RebootInstancesRequest(region_id=region_id, instance_id=in_id, batch_optimization=batch_optimization, **kwargs)
+                    res = cli.reboot_instances(req)
+            return res.to_map()['body']
+
+    def start(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
+        return self.options_ecs('start', region_id, in_id, batch_optimization='SuccessFirst', **kwargs)
+
+    def stop(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
+        return self.options_ecs('stop',  region_id, in_id, batch_optimization='SuccessFirst', **kwargs)
+
+    def restart(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
+        return self.options_ecs('restart',  region_id, in_id, batch_optimization='SuccessFirst', **kwargs)
+
+    # DeleteInstances/StartInstances/StopInstances/RebootInstances 单次最多100个实例
+    batch_limit = 100
+
+    def bulk_options(self, option, region_id, in_ids, chunk_size=100, parallel=4, batch_optimization='SuccessFirst', **kwargs) -> BulkResult:
+        """批量操作实例, 按chunk_size切分后并发请求
+        option: start, stop, restart, delete
+        返回BulkResult, 包含每个实例的成功/失败, 错误码和RequestId
+        """
+        if chunk_size <= 0 or parallel <= 0:
+            raise ValueError('chunk_size and parallel must be positive')
+        result = BulkResult()
+
+        def send(chunk):
+            if option == 'delete':
+                return self.delete(region_id, chunk, **kwargs)
+            return self.options_ecs(option, region_id, chunk, batch_optimization, **kwargs)
+
+        chunks = chunked(in_ids, min(chunk_size, self.batch_limit))
+        for chunk, body, e in run_parallel(send, chunks, parallel):
+            if e is not None:
+                info = error_info(e)
+                for in_id in chunk:
+                    result.add(in_id, False, info['Code'], info['Message'], info['RequestId'])
+                continue
+            # SuccessFirst模式下逐个返回实例结果, DeleteInstances只返回RequestId
+            responses = {r['InstanceId']: r for r in dig(body, 'InstanceResponses.InstanceResponse')}
+            for in_id in chunk:
+                r = responses.get(in_id, {})
+                code = str(r.get('Code', '200'))
+                result.add(in_id, code == '200', code, r.get('Message'), body.get('RequestId'), CurrentStatus=r.get('CurrentStatus'))
+        return result.done()
+
+    def bulk_start(self, region_id, in_ids, **kwargs) -> BulkResult:
+        return self.bulk_options('start', region_id, in_ids, **kwargs)
+
+    def bulk_stop(self, region_id, in_ids, **kwargs) -> BulkResult:
+        return self.bulk_options('stop', region_id, in_ids, **kwargs)
+
+    def bulk_restart(self, region_id, in_ids, **kwargs) -> BulkResult:
+        return self.bulk_options('restart', region_id, in_ids, **kwargs)
+
+    def bulk_delete(self, region_id, in_ids, **kwargs) -> BulkResult:
+        return self.bulk_options('delete', region_id, in_ids, **kwargs)
+
+    def wait_for(self, region_id, in_ids, state='Running', timeout=600, interval=2, max_interval=30):
+        """等待实例达到指定状态, 如 Running, Stopped
+        每轮用一次分页的DescribeInstanceStatus查询全部未就绪实例, 已就绪的实例不再查询,
+        轮询间隔指数退避并加入随机抖动
+        返回 {实例id: 状态}, 超时抛出 WaitTimeout
+        """
+        pending = set([in_ids] if isinstance(in_ids, str) else in_ids)
+        statuses = {}
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            for item in self.iter_status(region_id, **_status_filter(pending)):
+                if item['InstanceId'] in pending:
+                    statuses[item['InstanceId']] = item['Status']
+            pending -= {i for i in pending if statuses.get(i) == state}
+            if not pending:
+                return statuses
+            delay = backoff(attempt, interval, max_interval)
+            if time.monotonic() + delay > deadline:
+                raise WaitTimeout('instances not %s after %ss: %s' % (state, timeout, sorted(pending)), pending, statuses)
+            time.sleep(delay)
+            attempt += 1
+
+def _status_filter(pending):
+    # 未就绪实例不超过100个时按实例id过滤, 否则查询整个地域
+    return {'instance_id': sorted(pending)} if len(pending) <= 100 else {}
+
+
+class PubKey(ECSClient):
+    """
+    密钥对 api
+    接口文档 https://next.api.alibabacloud.com/api/Ecs/2014-05-26/CreateKeyPair?params={}
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def create(self, region_id, key_name, **kwargs):
+        """新建
+        """
+        with self as cli:
+            req = models.CreateKeyPairRequest(region_id=region_id, key_pair_name=key_name, **kwargs)
+            res = cli.create_key_pair(req)
+            return res.to_map()['body']
+
+    def delete(self, region_id, key_name):
+        """删除"""
+        if isinstance(key_name, str):
+            key_name = str([key_name])
+        if isinstance(key_name, list):
+            key_name = str(key_name)
+        with self as cli:
+            req = models.DeleteKeyPairsRequest(region_id=region_id, key_pair_names=key_name)
+            res = cli.delete_key_pairs(req)
+            return res.to_map()['body']
+
+    def get(self, region_id, **kwargs):
+        with self as cli:
+            req = models.DescribeKeyPairsRequest(region_id=region_id, **kwargs)
+            res = cli.describe_key_pairs(req)
+            return res.to_map()['body']
+
+class SecurityGroup(ECSClient):
+    """
+    安全组api接口
+    接口文档https://next.api.alibabacloud.com/api/Ecs/2014-05-26/CreateSecurityGroup?params={}
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+
+    @invalidates(('security_groups', 'region_id'))
+    def create(self, region_id, vpcid, sg_name, **kwargs):
+        """新建安全组
+        """
+        with self as cli:
+            req = models.CreateSecurityGroupRequest(region_id=region_id, security_group_name=sg_name, vpc_id=vpcid, **kwargs)
+            res = cli.create_security_group(req)
+            return res.to_map()['body']
+
+    @invalidates(('security_groups', 'region_id'), ('sg_rules', 'region_id', 'sg_id'))
+    def delete(self, region_id, sg_id):
+        """删除安全组
+        """
+        with self as cli:
+            req = models.DeleteSecurityGroupRequest(region_id=region_id, security_group_id=sg_id)
+            res = cli.delete_security_group(req)
+            return res.to_map()['body']
+
+    @cached('security_groups', ttl=60)
+    def get(self, region_id, **kwargs) -> list:
+        """获取安全组
+        """
+        with self as cli:
+            req = models.DescribeSecurityGroupsRequest(region_id=region_id, **kwargs)
+            res = cli.describe_security_groups(req)
+            return res.to_map()['body']
+
+    def iter_groups(self, region_id, page_size=50, fields=None, **kwargs):
+        """逐条返回全部安全组, 自动翻页"""
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)
+        return paginate(fetch, 'SecurityGroups.SecurityGroup', page_size, fields=fields)
+
+    def add(self, sg_id, in_id):
+        """将实例添加进安全组
+        :param sg_id: 安全组id
+        :param in_id: 实例id
+        """
+        with self as cli:
+            req = models.JoinSecurityGroupRequest(security_group_id=sg_id, instance_id=in_id)
+            res = cli.join_security_group(req)
+            return res.to_map()['body']
+
+    def remove(self, sg_id, in_id):
+        """将实例移出安全组
+        """
+        with self as cli:
+            req = models.LeaveSecurityGroupRequest(security_group_id=sg_id, instance_id=in_id)
+            res = cli.leave_security_group(req)
+            return res.to_map()['body']
+
+    types = ['tcp', 'udp', 'icmp', 'gre', 'all']
+    @invalidates(('sg_rules', 'region_id', 'sg_id'))
+    def open_port(self, region_id, sg_id, type, port, source_cidr_ip='0.0.0.0/0', **kwargs):
+        """增加一条入方向组规则,开放端口
+        type: 协议['tcp', 'udp', 'icmp', 'gre', 'all']
+        """
+        if type not in self.types:
+            raise Exception('type param error')
+        port = port_range(port)
+        with self as cli:
+            req = models.AuthorizeSecurityGroupRequest(
+                        region_id=region_id,
+                        security_group_id=sg_id, 
+                        ip_protocol=type, 
+                        port_range=port,
+                        source_port_range=port,
+                        source_cidr_ip=source_cidr_ip,
+                        **kwargs)
+            res = cli.authorize_security_group(req)
+            return res.to_map()['body']
+
+    @invalidates(('sg_rules', 'region_id', 'sg_id'))
+    def close_port(self, region_id, sg_id, type, port, source_cidr_ip='0.0.0.0/0', **kwargs):
+        """删除入方向的组规则,关闭端口
+        """
+        if type not in self.types:
+            raise Exception('type param error')
+        port = port_range(port)
+        with self as cli:
+            req = models.RevokeSecurityGroupRequest(
+                        region_id=region_id,
+                        security_group_id=sg_id, 
+                        ip_protocol=type, 
+                        port_range=port,
+                        source_port_range=port,
+                        source_cidr_ip=source_cidr_ip,
+                        **kwargs)
+            res = cli.revoke_security_group(req)
+            return res.to_map()['body']
+
+    @cached('sg_rules', ttl=60)
+    def get_ports(self, region_id, sg_id, **kwargs):
+        """获取安全组规则
+        """
+        with self as cli:
+            req = models.DescribeSecurityGroupAttributeRequest(region_id=region_id, security_group_id=sg_id)
+            res = cli.describe_security_group_attribute(req)
+            return res.to_map()['body']
+
+    @staticmethod
+    def rule_key(type, port, source_cidr_ip='0.0.0.0/0', policy='accept'):
+        """规则的比较键 (协议, 端口范围, 源地址段, 授权策略), 策略为 accept 或 drop"""
+        type = type.lower()
+        port = '-1/-1' if type in ('icmp', 'gre', 'all') and port in (None, -1, '-1') else port_range(port)
+        return type, port, source_cidr_ip, (policy or 'accept').lower()
+
+    def plan(self, region_id, sg_id, desired_rules, prune=True) -> dict:
+        """对比当前入方向规则与期望规则, 返回需要执行的最少操作
+        desired_rules: [(协议, 端口, 源地址段, 策略)] 或 [{'type', 'port', 'source_cidr_ip', 'policy'}],
+                       源地址段默认 0.0.0.0/0, 策略默认 accept
+        prune: 是否删除期望规则之外的规则
+        返回 {'add': [规则键], 'remove': [当前规则], 'unchanged': n}
+        """
+        if self.cache is not None:
+            self.cache.invalidate('sg_rules', self.endpoint, self._key[0], region_id=region_id, sg_id=sg_id)
+        permissions = dig(self.get_ports(region_id, sg_id), 'Permissions.Permission')
+        # 只管理按地址段授权的入方向规则
+        current = {}
+        for p in permissions:
+            if p.get('Direction') == 'ingress' and p.get('SourceCidrIp'):
+                current[self.rule_key(p['IpProtocol'], p['PortRange'], p['SourceCidrIp'], p.get('Policy'))] = p
+        desired = set()
+        for rule in desired_rules:
+            desired.add(self.rule_key(**rule) if isinstance(rule, dict) else self.rule_key(*rule))
+        return {
+            'add': sorted(desired - set(current)),
+            'remove': [current[k] for k in sorted(set(current) - desired)] if prune else [],
+            'unchanged': len(desired & set(current)),
+        }
+
+    @invalidates(('sg_rules', 'region_id', 'sg_id'))
+    def sync(self, region_id, sg_id, desired_rules, prune=True, dry_run=False, parallel=4) -> dict:
+        """将安全组的入方向规则同步为desired_rules
+        只读取一次当前规则, 按(协议, 端口范围, 源地址段, 策略)比较, 只执行必要的授权/撤销, 并发执行
+        设置了Client.limiter时请求受限流控制
+        dry_run=True 时只返回plan, 不做修改
+        返回plan, 执行后增加 'result': BulkResult
+        """
+        plan = self.plan(region_id, sg_id, desired_rules, prune)
+        if dry_run:
+            return plan
+        calls = [('add', rule) for rule in plan['add']] + [('remove', p) for p in plan['remove']]
+
+        def send(call):
+            action, rule = call
+            with self as cli:
+                if action == 'add':
+                    type, port, cidr, policy = rule
+                    req = models.AuthorizeSecurityGroupRequest(region_id=region_id, security_group_id=sg_id,
+                                                               ip_protocol=type, port_range=port, source_cidr_ip=cidr,
+                                                               policy=policy)
+                    return cli.authorize_security_group(req).to_map()['body']
+                req = models.RevokeSecurityGroupRequest(region_id=region_id, security_group_id=sg_id,
+                                                        ip_protocol=rule['IpProtocol'].lower(), port_range=rule['PortRange'],
+                                                        source_cidr_ip=rule['SourceCidrIp'],
+                                                        source_port_range=rule.get('SourcePortRange') or None,
+                                                        policy=rule.get('Policy') or None,
+                                                        nic_type=rule.get('NicType') or None)
+                return cli.revoke_security_group(req).to_map()['body']
+
+        result = BulkResult()
+        for (action, rule), body, e in run_parallel(send, calls, parallel):
+            key = ' '.join(rule) if action == 'add' else ' '.join(
+                self.rule_key(rule['IpProtocol'], rule['PortRange'], rule['SourceCidrIp'], rule.get('Policy')))
+            if e is None:
+                result.add(key, True, request_id=body.get('RequestId'), Action=action)
+            else:
+                info = error_info(e)
+                result.add(key, False, info['Code'], info['Message'], info['RequestId'], Action=action)
+        plan['result'] = result.done()
+        return plan
+
+    def sync_many(self, region_id, sg_ids, desired_rules, prune=True, dry_run=False, parallel=4) -> dict:
+        """将同一套规则并发同步到多个安全组, 返回 {sg_id: plan或异常}"""
+        results = {}
+        sync = lambda sg_id: self.sync(region_id, sg_id, desired_rules, prune, dry_run, parallel)
+        for sg_id, plan, e in run_parallel(sync, sg_ids, parallel):
+            results[sg_id] = plan if e is None else e
+        return results
+
+
+class Image(ECSClient):
+    """镜像操作
+    doc: https://next.api.aliyun.com/api/Ecs/2014-05-26/DescribeImages?params={}
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+    @cached('images', ttl=3600)
+    def get(self, region_id, **kwargs):
+        with self as cli:
+            req = models.DescribeImagesRequest(region_id=region_id, **kwargs)
+            res = cli.describe_images(req)
+            return res.to_map()['body']
+
+    @invalidates(('images', 'region_id'))
+    def create(self, region_id, in_id, name, **kwargs):
+        with self as cli:
+            req = models.CreateImageRequest(region_id=region_id, instance_id=in_id, image_name=name, **kwargs)
+            res = cli.create_image(req)
+            return res.to_map()['body']
+
+
+class AsyncECS(AsyncClient, ECSClient):
+    """ECS的异步版本, 方法与ECS一致, 需await调用"""
+    async def get(self, region_id, page_size=100, **kwargs) -> list:
+        req = models.DescribeInstancesRequest(region_id=region_id, page_size=page_size, **kwargs)
+        return (await self._call('describe_instances', req))['body']
+
+    def iter_instances(self, region_id, page_size=100, fields=None, **kwargs):
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)
+        return apaginate(fetch, 'Instances.Instance', page_size, fields=fields)
+
+    async def get_status(self, region_id, page_size=50, **kwargs) -> list:
+        req = models.DescribeInstanceStatusRequest(region_id=region_id, page_size=page_size, **kwargs)
+        return (await self._call('describe_instance_status', req))['body']
+
+    def iter_status(self, region_id, page_size=50, fields=None, **kwargs):
+        fetch = lambda n: self.get_status(region_id, page_size=page_size, page_number=n, **kwargs)
+        return apaginate(fetch, 'InstanceStatuses.InstanceStatus', page_size, fields=fields)
+
+    @cached('instance_types', ttl=3600)
+    async def get_instance_type(self, region_id, image_id, **kwargs) -> list:
+        req = models.DescribeImageSupportInstanceTypesRequest(region_id=region_id, image_id=image_id, **kwargs)
+        return (await self._call('describe_image_support_instance_types', req))['body']
+
+    @cached('images', ttl=3600)
+    async def get_images(self, region_id, **kwargs):
+        req = models.DescribeImagesRequest(region_id=region_id, **kwargs)
+        return (await self._call('describe_images', req))['body']
+
+    async def create(self, region_id, name, image_id, instance_type, v_switch_id, sg_id, size=40, category='cloud_efficiency', spot_strategy='SpotAsPriceGo', **kwargs):
+        system_disk = models.CreateInstanceRequestSystemDisk(size=size, category=category)
+        req = models.CreateInstanceRequest(
+                region_id=region_id,
+                instance_name=name,
+                image_id=image_id,
+                instance_type=instance_type,
+                v_switch_id=v_switch_id,
+                security_group_id=sg_id,
+                spot_strategy=spot_strategy,
+                system_disk=system_disk,
+                **kwargs)
+        return (await self._call('create_instance', req))['body']
+
+    async def run(self, region_id, name, image_id, instance_type, v_switch_id, sg_id, amount=1, size=40, category='cloud_efficiency', spot_strategy='SpotAsPriceGo', **kwargs):
+        system_disk = models.RunInstancesRequestSystemDisk(size=str(size), category=category)
+        req = models.RunInstancesRequest(
+                region_id=region_id,
+                instance_name=name,
+                image_id=image_id,
+                instance_type=instance_type,
+                v_switch_id=v_switch_id,
+                security_group_id=sg_id,
+                spot_strategy=spot_strategy,
+                system_disk=system_disk,
+                amount=amount,
+                **kwargs)
+        return (await self._call('run_instances', req))['body']
+
+    async def delete(self, region_id, in_id, **kwargs):
+        if isinstance(in_id, str):
+            res = await self._call('delete_instance', models.DeleteInstanceRequest(instance_id=in_id, **kwargs))
+        if isinstance(in_id, list):
+            res = await self._call('delete_instances', models.DeleteInstancesRequest(region_id=region_id, instance_id=in_id, **kwargs))
+        return res['body']
+
+    _options = {
+        'start': ('start_instance', 'StartInstanceRequest', 'start_instances', 'StartInstancesRequest'),
+        'stop': ('stop_instance', 'StopInstanceRequest', 'stop_instances', 'StopInstancesRequest'),
+        'restart': ('reboot_instance', 'RebootInstanceRequest', 'reboot_instances', 'RebootInstancesRequest'),
+    }
+
+    async def options_ecs(self, option, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
+        action, request, batch_action, batch_request = self._options[option]
+        if isinstance(in_id, str):
+            res = await self._call(action, getattr(models, request)(instance_id=in_id, **kwargs))
+        if isinstance(in_id, list):
+            req = getattr(models, batch_request)(region_id=region_id, instance_id=in_id, batch_optimization=batch_optimization, **kwargs)
+            res = await self._call(batch_action, req)
+        return res['body']
+
+    async def start(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
+        return await self.options_ecs('start', region_id, in_id, batch_optimization, **kwargs)
+
+    async def stop(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
+        return await self.options_ecs('stop', region_id, in_id, batch_optimization, **kwargs)
+
+    async def restart(self, region_id, in_id, batch_optimization='SuccessFirst', **kwargs):
+        return await self.options_ecs('restart', region_id, in_id, batch_optimization, **kwargs)
+
+    async def wait_for(self, region_id, in_ids, state='Running', timeout=600, interval=2, max_interval=30):
+        import asyncio
+        pending = set([in_ids] if isinstance(in_ids, str) else in_ids)
+        statuses = {}
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            async for item in self.iter_status(region_id, **_status_filter(pending)):
+                if item['InstanceId'] in pending:
+                    statuses[item['InstanceId']] = item['Status']
+            pending -= {i for i in pending if statuses.get(i) == state}
+            if not pending:
+                return statuses
+            delay = backoff(attempt, interval, max_interval)
+            if time.monotonic() + delay > deadline:
+                raise WaitTimeout('instances not %s after %ss: %s' % (state, timeout, sorted(pending)), pending, statuses)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class AsyncSecurityGroup(AsyncClient, ECSClient):
+    """SecurityGroup的异步版本"""
+    types = SecurityGroup.types
+
+    @invalidates(('security_groups', 'region_id'))
+    async def create(self, region_id, vpcid, sg_name, **kwargs):
+        req = models.CreateSecurityGroupRequest(region_id=region_id, security_group_name=sg_name, vpc_id=vpcid, **kwargs)
+        return (await self._call('create_security_group', req))['body']
+
+    @invalidates(('security_groups', 'region_id'), ('sg_rules', 'region_id', 'sg_id'))
+    async def delete(self, region_id, sg_id):
+        req = models.DeleteSecurityGroupRequest(region_id=region_id, security_group_id=sg_id)
+        return (await self._call('delete_security_group', req))['body']
+
+    @cached('security_groups', ttl=60)
+    async def get(self, region_id, **kwargs) -> list:
+        req = models.DescribeSecurityGroupsRequest(region_id=region_id, **kwargs)
+        return (await self._call('describe_security_groups', req))['body']
+
+    def iter_groups(self, region_id, page_size=50, fields=None, **kwargs):
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)
+        return apaginate(fetch, 'SecurityGroups.SecurityGroup', page_size, fields=fields)
+
+    async def add(self, sg_id, in_id):
+        req = models.JoinSecurityGroupRequest(security_group_id=sg_id, instance_id=in_id)
+        return (await self._call('join_security_group', req))['body']
+
+    async def remove(self, sg_id, in_id):
+        req = models.LeaveSecurityGroupRequest(security_group_id=sg_id, instance_id=in_id)
+        return (await self._call('leave_security_group', req))['body']
+
+    @invalidates(('sg_rules', 'region_id', 'sg_id'))
+    async def open_port(self, region_id, sg_id, type, port, source_cidr_ip='0.0.0.0/0', **kwargs):
+        if type not in self.types:
+            raise Exception('type param error')
+        port = port_range(port)
+        req = models.AuthorizeSecurityGroupRequest(
+                    region_id=region_id,
+                    security_group_id=sg_id,
+                    ip_protocol=type,
+                    port_range=port,
+                    source_port_range=port,
+                    source_cidr_ip=source_cidr_ip,
+                    **kwargs)
+        return (await self._call('authorize_security_group', req))['body']
+
+    @invalidates(('sg_rules', 'region_id', 'sg_id'))
+    async def close_port(self, region_id, sg_id, type, port, source_cidr_ip='0.0.0.0/0', **kwargs):
+        if type not in self.types:
+            raise Exception('type param error')
+        port = port_range(port)
+        req = models.RevokeSecurityGroupRequest(
+                    region_id=region_id,
+                    security_group_id=sg_id,
+                    ip_protocol=type,
+                    port_range=port,
+                    source_port_range=port,
+                    source_cidr_ip=source_cidr_ip,
+                    **kwargs)
+        return (await self._call('revoke_security_group', req))['body']
+
+    @cached('sg_rules', ttl=60)
+    async def get_ports(self, region_id, sg_id, **kwargs):
+        req = models.DescribeSecurityGroupAttributeRequest(region_id=region_id, security_group_id=sg_id)
+        return (await self._call('describe_security_group_attribute', req))['body']
@@ -0,0 +1,206 @@
+"""预先申请的EIP池
+按(地域, 计费方式, 带宽)保持一定数量已申请未绑定的EIP, acquire时直接取出, 不等待AllocateEipAddress:
+    pool = EIPPool(EIP.for_region(ak, sk, 'ap-south-1'), size=3).start()
+    pool.warm('ap-south-1', bandwidth=5)
+    eip = pool.acquire('ap-south-1', bandwidth=5)    # {'AllocationId', 'EipAddress'}
+    ...
+    pool.release(eip)    # 解绑后归还, 不释放
+后台线程定期补足空闲EIP, 长时间没有acquire的规格缩减到min_size
+"""
+import threading
+import time
+from .utils import run_parallel, error_info
+
+__all__ = ('EIPPool',)
+
+
+class EIPPool:
+    """EIP池
+    eip: vpc.EIP 实例
+    size: 每个规格保持的空闲EIP数; max_size: 每个规格最多保留的空闲EIP数, release超出时释放
+    min_size: 规格空闲超过idle_timeout秒后缩减到的数量
+    interval: 后台补充和缩减的间隔秒数
+    name: 池中EIP的名称, adopt按名称收回上次进程遗留的EIP, 为None时不设置名称
+    kwargs 透传给AllocateEipAddress
+    """
+    def __init__(self, eip, size=2, max_size=None, min_size=0, interval=30, idle_timeout=1800,
+                 name='eip-pool', parallel=4, **kwargs):
+        self.eip = eip
+        self.size = size
+        self.max_size = size * 2 if max_size is None else max_size
+        self.min_size = min_size
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.name = name
+        self.parallel = parallel
+        self.kwargs = kwargs
+        self.hits = 0
+        self.misses = 0
+        self.errors = []  # 后台补充和缩减的最近错误
+        self._idle = {}  # 规格 -> [eip]
+        self._pending = {}  # 规格 -> 申请中的数量
+        self._used = {}  # 规格 -> 最近一次acquire的时间
+        self._leased = {}  # AllocationId -> (规格, acquire返回的eip)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refill = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _spec(region_id, type, bandwidth):
+        return region_id, type, str(bandwidth)
+
+    def _allocate(self, spec):
+        region_id, type, bandwidth = spec
+        kwargs = dict(self.kwargs, name=self.name) if self.name else self.kwargs
+        body = self.eip.create(region_id, type, bandwidth, **kwargs)['body']
+        return {'AllocationId': body['AllocationId'], 'EipAddress': body['EipAddress'], 'RegionId': region_id}
+
+    def _fill(self, spec, target):
+        # 并发申请到target个空闲EIP
+        with self._lock:
+            missing = target - len(self._idle.get(spec, [])) - self._pending.get(spec, 0)
+            if missing <= 0:
+                return 0
+            self._pending[spec] = self._pending.get(spec, 0) + missing
+        added = 0
+        for _, eip, e in run_parallel(lambda _: self._allocate(spec), range(missing), self.parallel):
+            with self._lock:
+                self._pending[spec] -= 1
+                if e is None:
+                    self._idle.setdefault(spec, []).append(eip)
+                    added += 1
+            if e is not None:
+                self.errors = (self.errors + [error_info(e)])[-20:]
+        return added
+
+    def _trim(self, spec, target):
+        # 释放多于target个的空闲EIP
+        with self._lock:
+            idle = self._idle.get(spec, [])
+            extra, self._idle[spec] = idle[target:], idle[:target]
+        for eip, _, e in run_parallel(lambda eip: self.eip.delete(eip['RegionId'], eip['AllocationId']), extra, self.parallel):
+            if e is not None:
+                # 释放失败的放回池中, 下次再试
+                self.errors = (self.errors + [error_info(e)])[-20:]
+                with self._lock:
+                    self._idle[spec].append(eip)
+        return len(extra)
+
+    def warm(self, region_id, type='PayByTraffic', bandwidth='200', size=None) -> int:
+        """立即申请该规格的EIP到size个(默认self.size), 并由后台线程保持, 返回新申请的数量"""
+        spec = self._spec(region_id, type, bandwidth)
+        with self._lock:
+            self._used[spec] = time.monotonic()
+        return self._fill(spec, self.size if size is None else size)
+
+    def adopt(self, region_id, type='PayByTraffic', bandwidth='200') -> int:
+        """收回地域中名称为self.name且未绑定的EIP, 如上次进程退出时池中剩余的, 返回收回的数量"""
+        spec = self._spec(region_id, type, bandwidth)
+        found = []
+        # DescribeEipAddresses 不支持按名称过滤, 取出未绑定的EIP后按Name筛选
+        for item in self.eip.iter_eips(region_id, status='Available'):
+            if item.get('Name') != self.name:
+                continue
+            if str(item.get('Bandwidth')) == spec[2] and item.get('InternetChargeType', type) == type:
+                found.append({'AllocationId': item['AllocationId'], 'EipAddress': item['IpAddress'], 'RegionId': region_id})
+        with self._lock:
+            idle = self._idle.setdefault(spec, [])
+            known = {e['AllocationId'] for e in idle} | set(self._leased)
+            found = [e for e in found if e['AllocationId'] not in known]
+            idle.extend(found)
+            self._used.setdefault(spec, time.monotonic())
+        return len(found)
+
+    def acquire(self, region_id, type='PayByTraffic', bandwidth='200') -> dict:
+        """取出一个空闲EIP, 池中没有时同步申请; 返回 {'AllocationId', 'EipAddress', 'RegionId'}"""
+        spec = self._spec(region_id, type, bandwidth)
+        with self._lock:
+            self._used[spec] = time.monotonic()
+            idle = self._idle.get(spec)
+            eip = idle.pop(0) if idle else None
+            if eip is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if eip is None:
+            eip = self._allocate(spec)
+        with self._lock:
+            self._leased[eip['AllocationId']] = (spec, eip)
+        if self._thread is not None:
+            # 立即在后台补充, 不等下一个interval
+            self._refill.set()
+        return eip
+
+    def release(self, eip):
+        """归还acquire取得的EIP或其AllocationId, 需已解绑; 空闲数达到max_size时直接释放"""
+        allocation_id = eip['AllocationId'] if isinstance(eip, dict) else eip
+        with self._lock:
+            leased = self._leased.pop(allocation_id, None)
+            if leased is None:
+                raise ValueError('EIP %s was not acquired from this pool' % allocation_id)
+            spec, eip = leased
+            idle = self._idle.setdefault(spec, [])
+            keep = len(idle) < self.max_size
+            if keep:
+                idle.append(eip)
+        if not keep:
+            self.eip.delete(spec[0], allocation_id)
+
+    def refresh(self):
+        """补充或缩减全部规格, 后台线程每interval秒调用一次"""
+        now = time.monotonic()
+        with self._lock:
+            specs = [(spec, now - used > self.idle_timeout) for spec, used in self._used.items()]
+        for spec, idle in specs:
+            if idle:
+                self._trim(spec, self.min_size)
+            else:
+                self._fill(spec, self.size)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._refill.wait(self.interval)
+            self._refill.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                self.errors = (self.errors + [error_info(e)])[-20:]
+
+    def start(self):
+        """启动后台补充线程"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='eip-pool', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, drain=False):
+        """停止后台线程, drain=True 时释放全部空闲EIP"""
+        if self._thread is not None:
+            self._stop.set()
+            self._refill.set()
+            self._thread.join()
+            self._thread = None
+        if drain:
+            with self._lock:
+                specs = list(self._idle)
+            for spec in specs:
+                self._trim(spec, 0)
+
+    def stats(self) -> dict:
+        """{(地域, 计费方式, 带宽): {'idle', 'pending', 'leased'}}"""
+        with self._lock:
+            leased = {}
+            for spec, _ in self._leased.values():
+                leased[spec] = leased.get(spec, 0) + 1
+            return {spec: {'idle': len(self._idle.get(spec, [])), 'pending': self._pending.get(spec, 0), 'leased': leased.get(spec, 0)}
+                    for spec in set(self._idle) | set(self._used) | set(leased)}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,228 @@
+"""创建一套新环境
+按声明式的环境描述生成依赖图, 没有依赖关系的步骤并发执行:
+    VPC -> VSwitch -> SecurityGroup + 端口 -> N×ECS -> SLB + 服务器组 + 监听 -> NAT + EIP + DNAT
+例:
+    spec = {
+        'name': 'demo',
+        'vpc': {'cidr_block': '10.0.0.0/8'},
+        'vswitches': [{'name': 'vsw-a', 'zone_id': 'ap-south-1a', 'cidr_block': '10.1.0.0/24'}],
+        'security_group': {'ports': [('tcp', 22), ('tcp', 80)]},
+        'instances': {'count': 3, 'image_id': 'xxx', 'instance_type': 'ecs.t5-lc1m1.small', 'vswitch': 'vsw-a'},
+        'slb': {'master_zone_id': 'ap-south-1a', 'slave_zone_id': 'ap-south-1b',
+                'listeners': [{'port': 80, 'backend_port': 8080}]},
+        'nat': {'vswitch': 'vsw-a', 'eips': 1, 'dnat': [{'instance': 0, 'external_port': 2201, 'internal_port': 22}]},
+    }
+    result = Environment(ak, sk, 'ap-south-1', spec).apply()
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .ecs import ECS, SecurityGroup
+from .vpc import VPC, VSwitch, NAT, EIP
+from .slb import SLB
+from .paginate import dig
+from .utils import backoff, WaitTimeout
+
+__all__ = ('Graph', 'Environment', 'Skipped')
+
+
+class Skipped(Exception):
+    """依赖的步骤失败, 该步骤未执行"""
+
+
+class Graph:
+    """步骤依赖图, 依赖全部完成的步骤并发执行
+    步骤函数 fn(results) 的参数为已完成步骤的结果 {步骤名: 返回值}
+    """
+    def __init__(self):
+        self.steps = {}
+
+    def add(self, name, fn, deps=()):
+        if name in self.steps:
+            raise ValueError('duplicate step: %s' % name)
+        self.steps[name] = (fn, tuple(deps))
+        return name
+
+    def run(self, parallel=8):
+        """执行全部步骤, 返回 (results, errors); 失败步骤的下游步骤记为 Skipped"""
+        for name, (_, deps) in self.steps.items():
+            missing = [d for d in deps if d not in self.steps]
+            if missing:
+                raise ValueError('step %s depends on unknown steps: %s' % (name, missing))
+        results, errors = {}, {}
+        remaining = dict(self.steps)
+        running = {}
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            while remaining or running:
+                changed = True
+                while changed:
+                    changed = False
+                    for name, (fn, deps) in list(remaining.items()):
+                        failed = [d for d in deps if d in errors]
+                        if failed:
+                            errors[name] = Skipped('dependency failed: %s' % ', '.join(failed))
+                        elif all(d in results for d in deps):
+                            running[executor.submit(fn, results)] = name
+                        else:
+                            continue
+                        del remaining[name]
+                        changed = True
+                if not running:
+                    # 剩余步骤存在循环依赖
+                    for name in remaining:
+                        errors[name] = Skipped('dependency cycle')
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors[name] = e
+        return results, errors
+
+
+def wait_status(fetch, status, timeout=300, interval=1, max_interval=10):
+    """轮询fetch()直到返回status"""
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        current = fetch()
+        if current == status:
+            return current
+        delay = backoff(attempt, interval, max_interval)
+        if time.monotonic() + delay > deadline:
+            raise WaitTimeout('status %s, expected %s after %ss' % (current, status, timeout), [current], {})
+        time.sleep(delay)
+        attempt += 1
+
+
+class Environment:
+    """按spec创建一套环境
+    eip_pool: eippool.EIPPool, 设置时从池中取EIP, 不在创建过程中申请
+    kwargs 透传给各wrapper类, 如 pool, limiter
+    """
+    def __init__(self, ak, sk, region_id, spec, parallel=8, timeout=600, eip_pool=None, **kwargs):
+        self.region_id = region_id
+        self.eip_pool = eip_pool
+        self.spec = spec
+        self.parallel = parallel
+        self.timeout = timeout
+        # 状态轮询不能读到缓存的结果
+        kwargs.pop('cache', None)
+        client = lambda cls: cls.for_region(ak, sk, region_id, **kwargs)
+        self.vpc, self.vswitch, self.nat, self.eip = client(VPC), client(VSwitch), client(NAT), client(EIP)
+        self.ecs, self.sg, self.slb = client(ECS), client(SecurityGroup), client(SLB)
+
+    def plan(self) -> Graph:
+        """由spec生成依赖图"""
+        spec, region_id = self.spec, self.region_id
+        name = spec.get('name', 'env')
+        graph = Graph()
+
+        if 'vpc' in spec:
+            graph.add('vpc', self._create_vpc)
+            for vsw in spec.get('vswitches', []):
+                graph.add('vswitch:%s' % vsw['name'], lambda r, vsw=vsw: self._create_vswitch(r, vsw), ['vpc'])
+
+        if 'security_group' in spec:
+            sg_spec = spec['security_group']
+            graph.add('sg', lambda r: self.sg.create(region_id, r['vpc'], sg_spec.get('name', name), **sg_spec.get('kwargs', {}))['SecurityGroupId'], ['vpc'])
+            for i, (proto, port, *cidr) in enumerate(sg_spec.get('ports', [])):
+                graph.add('sg_port:%s' % i, lambda r, p=proto, port=port, c=cidr: self.sg.open_port(region_id, r['sg'], p, port, *c), ['sg'])
+
+        instances = []
+        if 'instances' in spec:
+            ins = dict(spec['instances'])
+            vsw = 'vswitch:%s' % ins.pop('vswitch')
+            count = ins.pop('count', 1)
+            for i in range(count):
+                step = graph.add('ecs:%s' % i, lambda r, i=i: self._create_instance(r, vsw, '%s-%s' % (name, i), ins), [vsw, 'sg'])
+                instances.append(step)
+            graph.add('ecs_running', lambda r: self._start_instances([r[s] for s in instances]), instances)
+
+        if 'slb' in spec:
+            slb = dict(spec['slb'])
+            listeners = slb.pop('listeners', [])
+            graph.add('slb', lambda r: self.slb.create(region_id, name, **slb)['LoadBalancerId'])
+            for ln in listeners:
+                group = graph.add('vserver_group:%s' % ln['port'], lambda r, ln=ln: self._create_vserver_group(r, ln, instances), ['slb'] + instances)
+                graph.add('listener:%s' % ln['port'], lambda r, ln=ln, g=group: self._create_listener(r, ln, g), [group])
+
+        if 'nat' in spec:
+            nat = dict(spec['nat'])
+            graph.add('nat', lambda r: self._create_nat(r, nat), ['vswitch:%s' % nat['vswitch']])
+            for i in range(nat.get('eips', 1)):
+                eip = graph.add('eip:%s' % i, lambda r: self._allocate_eip(nat.get('eip', {})))
+                graph.add('eip_assoc:%s' % i, lambda r, e=eip: self._associate(r, r[e]), ['nat', eip])
+            for j, entry in enumerate(nat.get('dnat', [])):
+                graph.add('dnat:%s' % j, lambda r, entry=entry: self._add_dnat(r, entry),
+                          ['nat', 'eip:%s' % entry.get('eip', 0), 'eip_assoc:%s' % entry.get('eip', 0), 'ecs:%s' % entry['instance']])
+        return graph
+
+    def apply(self) -> dict:
+        """创建环境, 返回 {'results': {步骤名: 结果}, 'errors': {步骤名: 异常}}"""
+        results, errors = self.plan().run(self.parallel)
+        return {'results': results, 'errors': errors}
+
+    # 以下为各步骤的实现, r为已完成步骤的结果
+
+    def _create_vpc(self, r):
+        vpc_id = self.vpc.create(self.region_id, self.spec.get('name', 'env'), **self.spec['vpc'])['body']['VpcId']
+        fetch = lambda: dig(self.vpc.get(self.region_id, vpc_id=vpc_id)['body'], 'Vpcs.Vpc')[0]['Status']
+        wait_status(fetch, 'Available', self.timeout)
+        return vpc_id
+
+    def _create_vswitch(self, r, vsw):
+        vsw = dict(vsw)
+        name = vsw.pop('name')
+        vs_id = self.vswitch.create(self.region_id, r['vpc'], vsw.pop('zone_id'), name, vsw.pop('cidr_block'), **vsw)['body']['VSwitchId']
+        fetch = lambda: dig(self.vswitch.get(self.region_id, r['vpc'], v_switch_id=vs_id), 'VSwitches.VSwitch')[0]['Status']
+        wait_status(fetch, 'Available', self.timeout)
+        return vs_id
+
+    def _create_instance(self, r, vsw, name, ins):
+        ins = dict(ins)
+        return self.ecs.create(self.region_id, name, ins.pop('image_id'), ins.pop('instance_type'), r[vsw], r['sg'], **ins)['InstanceId']
+
+    def _start_instances(self, in_ids):
+        # CreateInstance创建的实例为Stopped状态, 全部就绪后批量启动
+        self.ecs.wait_for(self.region_id, in_ids, 'Stopped', self.timeout)
+        self.ecs.bulk_start(self.region_id, in_ids)
+        return self.ecs.wait_for(self.region_id, in_ids, 'Running', self.timeout)
+
+    def _create_vserver_group(self, r, ln, instances):
+        servers = [{'ServerId': r[s], 'Port': ln.get('backend_port', ln['port']), 'Weight': ln.get('weight', 100)} for s in instances]
+        body = self.slb.create_vserver_group(self.region_id, r['slb'], '%s-%s' % (self.spec.get('name', 'env'), ln['port']), json.dumps(servers))
+        return body['VServerGroupId']
+
+    def _create_listener(self, r, ln, group):
+        kwargs = ln.get('kwargs', {})
+        self.slb.create_listener(self.region_id, r['slb'], r[group], ln['port'], **kwargs)
+        return self.slb.start_listener(self.region_id, r['slb'], ln['port'])
+
+    def _create_nat(self, r, nat):
+        kwargs = nat.get('kwargs', {})
+        body = self.nat.create(self.region_id, r['vpc'], r['vswitch:%s' % nat['vswitch']], self.spec.get('name', 'env'), **kwargs)['body']
+        nat_id = body['NatGatewayId']
+        fetch = lambda: dig(self.nat.get(self.region_id, nat_gateway_id=nat_id)['body'], 'NatGateways.NatGateway')[0]['Status']
+        wait_status(fetch, 'Available', self.timeout)
+        return {'NatGatewayId': nat_id, 'ForwardTableId': dig(body, 'ForwardTableIds.ForwardTableId')[0]}
+
+    def _allocate_eip(self, eip):
+        if self.eip_pool is not None:
+            return self.eip_pool.acquire(self.region_id, eip.get('type', 'PayByTraffic'), eip.get('bandwidth', '200'))
+        return self.eip.create(self.region_id, **eip)['body']
+
+    def _associate(self, r, eip):
+        self.eip.associate(self.region_id, eip['AllocationId'], r['nat']['NatGatewayId'], 'Nat')
+        fetch = lambda: dig(self.eip.get(self.region_id, allocation_id=eip['AllocationId'])['body'], 'EipAddresses.EipAddress')[0]['Status']
+        return wait_status(fetch, 'InUse', self.timeout)
+
+    def _add_dnat(self, r, entry):
+        in_id = r['ecs:%s' % entry['instance']]
+        instance = dig(self.ecs.get(self.region_id, instance_ids=json.dumps([in_id])), 'Instances.Instance')[0]
+        internal_ip = dig(instance, 'VpcAttributes.PrivateIpAddress.IpAddress')[0]
+        external_ip = r['eip:%s' % entry.get('eip', 0)]['EipAddress']
+        return self.nat.add_dnat(self.region_id, r['nat']['ForwardTableId'], external_ip, entry['external_port'],
+                                 internal_ip, entry['internal_port'], entry.get('ip_protocol', 'tcp'))['body']
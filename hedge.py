@@ -0,0 +1,142 @@
+"""只读查询的对冲请求
+请求在最近延迟的percentile分位内没有返回时, 再发送一个相同请求, 取先返回的结果:
+    ecs = ECS(ak, sk, endpoint, hedge=HedgePolicy(percentile=95))
+只对Describe*接口生效
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+__all__ = ('HedgePolicy',)
+
+
+class HedgePolicy:
+    """对冲策略
+    percentile: 以最近window次调用延迟的该分位数作为对冲等待时间
+    initial_delay: 样本不足min_samples时的对冲等待秒数
+    actions: 只对这些接口对冲, 默认全部Describe*接口
+    """
+    def __init__(self, percentile=95, window=200, min_samples=20, initial_delay=1.0,
+                 min_delay=0.01, actions=None, max_workers=32):
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.actions = set(actions) if actions else None
+        self._latencies = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+
+    def applies(self, action):
+        if self.actions is not None:
+            return action in self.actions
+        return action.startswith('Describe')
+
+    def delay(self, action):
+        """当前的对冲等待秒数"""
+        with self._lock:
+            samples = self._latencies.get(action)
+            if not samples or len(samples) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def _sample(self, action, latency):
+        # 只记录主请求自身的延迟, 对冲后的总耗时不影响对冲等待时间
+        with self._lock:
+            self._latencies.setdefault(action, deque(maxlen=self.window)).append(latency)
+
+    def _count(self, action, fired=False, won=False):
+        with self._lock:
+            stats = self._stats.setdefault(action, {'calls': 0, 'fired': 0, 'won': 0})
+            stats['calls'] += 1
+            stats['fired'] += fired
+            stats['won'] += won
+
+    def stats(self) -> dict:
+        """{接口: {'calls': 调用次数, 'fired': 发出对冲次数, 'won': 对冲请求先返回的次数}}"""
+        with self._lock:
+            return {action: dict(stats) for action, stats in self._stats.items()}
+
+    def run(self, action, fn, cli, borrow, hand_off=None):
+        """fn(cli)执行一次请求, borrow()为上下文管理器, 提供对冲请求使用的另一个client
+        对冲请求先返回时主请求仍在使用cli, hand_off(cli, future)在主请求结束后归还cli
+        """
+        started = threading.Event()
+
+        def primary_call():
+            began = time.monotonic()
+            started.set()
+            try:
+                return fn(cli)
+            finally:
+                self._sample(action, time.monotonic() - began)
+
+        primary = self._executor.submit(primary_call)
+        # 对冲等待从主请求开始执行时算起, 线程池排队的时间不计入
+        started.wait()
+        done, _ = wait([primary], timeout=self.delay(action))
+        if done:
+            self._count(action)
+            return primary.result()
+
+        def hedged():
+            with borrow() as other:
+                return fn(other)
+        secondary = self._executor.submit(hedged)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._count(action, fired=True, won=future is secondary)
+                    if future is secondary and hand_off is not None:
+                        hand_off(cli, primary)
+                    return future.result()
+                error = error or future.exception()
+        self._count(action, fired=True)
+        raise error
+
+    async def run_async(self, action, fn, cli, borrow, hand_off=None):
+        """run的异步版本, fn(cli)为协程, 落后的请求会被取消"""
+        async def primary_call():
+            began = time.monotonic()
+            try:
+                return await fn(cli)
+            finally:
+                self._sample(action, time.monotonic() - began)
+
+        primary = asyncio.ensure_future(primary_call())
+        done, _ = await asyncio.wait([primary], timeout=self.delay(action))
+        if done:
+            self._count(action)
+            return primary.result()
+
+        async def hedged():
+            with borrow() as other:
+                return await fn(other)
+        secondary = asyncio.ensure_future(hedged())
+        pending = {primary, secondary}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._count(action, fired=True, won=task is secondary)
+                        if task is secondary and hand_off is not None:
+                            # 取消后主请求要等到下一次事件循环才结束
+                            hand_off(cli, primary)
+                        return task.result()
+                    error = error or task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        self._count(action, fired=True)
+        raise error
@@ -0,0 +1,176 @@
+"""镜像 × 实例规格的兼容矩阵
+由 DescribeImages 和 DescribeImageSupportInstanceTypes 生成, 保存在sqlite中, 打开时载入内存, 查询不访问接口:
+    matrix = Matrix('matrix.db')
+    matrix.refresh(ECS.for_region(ak, sk, 'ap-south-1'), 'ap-south-1', image_owner_alias='system')
+    matrix.instance_types('ap-south-1', image_id='ubuntu_20_04_x64_20G_alibase_20210420.vhd', min_cpu=8, min_memory=16)
+按地域增量刷新, 只查询新增和超过max_age未刷新的镜像
+"""
+import copy
+import sqlite3
+import threading
+import time
+from .paginate import paginate, dig
+from .utils import run_parallel
+
+__all__ = ('Matrix',)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS images (
+    region TEXT NOT NULL, image_id TEXT NOT NULL, name TEXT, os_type TEXT, architecture TEXT, refreshed REAL,
+    PRIMARY KEY (region, image_id)
+);
+CREATE TABLE IF NOT EXISTS instance_types (
+    region TEXT NOT NULL, type_id TEXT NOT NULL, family TEXT, cpu INTEGER, memory REAL,
+    PRIMARY KEY (region, type_id)
+);
+CREATE TABLE IF NOT EXISTS support (
+    region TEXT NOT NULL, image_id TEXT NOT NULL, type_id TEXT NOT NULL,
+    PRIMARY KEY (region, image_id, type_id)
+);
+CREATE INDEX IF NOT EXISTS idx_support_type ON support (region, type_id);
+'''
+
+
+def _spec(instance_type):
+    # (规格族, vCPU, 内存GiB)
+    return (instance_type.get('InstanceTypeFamily'), instance_type.get('CpuCoreCount') or 0,
+            instance_type.get('MemorySize') or 0)
+
+
+class Matrix:
+    """兼容矩阵, path为sqlite文件路径, 默认在内存中
+    内存索引: 地域 -> 规格 -> (规格族, vCPU, 内存GiB), (地域, 镜像) -> 支持的规格集合
+    """
+    def __init__(self, path=':memory:'):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._types = {}
+        self._images = {}
+        self._support = {}
+        self._load()
+
+    def _load(self):
+        for region, type_id, family, cpu, memory in self.db.execute('SELECT * FROM instance_types'):
+            self._types.setdefault(region, {})[type_id] = (family, cpu or 0, memory or 0)
+        for region, image_id, name, os_type, arch, refreshed in self.db.execute('SELECT * FROM images'):
+            self._images.setdefault(region, {})[image_id] = {'ImageId': image_id, 'ImageName': name, 'OSType': os_type,
+                                                             'Architecture': arch, 'refreshed': refreshed}
+        support = {}
+        for region, image_id, type_id in self.db.execute('SELECT * FROM support'):
+            support.setdefault((region, image_id), set()).add(type_id)
+        self._support = {key: frozenset(types) for key, types in support.items()}
+
+    def refresh(self, ecs, region_id, max_age=86400, parallel=4, **kwargs) -> dict:
+        """刷新一个地域, ecs为该地域的ECS实例, kwargs透传给DescribeImages, 如 image_owner_alias='system'
+        新增和超过max_age秒未刷新的镜像查询支持的规格, 已下线的镜像删除
+        查询失败的镜像保留原有数据, 下次刷新再试
+        返回 {'added': n, 'updated': n, 'removed': n, 'unchanged': n, 'failed': n, 'errors': {镜像id: 异常}}
+        """
+        if getattr(ecs, 'cache', None) is not None:
+            # 刷新需要接口的最新数据, 不读写查询缓存, 与Environment去掉cache的做法一致
+            ecs = copy.copy(ecs)
+            ecs.cache = None
+        fetch = lambda n: ecs.get_images(region_id, page_size=100, page_number=n, **kwargs)
+        current = {image['ImageId']: image for image in paginate(fetch, 'Images.Image', 100)}
+        known = self._images.get(region_id, {})
+        now = time.time()
+        stale = [i for i in current if i not in known or now - (known[i]['refreshed'] or 0) > max_age]
+        removed = [i for i in known if i not in current]
+
+        def support(image_id):
+            return dig(ecs.get_instance_type(region_id, image_id), 'InstanceTypes.InstanceType')
+
+        fetched, errors = {}, {}
+        for image_id, types, e in run_parallel(support, stale, parallel):
+            if e is None:
+                fetched[image_id] = types
+            else:
+                errors[image_id] = e
+
+        with self._lock, self.db:
+            for image_id in removed:
+                self.db.execute('DELETE FROM images WHERE region=? AND image_id=?', (region_id, image_id))
+                self.db.execute('DELETE FROM support WHERE region=? AND image_id=?', (region_id, image_id))
+            for image_id, types in fetched.items():
+                image = current[image_id]
+                self.db.execute('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)',
+                                (region_id, image_id, image.get('ImageName'), image.get('OSType'), image.get('Architecture'), now))
+                self.db.execute('DELETE FROM support WHERE region=? AND image_id=?', (region_id, image_id))
+                self.db.executemany('INSERT OR IGNORE INTO support VALUES (?, ?, ?)',
+                                    [(region_id, image_id, t['InstanceTypeId']) for t in types])
+                self.db.executemany('INSERT OR REPLACE INTO instance_types VALUES (?, ?, ?, ?, ?)',
+                                    [(region_id, t['InstanceTypeId']) + _spec(t) for t in types])
+            # 内存索引整体替换, 查询时不加锁
+            types_index = dict(self._types.get(region_id, {}))
+            images_index = dict(known)
+            support_index = dict(self._support)
+            for image_id in removed:
+                images_index.pop(image_id, None)
+                support_index.pop((region_id, image_id), None)
+            for image_id, types in fetched.items():
+                image = current[image_id]
+                images_index[image_id] = {'ImageId': image_id, 'ImageName': image.get('ImageName'), 'OSType': image.get('OSType'),
+                                          'Architecture': image.get('Architecture'), 'refreshed': now}
+                support_index[(region_id, image_id)] = frozenset(t['InstanceTypeId'] for t in types)
+                for t in types:
+                    types_index[t['InstanceTypeId']] = _spec(t)
+            self._types = dict(self._types, **{region_id: types_index})
+            self._images = dict(self._images, **{region_id: images_index})
+            self._support = support_index
+        updated = sum(1 for i in fetched if i in known)
+        return {'added': len(fetched) - updated, 'updated': updated, 'removed': len(removed),
+                'unchanged': len(current) - len(fetched) - len(errors), 'failed': len(errors), 'errors': errors}
+
+    def refresh_fleet(self, fleet, **kwargs) -> dict:
+        """用region.Fleet刷新全部地域, 返回 {region_id: 刷新统计或异常}"""
+        from .ecs import ECS
+        results = {}
+        refresh = lambda region_id: self.refresh(fleet.client(ECS, region_id), region_id, **kwargs)
+        for region_id, counts, e in run_parallel(refresh, fleet.regions, fleet.parallel):
+            results[region_id] = counts if e is None else e
+        return results
+
+    # 以下查询只读内存索引
+
+    def instance_types(self, region_id, image_id=None, min_cpu=0, max_cpu=None, min_memory=0, max_memory=None, family=None) -> list:
+        """地域中满足条件的规格, 按(vCPU, 内存)排序
+        image_id: 只返回支持该镜像的规格; memory单位GiB
+        返回 [{'InstanceTypeId', 'InstanceTypeFamily', 'CpuCoreCount', 'MemorySize'}]
+        """
+        types = self._types.get(region_id, {})
+        candidates = self._support.get((region_id, image_id), ()) if image_id else types
+        result = []
+        for type_id in candidates:
+            family_, cpu, memory = types.get(type_id, (None, 0, 0))
+            if cpu < min_cpu or memory < min_memory:
+                continue
+            if (max_cpu is not None and cpu > max_cpu) or (max_memory is not None and memory > max_memory):
+                continue
+            if family is not None and family_ != family:
+                continue
+            result.append({'InstanceTypeId': type_id, 'InstanceTypeFamily': family_, 'CpuCoreCount': cpu, 'MemorySize': memory})
+        result.sort(key=lambda t: (t['CpuCoreCount'], t['MemorySize'], t['InstanceTypeId']))
+        return result
+
+    def images(self, region_id, instance_type=None, os_type=None, name=None) -> list:
+        """地域中的镜像, instance_type: 只返回支持该规格的镜像; name: 镜像名包含的字符串"""
+        result = []
+        for image_id, image in self._images.get(region_id, {}).items():
+            if instance_type is not None and instance_type not in self._support.get((region_id, image_id), ()):
+                continue
+            if os_type is not None and image['OSType'] != os_type:
+                continue
+            if name is not None and name not in (image['ImageName'] or ''):
+                continue
+            result.append(image)
+        return result
+
+    def supports(self, region_id, image_id, instance_type) -> bool:
+        return instance_type in self._support.get((region_id, image_id), ())
+
+    def regions(self) -> list:
+        return sorted(self._images)
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,131 @@
+"""接口调用的监控指标
+记录每次sdk调用的接口, 地域, endpoint, 耗时, 结果, 错误码, RequestId和响应大小,
+汇总为延迟直方图和计数器, 可导出为Prometheus文本格式:
+    from ali_api.client import Client
+    Client.metrics = Metrics(on_span=lambda span: tracer.record(span))
+    ...
+    print(Client.metrics.export())
+未设置metrics时调用路径不做任何记录
+"""
+import logging
+import threading
+
+__all__ = ('Metrics', 'DEFAULT_BUCKETS')
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的分桶上界(秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = ['%s="%s"' % (n, _escape(v)) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{%s}' % ','.join(pairs)
+
+
+class Metrics:
+    """调用指标的汇总
+    buckets: 延迟直方图的分桶上界(秒)
+    on_span: 每次调用结束后调用 on_span(span), 用于接入链路追踪, 回调中的异常记录到日志后忽略,
+             span为 {'action', 'region', 'endpoint', 'start', 'duration', 'status', 'code', 'request_id', 'size'}
+             status 为 ok, throttled 或 error
+    prefix: 导出的指标名前缀
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, on_span=None, prefix='aliapi'):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._callbacks = [on_span] if on_span else []
+        self._counters = {}    # (action, region, status, code) -> 次数
+        self._histograms = {}  # (action, region) -> [各分桶计数..., 总次数, 总耗时]
+        self._bytes = {}       # (action, region) -> 响应字节数
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """增加span回调, 返回取消订阅的函数"""
+        self._callbacks.append(callback)
+        return lambda: self._callbacks.remove(callback)
+
+    def record(self, span):
+        """记录一次调用, 由Client在每次sdk调用(含重试)结束后调用"""
+        key = (span['action'], span['region'])
+        duration = span['duration']
+        with self._lock:
+            counter = key + (span['status'], span['code'] or '')
+            self._counters[counter] = self._counters.get(counter, 0) + 1
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    hist[i] += 1
+                    break
+            hist[-2] += 1
+            hist[-1] += duration
+            if span['size']:
+                self._bytes[key] = self._bytes.get(key, 0) + span['size']
+        for callback in self._callbacks:
+            # 回调出错只记录日志, 不影响已成功的调用
+            try:
+                callback(span)
+            except Exception:
+                logger.exception('metrics callback %r failed', callback)
+
+    def stats(self) -> dict:
+        """{接口: {'calls', 'errors', 'throttled', 'seconds', 'bytes'}}, 合并全部地域"""
+        result = {}
+        with self._lock:
+            for (action, _, status, _), count in self._counters.items():
+                stats = result.setdefault(action, {'calls': 0, 'errors': 0, 'throttled': 0, 'seconds': 0.0, 'bytes': 0})
+                stats['calls'] += count
+                if status == 'error':
+                    stats['errors'] += count
+                elif status == 'throttled':
+                    stats['throttled'] += count
+            for (action, _), hist in self._histograms.items():
+                result[action]['seconds'] += hist[-1]
+            for (action, _), size in self._bytes.items():
+                result[action]['bytes'] += size
+        return result
+
+    def export(self) -> str:
+        """Prometheus文本格式"""
+        p = self.prefix
+        lines = [
+            '# HELP %s_requests_total OpenAPI calls by action, region, status and error code.' % p,
+            '# TYPE %s_requests_total counter' % p,
+        ]
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, list(v)) for k, v in self._histograms.items())
+            sizes = sorted(self._bytes.items())
+        for labels, count in counters:
+            lines.append('%s_requests_total%s %d' % (p, _labels(('action', 'region', 'status', 'code'), labels), count))
+
+        lines += ['# HELP %s_request_duration_seconds OpenAPI call latency.' % p,
+                  '# TYPE %s_request_duration_seconds histogram' % p]
+        for labels, hist in histograms:
+            cumulative = 0
+            for bound, count in zip(self.buckets, hist):
+                cumulative += count
+                lines.append('%s_request_duration_seconds_bucket%s %d' % (p, _labels(('action', 'region'), labels, 'le="%g"' % bound), cumulative))
+            lines.append('%s_request_duration_seconds_bucket%s %d' % (p, _labels(('action', 'region'), labels, 'le="+Inf"'), hist[-2]))
+            lines.append('%s_request_duration_seconds_sum%s %.6f' % (p, _labels(('action', 'region'), labels), hist[-1]))
+            lines.append('%s_request_duration_seconds_count%s %d' % (p, _labels(('action', 'region'), labels), hist[-2]))
+
+        lines += ['# HELP %s_response_bytes_total Response body bytes received.' % p,
+                  '# TYPE %s_response_bytes_total counter' % p]
+        for labels, size in sizes:
+            lines.append('%s_response_bytes_total%s %d' % (p, _labels(('action', 'region'), labels), size))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._bytes.clear()
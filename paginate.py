@@ -0,0 +1,106 @@
+"""分页查询的自动翻页迭代器"""
+import queue
+import threading
+from .records import project
+
+__all__ = ('paginate', 'apaginate', 'dig')
+
+_DONE = object()
+
+
+def dig(body, path):
+    """按'Instances.Instance'形式的路径取出分页结果中的列表"""
+    for key in path.split('.'):
+        body = (body or {}).get(key)
+    return body or []
+
+
+def _pages(fetch, path, page_size, fields=None):
+    page_number, seen = 1, 0
+    while True:
+        body = fetch(page_number)
+        items = dig(body, path)
+        total = body.get('TotalCount')
+        count = len(items)
+        if fields is not None:
+            # 投影后释放整页的原始dict
+            items = project(items, fields)
+            body = None
+        yield items
+        seen += count
+        if count < page_size or (total is not None and seen >= total):
+            return
+        page_number += 1
+
+
+def paginate(fetch, path, page_size, prefetch=1, fields=None):
+    """逐条返回所有分页的记录
+    fetch(page_number) 返回单页的body, path 为记录列表在body中的路径
+    fields: 字段列表或records.record_type生成的类, 设置时返回紧凑的记录而不是dict
+    后台线程预取后续prefetch页, 内存中最多保留 prefetch+2 页
+    """
+    if prefetch <= 0:
+        for items in _pages(fetch, path, page_size, fields):
+            yield from items
+        return
+
+    pages = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            for items in _pages(fetch, path, page_size, fields):
+                if not put(items):
+                    return
+        except BaseException as e:
+            put(e)
+            return
+        put(_DONE)
+
+    threading.Thread(target=worker, daemon=True).start()
+    try:
+        while True:
+            items = pages.get()
+            if items is _DONE:
+                return
+            if isinstance(items, BaseException):
+                raise items
+            yield from items
+    finally:
+        # 调用方提前结束迭代时通知后台线程退出
+        stop.set()
+
+
+async def apaginate(fetch, path, page_size, fields=None):
+    """paginate的异步版本, fetch(page_number)为协程
+    处理当前页时已发起下一页的请求
+    """
+    import asyncio
+    page_number, seen = 1, 0
+    task = asyncio.ensure_future(fetch(page_number))
+    try:
+        while task is not None:
+            body = await task
+            items = dig(body, path)
+            seen += len(items)
+            total = body.get('TotalCount')
+            task = None
+            if len(items) >= page_size and (total is None or seen < total):
+                page_number += 1
+                task = asyncio.ensure_future(fetch(page_number))
+            if fields is not None:
+                items = project(items, fields)
+            for item in items:
+                yield item
+    finally:
+        if task is not None:
+            task.cancel()
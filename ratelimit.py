@@ -0,0 +1,106 @@
+"""客户端限流
+令牌桶按(接口, 地域)限速, 遇到Throttling错误时按AIMD降速, 成功后缓慢恢复:
+    from ali_api.client import Client
+    Client.limiter = RateLimiter(rate=20, rates={'DescribeInstances': 50})
+设置在Client类上对ECSClient, VPCClient, SLBClient全部生效, 也可通过 limiter= 参数单独设置
+"""
+import threading
+import time
+
+__all__ = ('RateLimiter', 'TokenBucket', 'is_throttling')
+
+
+def is_throttling(e):
+    """是否为限流错误, 如 Throttling, Throttling.User, Throttling.Api"""
+    code = getattr(e, 'code', None) or ''
+    return isinstance(code, str) and code.startswith('Throttling')
+
+
+class TokenBucket:
+    """令牌桶, rate为每秒令牌数, burst为桶容量"""
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """预占一个令牌, 返回需要等待的秒数 (调用方需持有锁)"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """按(接口, 地域)限流的令牌桶集合, AIMD自适应
+    rate: 默认每秒请求数, 即配额上限
+    rates: 按接口或(接口, 地域)覆盖, 如 {'DescribeInstances': 50, ('RunInstances', 'cn-hangzhou'): 5}
+    decrease: 遇到限流错误时速率乘以该系数
+    increase: 每次成功后速率增加 increase/当前速率, 直到配额上限
+    retries: 限流错误的最大重试次数
+    """
+    def __init__(self, rate=10, rates=None, burst=None, min_rate=0.5, decrease=0.5, increase=1.0, retries=3):
+        self.rate = rate
+        self.rates = dict(rates or {})
+        self.burst = burst
+        self.min_rate = min_rate
+        self.decrease = decrease
+        self.increase = increase
+        self.retries = retries
+        self.throttled = 0
+        self._buckets = {}
+        self._ceilings = {}
+        self._decreased = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, action, region):
+        key = (action, region)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            ceiling = self.rates.get(key, self.rates.get(action, self.rate))
+            bucket = self._buckets[key] = TokenBucket(ceiling, self.burst)
+            self._ceilings[key] = ceiling
+        return bucket
+
+    def reserve(self, action, region=None):
+        """预占一次调用, 返回需要等待的秒数"""
+        with self._lock:
+            return self._bucket(action, region).reserve()
+
+    def acquire(self, action, region=None):
+        delay = self.reserve(action, region)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, action, region=None):
+        import asyncio
+        delay = self.reserve(action, region)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self, action, region=None):
+        key = (action, region)
+        with self._lock:
+            bucket = self._bucket(action, region)
+            if bucket.rate < self._ceilings[key]:
+                bucket.rate = min(self._ceilings[key], bucket.rate + self.increase / bucket.rate)
+
+    def on_throttle(self, action, region=None):
+        # 并发请求会同时收到限流错误, 每秒最多降速一次
+        key = (action, region)
+        now = time.monotonic()
+        with self._lock:
+            self.throttled += 1
+            bucket = self._bucket(action, region)
+            if now - self._decreased.get(key, 0) < 1:
+                return
+            self._decreased[key] = now
+            bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+            bucket.tokens = min(bucket.tokens, 0)
+
+    def current_rates(self) -> dict:
+        """当前各(接口, 地域)的速率"""
+        with self._lock:
+            return {key: bucket.rate for key, bucket in self._buckets.items()}
@@ -0,0 +1,106 @@
+"""字段投影, 将接口返回的嵌套dict转为只含所需字段的紧凑记录
+    Instance = record_type(['InstanceId', 'InstanceName', 'Status', 'ZoneId',
+                            'private_ip=VpcAttributes.PrivateIpAddress.IpAddress.0'])
+    for ins in ecs.iter_instances(region_id, fields=Instance): ins.private_ip
+"""
+__all__ = ('record_type', 'project', 'field_getter', 'with_fields')
+
+_types = {}
+
+
+def _parse(field):
+    # 'alias=A.B.0' -> ('alias', ['A', 'B', 0]), 未指定别名时取路径最后一个非数字段
+    alias, _, path = field.rpartition('=')
+    keys = [int(k) if k.isdigit() else k for k in path.split('.')]
+    if not alias:
+        alias = [k for k in keys if isinstance(k, str)][-1]
+    return alias, keys
+
+
+def _getter(keys):
+    def get(item):
+        for key in keys:
+            try:
+                item = item[key]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return item
+    return get
+
+
+def field_getter(field):
+    """返回按字段路径取值的函数, 路径不存在时取到None"""
+    return _getter(_parse(field)[1])
+
+
+class Record:
+    """__slots__记录的基类"""
+    __slots__ = ()
+    _fields = ()
+    _getters = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self._fields, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_map(cls, item):
+        record = cls.__new__(cls)
+        for name, get in zip(cls._fields, cls._getters):
+            setattr(record, name, get(item))
+        return record
+
+    def to_map(self) -> dict:
+        return {name: getattr(self, name) for name in self._fields}
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self._fields)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join('%s=%r' % kv for kv in self.to_map().items()))
+
+
+def record_type(fields, name='Record'):
+    """按字段列表生成__slots__记录类, 相同字段列表复用同一个类
+    fields: 'InstanceId' 或 '别名=路径', 路径用.分隔, 数字为列表下标
+    """
+    if isinstance(fields, type) and issubclass(fields, Record):
+        return fields
+    key = (name, tuple(fields))
+    if key not in _types:
+        parsed = [_parse(f) for f in fields]
+        names = tuple(alias for alias, _ in parsed)
+        _types[key] = type(name, (Record,), {
+            '__slots__': names,
+            '_fields': names,
+            '_getters': tuple(_getter(keys) for _, keys in parsed),
+        })
+    return _types[key]
+
+
+def with_fields(fields, *names):
+    """在记录类型上追加字段, 已有的字段不重复追加, 如多地域查询时追加RegionId"""
+    cls = record_type(fields)
+    names = tuple(n for n in names if n not in cls._fields)
+    if not names:
+        return cls
+    key = (cls, names)
+    if key not in _types:
+        _types[key] = type(cls.__name__, (cls,), {
+            '__slots__': names,
+            '_fields': cls._fields + names,
+            '_getters': cls._getters + tuple(_getter([n]) for n in names),
+        })
+    return _types[key]
+
+
+def project(items, fields):
+    """将dict列表投影为记录, fields 为字段列表或record_type生成的类"""
+    from_map = record_type(fields).from_map
+    return [from_map(item) for item in items]
@@ -0,0 +1,113 @@
+"""多地域并发查询
+例: Fleet(ak, sk, regions='all').inventory()
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .ecs import ECS, SecurityGroup
+from .vpc import VPC, VSwitch, NAT, EIP
+from .slb import SLB
+from .records import with_fields
+
+__all__ = ('Fleet', 'SweepResult')
+
+# 资源类型 -> (wrapper类, 自动翻页方法)
+RESOURCES = {
+    'ecs': (ECS, 'iter_instances'),
+    'vpc': (VPC, 'iter_vpcs'),
+    'slb': (SLB, 'iter_load_balancers'),
+    'eip': (EIP, 'iter_eips'),
+    'vswitch': (VSwitch, 'iter_vswitches'),
+    'sg': (SecurityGroup, 'iter_groups'),
+    'nat': (NAT, 'iter_nat_gateways'),
+}
+
+
+class SweepResult:
+    """多地域查询结果
+    records: 合并后的记录, 每条记录带RegionId
+    errors: {region_id: 异常}, 单个地域失败不影响其他地域
+    """
+    def __init__(self):
+        self.records = []
+        self.errors = {}
+        self.regions = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __repr__(self):
+        return '<SweepResult records=%d regions=%d errors=%d>' % (len(self.records), len(self.regions), len(self.errors))
+
+
+class Fleet:
+    """在多个地域上并发调用wrapper方法
+    regions: 地域id列表, 或'all'表示DescribeRegions返回的全部地域
+    parallel: 并发线程数
+    kwargs: 透传给wrapper类, 如 pool
+    """
+    def __init__(self, ak, sk, regions='all', parallel=8, bootstrap_region='cn-hangzhou', **kwargs):
+        self.ak = ak
+        self.sk = sk
+        self.parallel = parallel
+        self.bootstrap_region = bootstrap_region
+        self.kwargs = kwargs
+        self._regions = regions
+        self._clients = {}
+
+    def client(self, cls, region_id):
+        """每个(wrapper类, 地域)只创建一个实例, 底层sdk client由ClientPool复用"""
+        key = (cls, region_id)
+        if key not in self._clients:
+            self._clients[key] = cls.for_region(self.ak, self.sk, region_id, **self.kwargs)
+        return self._clients[key]
+
+    @property
+    def regions(self) -> list:
+        if self._regions == 'all':
+            body = self.client(ECS, self.bootstrap_region).get_regions()
+            self._regions = [r['RegionId'] for r in body['Regions']['Region']]
+        if isinstance(self._regions, str):
+            self._regions = [self._regions]
+        return list(self._regions)
+
+    def _call(self, cli, method, region_id, args, kwargs):
+        if kwargs.get('fields') is not None:
+            # 投影记录为__slots__对象, 需在记录类型中预留RegionId
+            kwargs = dict(kwargs, fields=with_fields(kwargs['fields'], 'RegionId'))
+        records = list(getattr(cli, method)(region_id, *args, **kwargs))
+        for record in records:
+            if isinstance(record, dict):
+                record['RegionId'] = region_id
+            else:
+                record.RegionId = region_id
+        return records
+
+    def _sweep(self, jobs) -> dict:
+        # jobs: [(name, cls, method, args, kwargs)], 所有(job, 地域)共用一个线程池
+        regions = self.regions
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            futures = {}
+            for name, cls, method, args, kwargs in jobs:
+                results[name] = SweepResult()
+                results[name].regions = regions
+                for region_id in regions:
+                    future = executor.submit(self._call, self.client(cls, region_id), method, region_id, args, kwargs)
+                    futures[future] = (name, region_id)
+            for future in as_completed(futures):
+                name, region_id = futures[future]
+                try:
+                    results[name].records.extend(future.result())
+                except Exception as e:
+                    results[name].errors[region_id] = e
+        return results
+
+    def fan_out(self, cls, method, *args, **kwargs) -> SweepResult:
+        """在每个地域调用 cls.method(region_id, *args, **kwargs), 合并结果
+        method 需返回记录列表或迭代器(如 iter_* 方法)
+        """
+        return self._sweep([(method, cls, method, args, kwargs)])[method]
+
+    def inventory(self, types=('ecs', 'vpc', 'slb', 'eip')) -> dict:
+        """并发查询各地域的资源清单, 返回 {资源类型: SweepResult}"""
+        return self._sweep([(t, *RESOURCES[t], (), {}) for t in types])
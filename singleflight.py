@@ -0,0 +1,130 @@
+"""相同查询的请求合并
+多个线程或协程同时发出完全相同的只读查询时, 只有一个请求真正发出, 其余等待并共享它的结果:
+    Client.singleflight = SingleFlight()
+    # 50个线程同时调用 slb.get_health_status(region_id, slb_id), 只发出一次DescribeHealthStatus
+以(ak, endpoint, 接口, 规范化后的请求参数)为键, 只对Describe*接口生效, 不缓存结果, 请求结束后即失效
+"""
+import json
+import threading
+
+__all__ = ('SingleFlight',)
+
+_RETRY = object()  # 发起请求的协程被取消, 等待者需重新发起
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _params(req):
+    # 请求参数规范化为json, 参数相同但顺序不同的请求得到相同的键
+    data = req.to_map() if hasattr(req, 'to_map') else vars(req)
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class SingleFlight:
+    """请求合并
+    actions: 只合并这些接口, 默认全部Describe*接口
+    """
+    def __init__(self, actions=None):
+        self.actions = set(actions) if actions else None
+        self._calls = {}
+        self._futures = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def applies(self, action):
+        if self.actions is not None:
+            return action in self.actions
+        return action.startswith('Describe')
+
+    def key(self, client_key, action, req):
+        # (ak, sk摘要, endpoint), 不同账号的查询不合并
+        return client_key[:3], action, _params(req)
+
+    def _count(self, action, shared):
+        # 调用方需持有锁
+        stats = self._stats.setdefault(action, {'calls': 0, 'saved': 0})
+        stats['calls'] += 1
+        stats['saved'] += shared
+
+    def do(self, key, fn):
+        """相同key的调用进行中时等待并返回其结果(或抛出其异常), 否则执行fn()"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(key[1], not leader)
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key, fn):
+        """do的异步版本, fn()返回协程, 只在同一事件循环内合并
+        发起请求的协程被取消时, 等待者之一重新发起请求, 其余等待者继续等待, 不受取消影响
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        key = (id(loop),) + key
+        retry = False
+        while True:
+            with self._lock:
+                future = self._futures.get(key)
+                leader = future is None
+                if leader:
+                    future = self._futures[key] = loop.create_future()
+                if not retry:
+                    self._count(key[2], not leader)
+                elif leader:
+                    # 原先计为合并的调用改为实际发出
+                    self._stats[key[2]]['saved'] -= 1
+            if not leader:
+                result = await asyncio.shield(future)
+                if result is _RETRY:
+                    retry = True
+                    continue
+                return result
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                future.set_result(_RETRY)
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # 没有等待者时不提示异常未被获取
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                with self._lock:
+                    del self._futures[key]
+
+    def stats(self) -> dict:
+        """{接口: {'calls': 调用次数, 'saved': 合并掉的重复请求数}}"""
+        with self._lock:
+            return {action: dict(stats) for action, stats in self._stats.items()}
+
+    @property
+    def saved(self) -> int:
+        """合并掉的重复请求总数"""
+        with self._lock:
+            return sum(stats['saved'] for stats in self._stats.values())
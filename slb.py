@@ -1,179 +1,452 @@
-from .client import SLBClient
-from alibabacloud_slb20140515 import models
-from pprint import pprint
-
-class SLB(SLBClient):
-    """负载均衡器接口
-    文档: https://next.api.alibabacloud.com/api/Slb/2014-05-15
-    """
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def get(self, region_id, **kwargs):
-        # 默认获取全部的
-        with self as cli:
-            req = models.DescribeLoadBalancersRequest(region_id=region_id, **kwargs)
-            res = cli.describe_load_balancers(req)
-            return res.to_map()['body']
-
-    def create(self, region_id, name, master_zone_id, slave_zone_id,
-                    address_type='internet', 
-                    load_balancer_spec='slb.s2.small', 
-                    address_ipversion='ipv4', 
-                    pay_type='PayOnDemand',
-                    **kwargs):
-        with self as cli:
-            req = models.CreateLoadBalancerRequest(
-                    region_id=region_id,
-                    load_balancer_name=name,
-                    address_type=address_type,
-                    load_balancer_spec=load_balancer_spec,
-                    address_ipversion=address_ipversion,
-                    pay_type=pay_type,
-                    **kwargs
-                )
-            res = cli.create_load_balancer(req)
-            return res.to_map()['body']
-
-    def delete(self, region_id, slb_id):
-        with self as cli:
-            req = models.DeleteLoadBalancerRequest(region_id=region_id, load_balancer_id=slb_id)
-            res = cli.delete_load_balancer(req)
-            return res.to_map()['body']
-
-    def get_health_status(self, region_id, slb_id, **kwargs):
-        with self as cli:
-            req = models.DescribeHealthStatusRequest(region_id=region_id, load_balancer_id=slb_id, **kwargs)
-            res = cli.describe_health_status(req)
-            return res.to_map()['body']
-
-    def add_tag(self, region_id, slb_id, tags):
-        if isinstance(tags, str):
-            tags = [tags]
-        with self as cli:
-            req = models.AddTagsRequest(region_id=region_id, load_balancer_id=slb_id, tags=tags)
-            res = cli.add_tags(req)
-            return res.to_map()['body']
-
-    def get_zone_id(self, region_id):
-        # 获取可用区id
-        with self as cli:
-            req = models.DescribeZonesRequest(region_id=region_id)
-            res = cli.describe_zones(req)
-            return res.to_map()['body']
-
-    def get_vserver_groups(self, region_id, slb_id, **kwargs):
-        """查询服务器组列表"""
-        with self as cli:
-            req = models.DescribeVServerGroupsRequest(region_id=region_id, load_balancer_id=slb_id, **kwargs)
-            res = cli.describe_vserver_groups(req)
-            return res.to_map()['body']
-
-    def get_vserver_group_detail(self, region_id, vserver_group_id):
-        """查询服务器组的详细信息"""
-        with self as cli:
-            req = models.DescribeVServerGroupAttributeRequest(region_id=region_id, vserver_group_id=vserver_group_id)
-            res = cli.describe_vserver_group_attribute(req)
-            return res.to_map()['body']
-
-    def delete_vserver_group(self, region_id, vserver_group_id):
-        with self as cli:
-            req = models.DeleteVServerGroupRequest(region_id=region_id, vserver_group_id=vserver_group_id)
-            res = cli.delete_vserver_group(req)
-            return res.to_map()['body']
-
-    def create_vserver_group(self, region_id, slb_id, name, backend_servers=None):
-        """添加后端服务器组并向指定的后端服务器组中添加后端服务器"""
-        with self as cli:
-            if backend_servers:
-                req = models.CreateVServerGroupRequest(region_id=region_id, load_balancer_id=slb_id, vserver_group_name=name)
-            else:
-                req = models.CreateVServerGroupRequest(region_id=region_id, load_balancer_id=slb_id, vserver_group_name=name, backend_servers=backend_servers)
-            res = cli.create_vserver_group(req)
-            return res.to_map()['body']
-
-    def remove_backend_servers(self, region_id, slb_id, backend_servers: str):
-        """移除后端服务器
-        backend_servers格式 [{"ServerId":"i-2zej4lxhjoq***", "Type": "ecs","Weight":"100"}]"""
-        with self as cli:
-            req = models.RemoveBackendServersRequest(region_id=region_id, load_balancer_id=slb_id, backend_servers=backend_servers)
-            res = cli.remove_backend_servers(req)
-            return res.to_map()['body']
-
-    def add_backend_servers(self, region_id, slb_id, backend_servers: str):
-        """添加后端服务器"""
-        with self as cli:
-            req = models.AddBackendServersRequest(region_id=region_id, load_balancer_id=slb_id, backend_servers=backend_servers)
-            res = cli.add_backend_servers(req)
-            return res.to_map()['body']
-
-
-    def create_listener(self, region_id, slb_id, vserver_group_id, listener_port, bandwidth=-1,
-                        health_check_interval=2, established_timeout=900, scheduler='tch',
-                        health_check_connect_timeout=5, **kwargs):
-        """创建TCP监听"""
-        with self as cli:
-            req = models.CreateLoadBalancerTCPListenerRequest(
-                        region_id=region_id, 
-                        load_balancer_id=slb_id, 
-                        vserver_group_id=vserver_group_id,
-                        listener_port=int(listener_port), 
-                        scheduler=scheduler,
-                        bandwidth=bandwidth,
-                        health_check_interval=2,
-                        established_timeout=900,
-                        health_check_connect_timeout=5,
-                        **kwargs)
-            res = cli.create_load_balancer_tcplistener(req)
-            return res.to_map()['body']
-
-    def update_listener(self, region_id, slb_id, vserver_group_id, listener_port, bandwidth=-1,
-                    health_check_interval=2, established_timeout=900, scheduler='tch',
-                    health_check_connect_timeout=5, **kwargs):
-        """修改TCP监听"""
-        with self as cli:
-            req = models.SetLoadBalancerTCPListenerAttributeRequest(
-                        region_id=region_id, 
-                        load_balancer_id=slb_id, 
-                        vserver_group_id=vserver_group_id,
-                        listener_port=int(listener_port), 
-                        scheduler=scheduler,
-                        bandwidth=bandwidth,
-                        health_check_interval=2,
-                        established_timeout=900,
-                        health_check_connect_timeout=5,
-                        **kwargs)
-            res = cli.set_load_balancer_tcplistener_attribute(req)
-            return res.to_map()['body']
-
-
-    def delete_listener(self, region_id, slb_id, listener_port, **kwargs):
-        with self as cli:
-            req = models.DeleteLoadBalancerListenerRequest(region_id, load_balancer_id=slb_id,  listener_port=int(listener_port))
-            res = cli.delete_load_balancer_listener(req)
-            return res.to_map()['body']
-
-    def start_listener(self, region_id, slb_id, listener_port, **kwargs):
-        """启动监听"""
-        with self as cli:
-            req = models.StartLoadBalancerListenerRequest(region_id=region_id, load_balancer_id=slb_id, listener_port=int(listener_port))
-            res = cli.start_load_balancer_listener(req)
-            return res.to_map()['body']
-
-    def stop_listener(self, region_id, slb_id, listener_port, **kwargs):
-        """启动监听"""
-        with self as cli:
-            req = models.StopLoadBalancerListenerRequest(region_id=region_id, load_balancer_id=slb_id, listener_port=int(listener_port))
-            res = cli.stop_load_balancer_listener(req)
-            return res.to_map()['body']
-
-    def get_listeners(self, region_id, type='tcp', slb_id=None):
-        """查询负载均衡监听列表详情,默认tcp协议"""
-        with self as cli:
-            req = models.DescribeLoadBalancerListenersRequest(region_id=region_id, listener_protocol=type)
-            res = cli.describe_load_balancer_listeners(req)
-            return res.to_map()['body']
-
-    def __str__(self):
-        # 返回产品类型,用于endpoint
-        return 'slb'
+import json
+import time
+from .utils import LazyModule, chunked, run_parallel, error_info, backoff, BulkResult
+from .client import SLBClient, AsyncClient
+from .paginate import paginate, apaginate, dig
+from .cache import cached
+
+models = LazyModule('alibabacloud_slb20140515.models')
+
+class SLB(SLBClient):
+    """负载均衡器接口
+    文档: https://next.api.alibabacloud.com/api/Slb/2014-05-15
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def get(self, region_id, **kwargs):
+        # 默认获取全部的
+        with self as cli:
+            req = models.DescribeLoadBalancersRequest(region_id=region_id, **kwargs)
+            res = cli.describe_load_balancers(req)
+            return res.to_map()['body']
+
+    def iter_load_balancers(self, region_id, page_size=100, fields=None, **kwargs):
+        """逐条返回全部负载均衡实例, 自动翻页"""
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)
+        return paginate(fetch, 'LoadBalancers.LoadBalancer', page_size, fields=fields)
+
+    def create(self, region_id, name, master_zone_id, slave_zone_id,
+                    address_type='internet', 
+                    load_balancer_spec='slb.s2.small', 
+                    address_ipversion='ipv4', 
+                    pay_type='PayOnDemand',
+                    **kwargs):
+        with self as cli:
+            req = models.CreateLoadBalancerRequest(
+                    region_id=region_id,
+                    load_balancer_name=name,
+                    address_type=address_type,
+                    load_balancer_spec=load_balancer_spec,
+                    address_ipversion=address_ipversion,
+                    pay_type=pay_type,
+                    **kwargs
+                )
+            res = cli.create_load_balancer(req)
+            return res.to_map()['body']
+
+    def delete(self, region_id, slb_id):
+        with self as cli:
+            req = models.DeleteLoadBalancerRequest(region_id=region_id, load_balancer_id=slb_id)
+            res = cli.delete_load_balancer(req)
+            return res.to_map()['body']
+
+    def get_attribute(self, region_id, slb_id):
+        """查询负载均衡实例详情, 包括默认服务器组的后端服务器"""
+        with self as cli:
+            req = models.DescribeLoadBalancerAttributeRequest(region_id=region_id, load_balancer_id=slb_id)
+            res = cli.describe_load_balancer_attribute(req)
+            return res.to_map()['body']
+
+    def get_health_status(self, region_id, slb_id, **kwargs):
+        with self as cli:
+            req = models.DescribeHealthStatusRequest(region_id=region_id, load_balancer_id=slb_id, **kwargs)
+            res = cli.describe_health_status(req)
+            return res.to_map()['body']
+
+    def add_tag(self, region_id, slb_id, tags):
+        if isinstance(tags, str):
+            tags = [tags]
+        with self as cli:
+            req = models.AddTagsRequest(region_id=region_id, load_balancer_id=slb_id, tags=tags)
+            res = cli.add_tags(req)
+            return res.to_map()['body']
+
+    @cached('slb_zones', ttl=86400)
+    def get_zone_id(self, region_id):
+        # 获取可用区id
+        with self as cli:
+            req = models.DescribeZonesRequest(region_id=region_id)
+            res = cli.describe_zones(req)
+            return res.to_map()['body']
+
+    def get_vserver_groups(self, region_id, slb_id, **kwargs):
+        """查询服务器组列表"""
+        with self as cli:
+            req = models.DescribeVServerGroupsRequest(region_id=region_id, load_balancer_id=slb_id, **kwargs)
+            res = cli.describe_vserver_groups(req)
+            return res.to_map()['body']
+
+    def get_vserver_group_detail(self, region_id, vserver_group_id):
+        """查询服务器组的详细信息"""
+        with self as cli:
+            req = models.DescribeVServerGroupAttributeRequest(region_id=region_id, vserver_group_id=vserver_group_id)
+            res = cli.describe_vserver_group_attribute(req)
+            return res.to_map()['body']
+
+    def delete_vserver_group(self, region_id, vserver_group_id):
+        with self as cli:
+            req = models.DeleteVServerGroupRequest(region_id=region_id, vserver_group_id=vserver_group_id)
+            res = cli.delete_vserver_group(req)
+            return res.to_map()['body']
+
+    def create_vserver_group(self, region_id, slb_id, name, backend_servers=None):
+        """添加后端服务器组并向指定的后端服务器组中添加后端服务器"""
+        with self as cli:
+            if backend_servers:
+                req = models.CreateVServerGroupRequest(region_id=region_id, load_balancer_id=slb_id, vserver_group_name=name, backend_servers=backend_servers)
+            else:
+                req = models.CreateVServerGroupRequest(region_id=region_id, load_balancer_id=slb_id, vserver_group_name=name)
+            res = cli.create_vserver_group(req)
+            return res.to_map()['body']
+
+    def remove_backend_servers(self, region_id, slb_id, backend_servers: str):
+        """移除后端服务器
+        backend_servers格式 [{"ServerId":"i-2zej4lxhjoq***", "Type": "ecs","Weight":"100"}]"""
+        with self as cli:
+            req = models.RemoveBackendServersRequest(region_id=region_id, load_balancer_id=slb_id, backend_servers=backend_servers)
+            res = cli.remove_backend_servers(req)
+            return res.to_map()['body']
+
+    def add_backend_servers(self, region_id, slb_id, backend_servers: str):
+        """添加后端服务器"""
+        with self as cli:
+            req = models.AddBackendServersRequest(region_id=region_id, load_balancer_id=slb_id, backend_servers=backend_servers)
+            res = cli.add_backend_servers(req)
+            return res.to_map()['body']
+
+    def set_backend_servers(self, region_id, slb_id, backend_servers: str):
+        """修改后端服务器的权重"""
+        with self as cli:
+            req = models.SetBackendServersRequest(region_id=region_id, load_balancer_id=slb_id, backend_servers=backend_servers)
+            res = cli.set_backend_servers(req)
+            return res.to_map()['body']
+
+    # AddBackendServers/SetBackendServers/RemoveBackendServers 单次最多20个服务器
+    batch_limit = 20
+
+    def rollout(self, region_id, slb_id, servers, remove=(), batch_size=20, timeout=300, interval=2, max_interval=15) -> BulkResult:
+        """分批滚动更新默认服务器组的后端服务器
+        servers: [(服务器id, 权重)] 或 [{'ServerId', 'Weight', 'Type', ...}], 已挂载的修改权重, 未挂载的添加
+        remove: 要移除的服务器id, 与servers同批次分批移除, 实现逐批替换
+        每批执行后用一次DescribeHealthStatus检查该批服务器, 全部正常后再执行下一批,
+        权重为0的服务器不检查; 超过timeout未正常或请求失败时停止, 之后的批次记为Skipped
+        返回BulkResult, 每个服务器的每个操作一条, 附带 Wave 和 Action (set, add, remove, health, skip)
+        """
+        servers = [_backend(s) for s in servers]
+        attached = {s['ServerId'] for s in dig(self.get_attribute(region_id, slb_id), 'BackendServers.BackendServer')}
+        size = min(batch_size, self.batch_limit)
+        adds, removes = chunked(servers, size), chunked(remove, size)
+        result = BulkResult()
+        halted = None
+        for wave in range(max(len(adds), len(removes))):
+            batch = adds[wave] if wave < len(adds) else []
+            old = removes[wave] if wave < len(removes) else []
+            if halted:
+                for s in batch:
+                    result.add(s['ServerId'], False, 'Skipped', halted, Wave=wave, Action='skip')
+                for server_id in old:
+                    result.add(server_id, False, 'Skipped', halted, Wave=wave, Action='skip')
+                continue
+            halted = self._wave(region_id, slb_id, wave, batch, old, attached, result, timeout, interval, max_interval)
+        return result.done()
+
+    def _wave(self, region_id, slb_id, wave, batch, old, attached, result, timeout, interval, max_interval):
+        # 执行一批, 返回停止原因, 正常完成返回None
+        calls = [('set', [s for s in batch if s['ServerId'] in attached]),
+                 ('add', [s for s in batch if s['ServerId'] not in attached])]
+        for action, group in calls:
+            if not group:
+                continue
+            try:
+                send = self.set_backend_servers if action == 'set' else self.add_backend_servers
+                body = send(region_id, slb_id, json.dumps(group))
+            except Exception as e:
+                info = error_info(e)
+                for s in group:
+                    result.add(s['ServerId'], False, info['Code'], info['Message'], info['RequestId'], Wave=wave, Action=action)
+                return 'wave %s failed: %s' % (wave, info['Code'])
+            attached.update(s['ServerId'] for s in group)
+            for s in group:
+                result.add(s['ServerId'], True, request_id=body.get('RequestId'), Wave=wave, Action=action)
+
+        # 新服务器正常后再移除旧服务器
+        gated = {s['ServerId'] for s in batch if str(s.get('Weight', '100')) != '0'}
+        unhealthy = self._wait_healthy(region_id, slb_id, gated, timeout, interval, max_interval)
+        if unhealthy:
+            for server_id, status in sorted(unhealthy.items()):
+                result.add(server_id, False, 'Unhealthy', status, Wave=wave, Action='health')
+            return 'wave %s unhealthy after %ss: %s' % (wave, timeout, sorted(unhealthy))
+
+        if old:
+            try:
+                body = self.remove_backend_servers(region_id, slb_id, json.dumps([{'ServerId': i} for i in old]))
+            except Exception as e:
+                info = error_info(e)
+                for server_id in old:
+                    result.add(server_id, False, info['Code'], info['Message'], info['RequestId'], Wave=wave, Action='remove')
+                return 'wave %s failed: %s' % (wave, info['Code'])
+            attached.difference_update(old)
+            for server_id in old:
+                result.add(server_id, True, request_id=body.get('RequestId'), Wave=wave, Action='remove')
+        return None
+
+    def _wait_healthy(self, region_id, slb_id, server_ids, timeout, interval, max_interval):
+        """等待server_ids的健康检查全部正常, 每轮查询一次整个负载均衡的健康状态
+        返回超时时未正常的 {服务器id: 状态}, 全部正常返回空dict
+        """
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while server_ids:
+            entries = dig(self.get_health_status(region_id, slb_id), 'BackendServers.BackendServer')
+            if not entries:
+                # 没有运行中的监听, 无健康检查可等待
+                return {}
+            statuses = {}
+            for entry in entries:
+                if entry.get('ServerId') in server_ids and statuses.get(entry['ServerId'], 'normal') == 'normal':
+                    statuses[entry['ServerId']] = entry.get('ServerHealthStatus')
+            unhealthy = {i: statuses.get(i, 'missing') for i in server_ids if statuses.get(i) != 'normal'}
+            if not unhealthy:
+                return {}
+            delay = backoff(attempt, interval, max_interval)
+            if time.monotonic() + delay > deadline:
+                return unhealthy
+            time.sleep(delay)
+            attempt += 1
+        return {}
+
+    def rollout_many(self, region_id, rollouts, parallel=4, **kwargs) -> dict:
+        """并发滚动更新多个负载均衡
+        rollouts: {slb_id: servers} 或 {slb_id: {'servers': [...], 'remove': [...]}}
+        kwargs 透传给rollout, 返回 {slb_id: BulkResult或异常}
+        """
+        def run(slb_id):
+            spec = rollouts[slb_id]
+            if isinstance(spec, dict):
+                return self.rollout(region_id, slb_id, **dict(kwargs, **spec))
+            return self.rollout(region_id, slb_id, spec, **kwargs)
+
+        results = {}
+        for slb_id, result, e in run_parallel(run, list(rollouts), parallel):
+            results[slb_id] = result if e is None else e
+        return results
+
+
+    def create_listener(self, region_id, slb_id, vserver_group_id, listener_port, bandwidth=-1,
+                        health_check_interval=2, established_timeout=900, scheduler='tch',
+                        health_check_connect_timeout=5, **kwargs):
+        """创建TCP监听"""
+        with self as cli:
+            req = models.CreateLoadBalancerTCPListenerRequest(
+                        region_id=region_id, 
+                        load_balancer_id=slb_id, 
+                        vserver_group_id=vserver_group_id,
+                        listener_port=int(listener_port), 
+                        scheduler=scheduler,
+                        bandwidth=bandwidth,
+                        health_check_interval=2,
+                        established_timeout=900,
+                        health_check_connect_timeout=5,
+                        **kwargs)
+            res = cli.create_load_balancer_tcplistener(req)
+            return res.to_map()['body']
+
+    def update_listener(self, region_id, slb_id, vserver_group_id, listener_port, bandwidth=-1,
+                    health_check_interval=2, established_timeout=900, scheduler='tch',
+                    health_check_connect_timeout=5, **kwargs):
+        """修改TCP监听"""
+        with self as cli:
+            req = models.SetLoadBalancerTCPListenerAttributeRequest(
+                        region_id=region_id, 
+                        load_balancer_id=slb_id, 
+                        vserver_group_id=vserver_group_id,
+                        listener_port=int(listener_port), 
+                        scheduler=scheduler,
+                        bandwidth=bandwidth,
+                        health_check_interval=2,
+                        established_timeout=900,
+                        health_check_connect_timeout=5,
+                        **kwargs)
+            res = cli.set_load_balancer_tcplistener_attribute(req)
+            return res.to_map()['body']
+
+
+    def delete_listener(self, region_id, slb_id, listener_port, **kwargs):
+        with self as cli:
+            req = models.DeleteLoadBalancerListenerRequest(region_id, load_balancer_id=slb_id,  listener_port=int(listener_port))
+            res = cli.delete_load_balancer_listener(req)
+            return res.to_map()['body']
+
+    def start_listener(self, region_id, slb_id, listener_port, **kwargs):
+        """启动监听"""
+        with self as cli:
+            req = models.StartLoadBalancerListenerRequest(region_id=region_id, load_balancer_id=slb_id, listener_port=int(listener_port))
+            res = cli.start_load_balancer_listener(req)
+            return res.to_map()['body']
+
+    def stop_listener(self, region_id, slb_id, listener_port, **kwargs):
+        """启动监听"""
+        with self as cli:
+            req = models.StopLoadBalancerListenerRequest(region_id=region_id, load_balancer_id=slb_id, listener_port=int(listener_port))
+            res = cli.stop_load_balancer_listener(req)
+            return res.to_map()['body']
+
+    def get_listeners(self, region_id, type='tcp', slb_id=None):
+        """查询负载均衡监听列表详情,默认tcp协议"""
+        with self as cli:
+            req = models.DescribeLoadBalancerListenersRequest(region_id=region_id, listener_protocol=type)
+            res = cli.describe_load_balancer_listeners(req)
+            return res.to_map()['body']
+
+    def __str__(self):
+        # 返回产品类型,用于endpoint
+        return 'slb'
+
+
+def _backend(server):
+    # (服务器id, 权重) 转为接口格式
+    if isinstance(server, dict):
+        return dict(server)
+    server_id, weight = server
+    return {'ServerId': server_id, 'Weight': str(weight), 'Type': 'ecs'}
+
+
+class AsyncSLB(AsyncClient, SLBClient):
+    """SLB的异步版本, 方法与SLB一致, 需await调用"""
+    async def get(self, region_id, **kwargs):
+        req = models.DescribeLoadBalancersRequest(region_id=region_id, **kwargs)
+        return (await self._call('describe_load_balancers', req))['body']
+
+    def iter_load_balancers(self, region_id, page_size=100, fields=None, **kwargs):
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)
+        return apaginate(fetch, 'LoadBalancers.LoadBalancer', page_size, fields=fields)
+
+    async def create(self, region_id, name, master_zone_id, slave_zone_id,
+                    address_type='internet',
+                    load_balancer_spec='slb.s2.small',
+                    address_ipversion='ipv4',
+                    pay_type='PayOnDemand',
+                    **kwargs):
+        req = models.CreateLoadBalancerRequest(
+                region_id=region_id,
+                load_balancer_name=name,
+                address_type=address_type,
+                load_balancer_spec=load_balancer_spec,
+                address_ipversion=address_ipversion,
+                pay_type=pay_type,
+                **kwargs
+            )
+        return (await self._call('create_load_balancer', req))['body']
+
+    async def delete(self, region_id, slb_id):
+        req = models.DeleteLoadBalancerRequest(region_id=region_id, load_balancer_id=slb_id)
+        return (await self._call('delete_load_balancer', req))['body']
+
+    async def get_attribute(self, region_id, slb_id):
+        req = models.DescribeLoadBalancerAttributeRequest(region_id=region_id, load_balancer_id=slb_id)
+        return (await self._call('describe_load_balancer_attribute', req))['body']
+
+    async def get_health_status(self, region_id, slb_id, **kwargs):
+        req = models.DescribeHealthStatusRequest(region_id=region_id, load_balancer_id=slb_id, **kwargs)
+        return (await self._call('describe_health_status', req))['body']
+
+    async def add_tag(self, region_id, slb_id, tags):
+        if isinstance(tags, str):
+            tags = [tags]
+        req = models.AddTagsRequest(region_id=region_id, load_balancer_id=slb_id, tags=tags)
+        return (await self._call('add_tags', req))['body']
+
+    @cached('slb_zones', ttl=86400)
+    async def get_zone_id(self, region_id):
+        req = models.DescribeZonesRequest(region_id=region_id)
+        return (await self._call('describe_zones', req))['body']
+
+    async def get_vserver_groups(self, region_id, slb_id, **kwargs):
+        req = models.DescribeVServerGroupsRequest(region_id=region_id, load_balancer_id=slb_id, **kwargs)
+        return (await self._call('describe_vserver_groups', req))['body']
+
+    async def get_vserver_group_detail(self, region_id, vserver_group_id):
+        req = models.DescribeVServerGroupAttributeRequest(region_id=region_id, vserver_group_id=vserver_group_id)
+        return (await self._call('describe_vserver_group_attribute', req))['body']
+
+    async def delete_vserver_group(self, region_id, vserver_group_id):
+        req = models.DeleteVServerGroupRequest(region_id=region_id, vserver_group_id=vserver_group_id)
+        return (await self._call('delete_vserver_group', req))['body']
+
+    async def create_vserver_group(self, region_id, slb_id, name, backend_servers=None):
+        req = models.CreateVServerGroupRequest(region_id=region_id, load_balancer_id=slb_id, vserver_group_name=name, backend_servers=backend_servers)
+        return (await self._call('create_vserver_group', req))['body']
+
+    async def remove_backend_servers(self, region_id, slb_id, backend_servers: str):
+        req = models.RemoveBackendServersRequest(region_id=region_id, load_balancer_id=slb_id, backend_servers=backend_servers)
+        return (await self._call('remove_backend_servers', req))['body']
+
+    async def add_backend_servers(self, region_id, slb_id, backend_servers: str):
+        req = models.AddBackendServersRequest(region_id=region_id, load_balancer_id=slb_id, backend_servers=backend_servers)
+        return (await self._call('add_backend_servers', req))['body']
+
+    async def set_backend_servers(self, region_id, slb_id, backend_servers: str):
+        req = models.SetBackendServersRequest(region_id=region_id, load_balancer_id=slb_id, backend_servers=backend_servers)
+        return (await self._call('set_backend_servers', req))['body']
+
+    async def create_listener(self, region_id, slb_id, vserver_group_id, listener_port, bandwidth=-1,
+                        health_check_interval=2, established_timeout=900, scheduler='tch',
+                        health_check_connect_timeout=5, **kwargs):
+        req = models.CreateLoadBalancerTCPListenerRequest(
+                    region_id=region_id,
+                    load_balancer_id=slb_id,
+                    vserver_group_id=vserver_group_id,
+                    listener_port=int(listener_port),
+                    scheduler=scheduler,
+                    bandwidth=bandwidth,
+                    health_check_interval=health_check_interval,
+                    established_timeout=established_timeout,
+                    health_check_connect_timeout=health_check_connect_timeout,
+                    **kwargs)
+        return (await self._call('create_load_balancer_tcplistener', req))['body']
+
+    async def update_listener(self, region_id, slb_id, vserver_group_id, listener_port, bandwidth=-1,
+                    health_check_interval=2, established_timeout=900, scheduler='tch',
+                    health_check_connect_timeout=5, **kwargs):
+        req = models.SetLoadBalancerTCPListenerAttributeRequest(
+                    region_id=region_id,
+                    load_balancer_id=slb_id,
+                    vserver_group_id=vserver_group_id,
+                    listener_port=int(listener_port),
+                    scheduler=scheduler,
+                    bandwidth=bandwidth,
+                    health_check_interval=health_check_interval,
+                    established_timeout=established_timeout,
+                    health_check_connect_timeout=health_check_connect_timeout,
+                    **kwargs)
+        return (await self._call('set_load_balancer_tcplistener_attribute', req))['body']
+
+    async def delete_listener(self, region_id, slb_id, listener_port, **kwargs):
+        req = models.DeleteLoadBalancerListenerRequest(region_id=region_id, load_balancer_id=slb_id, listener_port=int(listener_port))
+        return (await self._call('delete_load_balancer_listener', req))['body']
+
+    async def start_listener(self, region_id, slb_id, listener_port, **kwargs):
+        req = models.StartLoadBalancerListenerRequest(region_id=region_id, load_balancer_id=slb_id, listener_port=int(listener_port))
+        return (await self._call('start_load_balancer_listener', req))['body']
+
+    async def stop_listener(self, region_id, slb_id, listener_port, **kwargs):
+        req = models.StopLoadBalancerListenerRequest(region_id=region_id, load_balancer_id=slb_id, listener_port=int(listener_port))
+        return (await self._call('stop_load_balancer_listener', req))['body']
+
+    async def get_listeners(self, region_id, type='tcp', slb_id=None):
+        req = models.DescribeLoadBalancerListenersRequest(region_id=region_id, listener_protocol=type)
+        return (await self._call('describe_load_balancer_listeners', req))['body']
+
+    def __str__(self):
+        return 'slb'
@@ -0,0 +1,159 @@
+"""本地资源快照, 基于sqlite
+保存各wrapper查询到的资源, 按地域, vpc, 交换机, 可用区, 状态, 标签建立索引, 离线查询:
+    store = Store('inventory.db')
+    store.sync('ecs', ECS.for_region(ak, sk, 'ap-south-1'), 'ap-south-1')
+    store.query('ecs', vswitch_id='vsw-x')
+    store.query('eip', status='Available')     # 未绑定的eip
+    store.query('ecs', tags={'env': 'prod'})
+按(资源类型, 地域)增量刷新, 只写入有变化的记录
+"""
+import json
+import sqlite3
+import threading
+import time
+from .paginate import dig
+from .diff import fingerprint
+
+__all__ = ('Store', 'RESOURCES')
+
+# 资源类型 -> 自动翻页方法和索引字段在记录中的路径
+RESOURCES = {
+    'ecs': {'iter': 'iter_instances', 'id': 'InstanceId', 'vpc_id': 'VpcAttributes.VpcId',
+            'vswitch_id': 'VpcAttributes.VSwitchId', 'zone_id': 'ZoneId', 'status': 'Status', 'tags': 'Tags.Tag'},
+    'eip': {'iter': 'iter_eips', 'id': 'AllocationId', 'status': 'Status', 'tags': 'Tags.Tag'},
+    'vpc': {'iter': 'iter_vpcs', 'id': 'VpcId', 'vpc_id': 'VpcId', 'status': 'Status', 'tags': 'Tags.Tag'},
+    'vswitch': {'iter': 'iter_vswitches', 'id': 'VSwitchId', 'vpc_id': 'VpcId', 'vswitch_id': 'VSwitchId',
+                'zone_id': 'ZoneId', 'status': 'Status', 'tags': 'Tags.Tag'},
+    'sg': {'iter': 'iter_groups', 'id': 'SecurityGroupId', 'vpc_id': 'VpcId', 'tags': 'Tags.Tag'},
+    'slb': {'iter': 'iter_load_balancers', 'id': 'LoadBalancerId', 'vpc_id': 'VpcId', 'vswitch_id': 'VSwitchId',
+            'zone_id': 'MasterZoneId', 'status': 'LoadBalancerStatus', 'tags': 'Tags.Tag'},
+    'nat': {'iter': 'iter_nat_gateways', 'id': 'NatGatewayId', 'vpc_id': 'VpcId',
+            'vswitch_id': 'NatGatewayPrivateInfo.VswitchId', 'status': 'Status', 'tags': 'Tags.Tag'},
+}
+
+INDEXES = ('region', 'vpc_id', 'vswitch_id', 'zone_id', 'status')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS resources (
+    type TEXT NOT NULL, id TEXT NOT NULL, region TEXT, vpc_id TEXT, vswitch_id TEXT,
+    zone_id TEXT, status TEXT, digest TEXT, data TEXT, updated REAL,
+    PRIMARY KEY (type, id)
+);
+CREATE TABLE IF NOT EXISTS tags (
+    type TEXT NOT NULL, id TEXT NOT NULL, key TEXT, value TEXT
+);
+CREATE TABLE IF NOT EXISTS refreshes (
+    type TEXT NOT NULL, region TEXT NOT NULL, refreshed REAL, PRIMARY KEY (type, region)
+);
+CREATE INDEX IF NOT EXISTS idx_tags ON tags (type, key, value);
+CREATE INDEX IF NOT EXISTS idx_tags_id ON tags (type, id);
+''' + ''.join('CREATE INDEX IF NOT EXISTS idx_%s ON resources (type, %s);\n' % (c, c) for c in INDEXES)
+
+
+def _value(record, path):
+    if not path:
+        return None
+    for key in path.split('.'):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record or None
+
+
+def _region(record):
+    # fan_out的记录为dict, 或指定fields时为records.Record
+    if isinstance(record, dict):
+        return record.get('RegionId')
+    return getattr(record, 'RegionId', None)
+
+
+def _tags(record, path):
+    # ecs/slb的标签为TagKey/TagValue, vpc的为Key/Value
+    for tag in dig(record, path) if path else []:
+        yield tag.get('TagKey', tag.get('Key')), tag.get('TagValue', tag.get('Value'))
+
+
+class Store:
+    """资源快照存储, path为sqlite文件路径, 默认在内存中"""
+    def __init__(self, path=':memory:'):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def refresh(self, type, region, records) -> dict:
+        """用某地域的最新查询结果刷新type类资源
+        新增或变化的记录写入, 不再存在的记录删除, 未变化的记录不写
+        返回 {'added': n, 'updated': n, 'removed': n, 'unchanged': n}
+        """
+        spec = RESOURCES[type]
+        counts = dict.fromkeys(('added', 'updated', 'removed', 'unchanged'), 0)
+        now = time.time()
+        with self._lock, self.db:
+            old = dict(self.db.execute('SELECT id, digest FROM resources WHERE type=? AND region=?', (type, region)))
+            for record in records:
+                record = record.to_map() if hasattr(record, 'to_map') else record
+                digest = fingerprint(record).hex()
+                rid = _value(record, spec['id'])
+                previous = old.pop(rid, None)
+                if previous == digest:
+                    counts['unchanged'] += 1
+                    continue
+                data = json.dumps(record, ensure_ascii=False, default=str)
+                counts['updated' if previous else 'added'] += 1
+                row = [_value(record, spec.get(c)) for c in INDEXES[1:]]
+                self.db.execute('INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                (type, rid, region, *row, digest, data, now))
+                self.db.execute('DELETE FROM tags WHERE type=? AND id=?', (type, rid))
+                self.db.executemany('INSERT INTO tags VALUES (?, ?, ?, ?)',
+                                    [(type, rid, k, v) for k, v in _tags(record, spec.get('tags'))])
+            for rid in old:
+                self.db.execute('DELETE FROM resources WHERE type=? AND id=?', (type, rid))
+                self.db.execute('DELETE FROM tags WHERE type=? AND id=?', (type, rid))
+            counts['removed'] = len(old)
+            self.db.execute('INSERT OR REPLACE INTO refreshes VALUES (?, ?, ?)', (type, region, now))
+        return counts
+
+    def sync(self, type, client, region_id, **kwargs) -> dict:
+        """通过wrapper的自动翻页方法查询并刷新, 如 sync('ecs', ecs, 'ap-south-1')"""
+        return self.refresh(type, region_id, getattr(client, RESOURCES[type]['iter'])(region_id, **kwargs))
+
+    def refresh_sweep(self, type, result) -> dict:
+        """用region.Fleet的SweepResult刷新, 查询失败的地域保留原有数据
+        返回 {region_id: 刷新统计}
+        """
+        by_region = {r: [] for r in result.regions if r not in result.errors}
+        for record in result.records:
+            region = _region(record)
+            if region in by_region:
+                by_region[region].append(record)
+        return {region: self.refresh(type, region, records) for region, records in by_region.items()}
+
+    def query(self, type, tags=None, **filters) -> list:
+        """按索引字段和标签查询, 如 query('ecs', region='ap-south-1', status='Running', tags={'env': 'prod'})"""
+        sql = ['SELECT data FROM resources r WHERE type=?']
+        args = [type]
+        for column, value in filters.items():
+            if column not in INDEXES:
+                raise ValueError('not an indexed field: %s' % column)
+            sql.append('AND %s=?' % column)
+            args.append(value)
+        for key, value in (tags or {}).items():
+            sql.append('AND EXISTS (SELECT 1 FROM tags t WHERE t.type=r.type AND t.id=r.id AND t.key=? AND t.value=?)')
+            args += [key, value]
+        with self._lock:
+            rows = self.db.execute(' '.join(sql), args).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def get(self, type, id):
+        with self._lock:
+            row = self.db.execute('SELECT data FROM resources WHERE type=? AND id=?', (type, id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def refreshed(self, type, region):
+        """上次刷新的时间戳, 未刷新过返回None"""
+        with self._lock:
+            row = self.db.execute('SELECT refreshed FROM refreshes WHERE type=? AND region=?', (type, region)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.db.close()
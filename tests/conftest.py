@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture
+def cloud():
+    """本地FakeCloud, 需安装sdk"""
+    pytest.importorskip('alibabacloud_ecs20140526')
+    from ..benchmarks.server import FakeCloud
+    with FakeCloud(instances=250) as cloud:
+        yield cloud
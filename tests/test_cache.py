@@ -0,0 +1,86 @@
+"""cache.py 的TTL, LRU和写操作后的失效, 请求发往本地FakeCloud"""
+import time
+from ..cache import TTLCache
+from ..client import ClientPool
+from ..ecs import SecurityGroup
+
+
+def test_ttl_expiry_and_tag_ttls():
+    cache = TTLCache(ttl=0.05, ttls={'images': 10})
+    cache.set(('zones', 'ak', 'ep', ()), 'zones')
+    cache.set(('images', 'ak', 'ep', ()), 'images')
+    assert cache.get(('zones', 'ak', 'ep', ())) == (True, 'zones')
+    time.sleep(0.06)
+    assert cache.get(('zones', 'ak', 'ep', ())) == (False, None)
+    assert cache.get(('images', 'ak', 'ep', ())) == (True, 'images')
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2)
+    for name in ('a', 'b'):
+        cache.set((name, 'ak', 'ep', ()), name)
+    cache.get(('a', 'ak', 'ep', ()))
+    cache.set(('c', 'ak', 'ep', ()), 'c')
+    assert cache.get(('b', 'ak', 'ep', ()))[0] is False
+    assert cache.get(('a', 'ak', 'ep', ()))[0] is True
+
+
+def test_cached_values_are_copies():
+    cache = TTLCache()
+    value = {'items': [1]}
+    cache.set(('t', 'ak', 'ep', ()), value)
+    value['items'].append(2)
+    hit, cached = cache.get(('t', 'ak', 'ep', ()))
+    cached['items'].append(3)
+    assert cache.get(('t', 'ak', 'ep', ()))[1] == {'items': [1]}
+
+
+def test_invalidate_filters():
+    cache = TTLCache()
+    cache.set(('sg_rules', 'ak-a', 'ep', (('sg_id', 'sg-1'),)), 1)
+    cache.set(('sg_rules', 'ak-a', 'ep', (('sg_id', 'sg-2'),)), 2)
+    cache.set(('sg_rules', 'ak-b', 'ep', (('sg_id', 'sg-1'),)), 3)
+    cache.invalidate('sg_rules', 'ep', 'ak-a', sg_id='sg-1')
+    assert cache.stats()['size'] == 2
+    assert cache.get(('sg_rules', 'ak-b', 'ep', (('sg_id', 'sg-1'),)))[0] is True
+
+
+def _group(cloud, cache, ak='ak'):
+    return SecurityGroup(ak, 'sk', cloud.endpoint, pool=ClientPool(), cache=cache, protocol='http')
+
+
+def test_hit_then_expire(cloud):
+    cache = TTLCache(ttls={'security_groups': 0.1})
+    sg = _group(cloud, cache)
+    first = sg.get('cn-local')
+    assert sg.get('cn-local') == first
+    assert cloud.actions['DescribeSecurityGroups'] == 1
+    # 参数不同的查询分别缓存
+    sg.get('cn-local', page_size=10)
+    assert cloud.actions['DescribeSecurityGroups'] == 2
+    time.sleep(0.11)
+    sg.get('cn-local')
+    assert cloud.actions['DescribeSecurityGroups'] == 3
+
+
+def test_write_invalidates(cloud):
+    cache = TTLCache()
+    sg = _group(cloud, cache)
+    sg.get('cn-local')
+    sg.create('cn-local', 'vpc-local', 'web')
+    sg.get('cn-local')
+    assert cloud.actions['DescribeSecurityGroups'] == 2
+
+
+def test_accounts_do_not_share_entries(cloud):
+    cache = TTLCache()
+    a, b = _group(cloud, cache, 'ak-a'), _group(cloud, cache, 'ak-b')
+    a.get('cn-local')
+    b.get('cn-local')
+    assert cloud.actions['DescribeSecurityGroups'] == 2
+    # 一个账号的写操作只清除该账号的缓存
+    a.create('cn-local', 'vpc-local', 'web')
+    b.get('cn-local')
+    assert cloud.actions['DescribeSecurityGroups'] == 2
+    a.get('cn-local')
+    assert cloud.actions['DescribeSecurityGroups'] == 3
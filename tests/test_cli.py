@@ -0,0 +1,121 @@
+"""cli.py 的子命令, Fleet.client 返回替身wrapper, 不访问接口"""
+import io
+import json
+import pytest
+from .. import cli
+from ..region import Fleet
+from ..utils import BulkResult
+
+ARGS = ['--ak', 'ak', '--sk', 'sk']
+
+
+class FakeECS:
+    def iter_instances(self, region_id):
+        for n in range(3):
+            yield {'InstanceId': 'i-%s-%d' % (region_id, n), 'Status': 'Running',
+                   'VpcAttributes': {'PrivateIpAddress': {'IpAddress': ['10.0.0.%d' % n]}}}
+
+    def bulk_options(self, option, region_id, ids, parallel):
+        result = BulkResult()
+        for i in ids:
+            result.add(i, i != 'i-bad', None if i != 'i-bad' else 'IncorrectInstanceStatus')
+        return result.done()
+
+
+class FakeSecurityGroup:
+    calls = []
+
+    def sync(self, region_id, sg_id, rules, prune, dry_run, parallel):
+        self.calls.append((sg_id, rules, prune, dry_run))
+        plan = {'add': [('tcp', '22/22', '0.0.0.0/0', 'accept')], 'remove': [], 'unchanged': 0}
+        if not dry_run:
+            result = BulkResult()
+            result.add('tcp 22/22 0.0.0.0/0 accept', False, 'Forbidden')
+            plan['result'] = result.done()
+        return plan
+
+
+class FakeSLB:
+    def iter_load_balancers(self, region_id):
+        return [{'LoadBalancerId': 'lb-1'}, {'LoadBalancerId': 'lb-bad'}]
+
+    def get_health_status(self, region_id, slb_id):
+        if slb_id == 'lb-bad':
+            raise Exception('boom')
+        return {'BackendServers': {'BackendServer': [{'ServerId': 'i-1', 'ServerHealthStatus': 'normal'}]}}
+
+
+@pytest.fixture(autouse=True)
+def fakes(monkeypatch):
+    wrappers = {'ECS': FakeECS, 'SecurityGroup': FakeSecurityGroup, 'SLB': FakeSLB}
+    monkeypatch.setattr(Fleet, 'client', lambda self, cls, region_id: wrappers[cls.__name__]())
+    FakeSecurityGroup.calls = []
+
+
+def _run(capsys, *argv):
+    code = cli.main(list(argv) + ARGS)
+    out, err = capsys.readouterr()
+    return code, [json.loads(line) for line in out.splitlines()], [json.loads(line) for line in err.splitlines()]
+
+
+def test_inventory_streams_records_with_fields(capsys):
+    code, out, err = _run(capsys, 'inventory', '--regions', 'r1,r2', '--fields', 'InstanceId,ip=VpcAttributes.PrivateIpAddress.IpAddress.0')
+    assert code == 0 and err == []
+    assert len(out) == 6
+    assert {'Type': 'ecs', 'RegionId': 'r2', 'InstanceId': 'i-r2-1', 'ip': '10.0.0.1'} in out
+
+
+def test_instances_reads_ids_from_stdin(capsys, monkeypatch):
+    monkeypatch.setattr('sys.stdin', io.StringIO('{"InstanceId": "i-1"}\ni-bad\n'))
+    code, out, _ = _run(capsys, 'stop', '--regions', 'r1')
+    assert code == 1
+    assert [(r['Id'], r['Success'], r['Action']) for r in out] == [('i-1', True, 'stop'), ('i-bad', False, 'stop')]
+
+
+def test_instances_need_one_region(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(['start', '--regions', 'r1,r2', 'i-1'] + ARGS)
+
+
+def test_sg_sync_requires_rules(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(['sg-sync', '--regions', 'r1', '--sg', 'sg-1'] + ARGS)
+    assert FakeSecurityGroup.calls == []
+
+
+def test_sg_sync_parses_rules(capsys):
+    code, out, _ = _run(capsys, 'sg-sync', '--regions', 'r1', '--sg', 'sg-1', '--rule', 'tcp:22',
+                        '--rule', 'tcp:23:10.0.0.0/8:drop', '--dry-run')
+    assert code == 0
+    assert FakeSecurityGroup.calls == [('sg-1', [{'type': 'tcp', 'port': '22'},
+                                                 {'type': 'tcp', 'port': '23', 'source_cidr_ip': '10.0.0.0/8', 'policy': 'drop'}],
+                                        True, True)]
+    assert out == [{'RegionId': 'r1', 'SecurityGroupId': 'sg-1', 'add': ['tcp 22/22 0.0.0.0/0 accept'], 'remove': [], 'unchanged': 0}]
+
+
+def test_sg_sync_counts_failed_calls(capsys):
+    code, out, _ = _run(capsys, 'sg-sync', '--regions', 'r1,r2', '--sg', 'sg-1', '--rule', 'tcp:22', '--no-prune')
+    assert code == 1
+    assert [r['ok'] for r in out] == [False, False]
+    assert all(prune is False for _, _, prune, _ in FakeSecurityGroup.calls)
+
+
+def test_slb_health_reports_errors_per_load_balancer(capsys):
+    code, out, err = _run(capsys, 'slb-health', '--regions', 'r1')
+    assert code == 1
+    assert out == [{'RegionId': 'r1', 'ServerId': 'i-1', 'ServerHealthStatus': 'normal', 'LoadBalancerId': 'lb-1'}]
+    assert [(e['LoadBalancerId'], e['Message']) for e in err] == [('lb-bad', 'boom')]
+
+
+def test_stream_reports_failed_jobs():
+    out, err = io.StringIO(), io.StringIO()
+    output = cli.Output(out, err)
+
+    def broken():
+        yield {'n': 1}
+        raise Exception('page 2 failed')
+
+    cli.stream([({'RegionId': 'r1'}, broken), ({'RegionId': 'r2'}, lambda: iter([{'n': 1}]))], 2, output)
+    assert sorted(out.getvalue().splitlines()) == ['{"RegionId": "r1", "n": 1}', '{"RegionId": "r2", "n": 1}']
+    assert json.loads(err.getvalue()) == {'RegionId': 'r1', 'Code': 'Exception', 'Message': 'page 2 failed', 'RequestId': None}
+    assert output.errors == 1
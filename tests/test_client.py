@@ -0,0 +1,78 @@
+"""client.py 的client池, 请求发往本地FakeCloud"""
+import threading
+import time
+from ..client import ClientPool
+from ..ecs import ECS
+
+
+def test_pool_reuses_released_client():
+    pool = ClientPool()
+    created = []
+    factory = lambda: created.append(object()) or created[-1]
+    first = pool.acquire('k', factory)
+    pool.release('k', first)
+    assert pool.acquire('k', factory) is first
+    assert len(created) == 1
+    # 已取出的client不会同时交给另一个调用方
+    assert pool.acquire('k', factory) is not first
+    assert pool.stats() == {'idle': 0, 'keys': 0, 'hits': 1, 'misses': 2}
+
+
+def test_pool_evicts_oldest_and_idle_clients():
+    pool = ClientPool(max_size=2, idle_timeout=0.05)
+    for key in ('a', 'b', 'c'):
+        pool.release(key, key)
+    assert pool.stats()['idle'] == 2
+    assert pool.acquire('a', lambda: 'new-a') == 'new-a'
+    time.sleep(0.06)
+    assert pool.acquire('c', lambda: 'new-c') == 'new-c'
+    assert pool.stats()['idle'] == 0
+
+
+def test_calls_share_one_client(cloud):
+    pool = ClientPool()
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=pool, protocol='http')
+    for _ in range(5):
+        ecs.get('cn-local', page_size=10)
+    # 另一个相同配置的wrapper也复用池中的client
+    ECS('ak', 'sk', cloud.endpoint, pool=pool, protocol='http').get('cn-local', page_size=10)
+    assert (pool.misses, pool.hits) == (1, 5)
+    assert cloud.actions['DescribeInstances'] == 6
+
+
+def test_concurrent_calls_never_share_a_client(cloud):
+    pool = ClientPool()
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=pool, protocol='http')
+    in_use, overlaps = set(), []
+    lock = threading.Lock()
+    send = ecs._send
+
+    def tracked(cli, method, req, runtime):
+        with lock:
+            if id(cli) in in_use:
+                overlaps.append(cli)
+            in_use.add(id(cli))
+        try:
+            return send(cli, method, req, runtime)
+        finally:
+            with lock:
+                in_use.discard(id(cli))
+
+    ecs._send = tracked
+    threads = [threading.Thread(target=lambda: [ecs.get('cn-local', page_size=10) for _ in range(5)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert overlaps == []
+    assert pool.misses <= 8
+
+
+def test_rotated_secret_gets_new_client(cloud):
+    pool = ClientPool()
+    ECS('ak', 'old-secret', cloud.endpoint, pool=pool, protocol='http').get('cn-local', page_size=10)
+    ecs = ECS('ak', 'new-secret', cloud.endpoint, pool=pool, protocol='http')
+    ecs.get('cn-local', page_size=10)
+    assert pool.misses == 2
+    with ecs as cli:
+        assert cli._cli._credential.get_credential().access_key_secret == 'new-secret'
@@ -0,0 +1,165 @@
+"""ecs.py 的批量创建和安全组同步, sdk调用由替身方法代替, 不访问接口"""
+import pytest
+from ..ecs import ECS
+
+
+def _ecs(**methods):
+    # 不初始化sdk配置, 只替换用到的wrapper方法
+    ecs = ECS.__new__(ECS)
+    for name, fn in methods.items():
+        setattr(ecs, name, fn)
+    return ecs
+
+
+class FakeRun:
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+        self.serial = 0
+
+    def __call__(self, region_id, name, image_id, instance_type, v_switch_id, sg_id, amount, **kwargs):
+        self.calls.append({'VSwitchId': v_switch_id, 'Name': name, 'Amount': amount})
+        if v_switch_id in self.fail:
+            raise Exception('InvalidVSwitchId.NotFound')
+        ids = ['i-%d' % (self.serial + n) for n in range(amount)]
+        self.serial += amount
+        return {'RequestId': 'req', 'InstanceIdSets': {'InstanceIdSet': ids}}
+
+
+def test_bulk_run_splits_count_evenly_across_vswitches():
+    run = FakeRun()
+    ecs = _ecs(run=run)
+    result = ecs.bulk_run('cn-local', 'web', 'img', 'ecs.g6.large', ['vsw-a', 'vsw-b', 'vsw-c'], 'sg', 250, chunk_size=50)
+    assert len(result['InstanceIds']) == 250
+    assert result['failed'] == []
+    per_vswitch = {}
+    for call in run.calls:
+        assert call['Amount'] <= 50
+        per_vswitch[call['VSwitchId']] = per_vswitch.get(call['VSwitchId'], 0) + call['Amount']
+    assert per_vswitch == {'vsw-a': 84, 'vsw-b': 83, 'vsw-c': 83}
+
+
+def test_bulk_run_names_do_not_overlap():
+    run = FakeRun()
+    _ecs(run=run).bulk_run('cn-local', 'web', 'img', 'ecs.g6.large', ['vsw-a', 'vsw-b'], 'sg', 6, chunk_size=2)
+    numbers = []
+    for call in run.calls:
+        start = int(call['Name'].split('[')[1].split(',')[0])
+        numbers += range(start, start + call['Amount'])
+    assert sorted(numbers) == [1, 2, 3, 4, 5, 6]
+
+
+def test_bulk_run_chunks_respect_run_limit():
+    run = FakeRun()
+    _ecs(run=run).bulk_run('cn-local', 'web', 'img', 'ecs.g6.large', 'vsw-a', 'sg', 250, chunk_size=1000)
+    assert [call['Amount'] for call in run.calls] == [100, 100, 50]
+
+
+def test_bulk_run_reports_failed_chunks():
+    run = FakeRun(fail=['vsw-b'])
+    seen = []
+    result = _ecs(run=run).bulk_run('cn-local', 'web', 'img', 'ecs.g6.large', ['vsw-a', 'vsw-b'], 'sg', 4, callback=seen.append)
+    assert len(result['InstanceIds']) == 2
+    assert [item['VSwitchId'] for item in result['failed']] == ['vsw-b']
+    assert result['failed'][0]['Message'] == 'InvalidVSwitchId.NotFound'
+    assert len(seen) == 2
+
+
+def test_iter_run_rejects_empty_vswitches():
+    with pytest.raises(ValueError):
+        _ecs(run=FakeRun()).iter_run('cn-local', 'web', 'img', 'ecs.g6.large', [], 'sg', 3)
+
+
+@pytest.mark.parametrize('chunk_size, parallel', [(0, 4), (-1, 4), (100, 0)])
+def test_batch_sizes_must_be_positive(chunk_size, parallel):
+    run = FakeRun()
+    ecs = _ecs(run=run)
+    with pytest.raises(ValueError):
+        ecs.iter_run('cn-local', 'web', 'img', 'ecs.g6.large', 'vsw-a', 'sg', 3, chunk_size=chunk_size, parallel=parallel)
+    with pytest.raises(ValueError):
+        ecs.bulk_start('cn-local', ['i-1'], chunk_size=chunk_size, parallel=parallel)
+    assert run.calls == []
+
+
+class Response:
+    def __init__(self, body):
+        self.body = body
+
+    def to_map(self):
+        return {'headers': {}, 'statusCode': 200, 'body': self.body}
+
+
+class FakeSecurityGroupApi:
+    """sdk client替身, 保存一个安全组的规则"""
+    def __init__(self, permissions):
+        self.permissions = permissions
+        self.calls = []
+
+    def describe_security_group_attribute(self, req):
+        return Response({'Permissions': {'Permission': list(self.permissions)}})
+
+    def authorize_security_group(self, req):
+        self.calls.append(('add', req.ip_protocol, req.port_range, req.source_cidr_ip, req.policy))
+        return Response({'RequestId': 'req-add'})
+
+    def revoke_security_group(self, req):
+        self.calls.append(('remove', req.ip_protocol, req.port_range, req.source_cidr_ip, req.policy))
+        return Response({'RequestId': 'req-remove'})
+
+
+def _permission(protocol, port, cidr, policy='Accept', direction='ingress'):
+    return {'IpProtocol': protocol, 'PortRange': port, 'SourceCidrIp': cidr, 'Policy': policy, 'Direction': direction}
+
+
+def _security_group(permissions):
+    from ..client import ClientPool
+    from ..ecs import SecurityGroup
+    pytest.importorskip('alibabacloud_tea_openapi')
+    api = FakeSecurityGroupApi(permissions)
+    sg = SecurityGroup('ak', 'sk', 'ecs.cn-local.aliyuncs.com', pool=ClientPool())
+    sg._new_client = lambda: api
+    return sg, api
+
+
+def test_rule_key_normalizes_ports_and_policy():
+    from ..ecs import SecurityGroup
+    assert SecurityGroup.rule_key('TCP', 22) == ('tcp', '22/22', '0.0.0.0/0', 'accept')
+    assert SecurityGroup.rule_key('icmp', -1, '10.0.0.0/8', 'Drop') == ('icmp', '-1/-1', '10.0.0.0/8', 'drop')
+
+
+def test_plan_only_changes_what_differs():
+    sg, _ = _security_group([
+        _permission('TCP', '22/22', '0.0.0.0/0'),
+        _permission('TCP', '80/80', '0.0.0.0/0'),
+        _permission('TCP', '3306/3306', '', direction='ingress'),  # 按安全组授权的规则不管理
+        _permission('TCP', '443/443', '0.0.0.0/0', direction='egress'),
+    ])
+    plan = sg.plan('cn-local', 'sg-1', [('tcp', 22), ('tcp', '443', '0.0.0.0/0')])
+    assert plan['add'] == [('tcp', '443/443', '0.0.0.0/0', 'accept')]
+    assert [p['PortRange'] for p in plan['remove']] == ['80/80']
+    assert plan['unchanged'] == 1
+
+
+def test_plan_does_not_match_drop_rule_with_accept_rule():
+    sg, _ = _security_group([_permission('tcp', '22/22', '0.0.0.0/0', policy='Drop')])
+    plan = sg.plan('cn-local', 'sg-1', [('tcp', 22)])
+    assert plan['add'] == [('tcp', '22/22', '0.0.0.0/0', 'accept')]
+    assert [p['Policy'] for p in plan['remove']] == ['Drop']
+    assert sg.plan('cn-local', 'sg-1', [{'type': 'tcp', 'port': 22, 'policy': 'drop'}])['unchanged'] == 1
+
+
+def test_sync_dry_run_and_prune():
+    sg, api = _security_group([_permission('tcp', '80/80', '0.0.0.0/0')])
+    plan = sg.sync('cn-local', 'sg-1', [('tcp', 22)], dry_run=True)
+    assert 'result' not in plan and api.calls == []
+    sg.sync('cn-local', 'sg-1', [('tcp', 22)], prune=False)
+    assert api.calls == [('add', 'tcp', '22/22', '0.0.0.0/0', 'accept')]
+
+
+def test_sync_applies_plan():
+    sg, api = _security_group([_permission('tcp', '80/80', '0.0.0.0/0'), _permission('tcp', '22/22', '0.0.0.0/0')])
+    plan = sg.sync('cn-local', 'sg-1', [('tcp', 22), ('tcp', 443)])
+    assert sorted(api.calls) == [('add', 'tcp', '443/443', '0.0.0.0/0', 'accept'),
+                                 ('remove', 'tcp', '80/80', '0.0.0.0/0', 'Accept')]
+    assert plan['result'].ok
+    assert sorted(item['Action'] for item in plan['result'].results) == ['add', 'remove']
@@ -0,0 +1,109 @@
+"""eippool.py, EIP接口由替身对象模拟, 不访问接口"""
+import pytest
+from ..eippool import EIPPool
+
+
+class FakeEIP:
+    """模拟 vpc.EIP 的 create, delete 和 iter_eips"""
+    def __init__(self, existing=(), fail=False):
+        self.eips = {e['AllocationId']: dict(e) for e in existing}
+        self.fail = fail
+        self.created = []
+        self.deleted = []
+
+    def create(self, region_id, type='PayByTraffic', bandwidth='200', **kwargs):
+        if self.fail:
+            raise Exception('QuotaExceeded.Eip')
+        n = len(self.created) + 1
+        eip = {'AllocationId': 'eip-%d' % n, 'IpAddress': '47.0.0.%d' % n, 'Status': 'Available', 'Bandwidth': str(bandwidth),
+               'InternetChargeType': type, 'Name': kwargs.get('name')}
+        self.eips[eip['AllocationId']] = eip
+        self.created.append(eip['AllocationId'])
+        return {'body': {'AllocationId': eip['AllocationId'], 'EipAddress': eip['IpAddress'], 'RequestId': 'req'}}
+
+    def delete(self, region_id, allocation_id):
+        self.deleted.append(allocation_id)
+        del self.eips[allocation_id]
+
+    def iter_eips(self, region_id, status=None):
+        return [dict(e) for e in self.eips.values() if status is None or e['Status'] == status]
+
+
+def test_warm_and_acquire_from_pool():
+    api = FakeEIP()
+    pool = EIPPool(api, size=2)
+    assert pool.warm('cn-local', bandwidth=5) == 2
+    eip = pool.acquire('cn-local', bandwidth=5)
+    assert eip['EipAddress'] and eip['AllocationId'] in api.created
+    assert (pool.hits, pool.misses) == (1, 0)
+    assert pool.stats()[('cn-local', 'PayByTraffic', '5')] == {'idle': 1, 'pending': 0, 'leased': 1}
+
+
+def test_acquire_allocates_when_pool_is_empty():
+    api = FakeEIP()
+    pool = EIPPool(api, size=0)
+    eip = pool.acquire('cn-local')
+    assert eip['AllocationId'] == 'eip-1'
+    assert (pool.hits, pool.misses) == (0, 1)
+
+
+def test_release_by_id_keeps_address():
+    pool = EIPPool(FakeEIP(), size=1)
+    pool.warm('cn-local')
+    eip = pool.acquire('cn-local')
+    pool.release(eip['AllocationId'])
+    again = pool.acquire('cn-local')
+    assert again == eip and again['EipAddress'] == '47.0.0.1'
+
+
+def test_release_unknown_eip():
+    pool = EIPPool(FakeEIP())
+    with pytest.raises(ValueError):
+        pool.release('eip-unknown')
+
+
+def test_release_over_max_size_deletes():
+    api = FakeEIP()
+    pool = EIPPool(api, size=0, max_size=1)
+    first, second = pool.acquire('cn-local'), pool.acquire('cn-local')
+    pool.release(first)
+    pool.release(second)
+    assert api.deleted == [second['AllocationId']]
+    assert pool.stats()[('cn-local', 'PayByTraffic', '200')]['idle'] == 1
+
+
+def test_adopt_reclaims_named_available_eips():
+    api = FakeEIP(existing=[
+        {'AllocationId': 'eip-a', 'IpAddress': '1.1.1.1', 'Status': 'Available', 'Bandwidth': '200', 'Name': 'eip-pool'},
+        {'AllocationId': 'eip-b', 'IpAddress': '1.1.1.2', 'Status': 'InUse', 'Bandwidth': '200', 'Name': 'eip-pool'},
+        {'AllocationId': 'eip-c', 'IpAddress': '1.1.1.3', 'Status': 'Available', 'Bandwidth': '200', 'Name': 'other'},
+        {'AllocationId': 'eip-d', 'IpAddress': '1.1.1.4', 'Status': 'Available', 'Bandwidth': '5', 'Name': 'eip-pool'},
+    ])
+    pool = EIPPool(api, size=0)
+    assert pool.adopt('cn-local') == 1
+    assert pool.acquire('cn-local') == {'AllocationId': 'eip-a', 'EipAddress': '1.1.1.1', 'RegionId': 'cn-local'}
+    # 已在池中或已取出的不重复收回
+    assert pool.adopt('cn-local') == 0
+
+
+def test_refresh_trims_idle_specs():
+    api = FakeEIP()
+    pool = EIPPool(api, size=2, idle_timeout=0)
+    pool.warm('cn-local')
+    pool.refresh()
+    assert sorted(api.deleted) == ['eip-1', 'eip-2']
+
+
+def test_allocation_errors_are_kept():
+    pool = EIPPool(FakeEIP(fail=True), size=2)
+    assert pool.warm('cn-local') == 0
+    assert [e['Message'] for e in pool.errors] == ['QuotaExceeded.Eip'] * 2
+    assert pool.stats()[('cn-local', 'PayByTraffic', '200')]['pending'] == 0
+
+
+def test_stop_drain_releases_idle():
+    api = FakeEIP()
+    pool = EIPPool(api, size=2, interval=60).start()
+    pool.warm('cn-local')
+    pool.stop(drain=True)
+    assert sorted(api.deleted) == ['eip-1', 'eip-2']
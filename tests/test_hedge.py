@@ -0,0 +1,139 @@
+"""hedge.py 的对冲请求和client.py 的按接口超时, 请求发往本地FakeCloud"""
+import asyncio
+import contextlib
+import threading
+import time
+import pytest
+from ..client import ClientPool
+from ..ecs import ECS, AsyncECS
+from ..hedge import HedgePolicy
+
+
+@contextlib.contextmanager
+def borrow():
+    yield 'hedge'
+
+
+def slow_primary(delay):
+    def fn(cli):
+        time.sleep(delay if cli == 'primary' else 0.01)
+        return cli
+    return fn
+
+
+def test_fast_primary_is_not_hedged():
+    policy = HedgePolicy(initial_delay=0.2)
+    assert policy.run('DescribeInstances', slow_primary(0.01), 'primary', borrow) == 'primary'
+    assert policy.stats() == {'DescribeInstances': {'calls': 1, 'fired': 0, 'won': 0}}
+
+
+def test_slow_primary_is_hedged_and_client_handed_off():
+    policy = HedgePolicy(initial_delay=0.05)
+    handed = []
+    done = threading.Event()
+
+    def hand_off(cli, future):
+        handed.append(cli)
+        future.add_done_callback(lambda _: done.set())
+
+    assert policy.run('DescribeInstances', slow_primary(0.3), 'primary', borrow, hand_off) == 'hedge'
+    assert policy.stats()['DescribeInstances'] == {'calls': 1, 'fired': 1, 'won': 1}
+    # 主请求结束前不归还client
+    assert handed == ['primary'] and not done.is_set()
+    assert done.wait(1)
+
+
+def test_delay_follows_primary_latency_percentile():
+    policy = HedgePolicy(percentile=50, min_samples=4, initial_delay=1.0, min_delay=0)
+    assert policy.delay('DescribeInstances') == 1.0
+    for _ in range(4):
+        policy.run('DescribeInstances', slow_primary(0.02), 'primary', borrow)
+    assert 0.02 <= policy.delay('DescribeInstances') < 0.1
+
+
+def test_queued_primary_does_not_fire_hedge():
+    policy = HedgePolicy(initial_delay=0.05, max_workers=2)
+    fn = lambda cli: time.sleep(0.03)
+    threads = [threading.Thread(target=policy.run, args=('DescribeInstances', fn, 'primary', borrow)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert policy.stats()['DescribeInstances'] == {'calls': 8, 'fired': 0, 'won': 0}
+
+
+def test_both_failures_raise():
+    policy = HedgePolicy(initial_delay=0.01)
+
+    def fail(cli):
+        time.sleep(0.05)
+        raise ValueError(cli)
+
+    with pytest.raises(ValueError):
+        policy.run('DescribeInstances', fail, 'primary', borrow)
+
+
+def test_async_loser_is_cancelled():
+    policy = HedgePolicy(initial_delay=0.05)
+    cancelled = []
+
+    async def fn(cli):
+        try:
+            await asyncio.sleep(0.5 if cli == 'primary' else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(cli)
+            raise
+        return cli
+
+    async def main():
+        result = await policy.run_async('DescribeInstances', fn, 'primary', borrow)
+        await asyncio.sleep(0.01)
+        return result
+
+    assert asyncio.run(main()) == 'hedge'
+    assert cancelled == ['primary']
+
+
+def test_hedges_slow_describe_calls(cloud):
+    cloud.latency = (0.0, 0.2)
+    pool = ClientPool()
+    policy = HedgePolicy(initial_delay=0.05, min_samples=1000)
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=pool, hedge=policy, protocol='http')
+    for _ in range(20):
+        assert ecs.get('cn-local', page_size=10)['TotalCount'] == 250
+    stats = policy.stats()['DescribeInstances']
+    assert stats['calls'] == 20 and stats['fired'] > 0 and stats['won'] > 0
+    assert cloud.actions['DescribeInstances'] == 20 + stats['fired']
+
+
+def test_writes_are_not_hedged(cloud):
+    cloud.latency = 0.1
+    policy = HedgePolicy(initial_delay=0.01)
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), hedge=policy, protocol='http')
+    ecs.start('cn-local', 'i-0000000000000001')
+    assert policy.stats() == {}
+    assert cloud.actions['StartInstance'] == 1
+
+
+def test_per_action_read_timeout(cloud):
+    cloud.latencies = {'DescribeInstances': 0.5}
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), timeouts={'DescribeInstances': 100}, protocol='http')
+    start = time.monotonic()
+    with pytest.raises(Exception):
+        ecs.get('cn-local', page_size=10)
+    assert time.monotonic() - start < 0.45
+    # 其他接口使用sdk默认超时
+    assert ecs.get_status('cn-local')
+
+
+def test_async_hedge_against_fake_cloud(cloud):
+    pytest.importorskip('aiohttp')
+    cloud.latency = (0.0, 0.2)
+    policy = HedgePolicy(initial_delay=0.05, min_samples=1000)
+
+    async def main():
+        ecs = AsyncECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), hedge=policy, protocol='http')
+        return await asyncio.gather(*[ecs.get('cn-local', page_size=10) for _ in range(10)])
+
+    assert all(body['TotalCount'] == 250 for body in asyncio.run(main()))
+    assert policy.stats()['DescribeInstances']['fired'] > 0
@@ -0,0 +1,75 @@
+"""matrix.py 的增量刷新和查询, 镜像接口由替身对象模拟, 不访问接口"""
+import pytest
+from ..matrix import Matrix
+from .test_ecs import Response
+
+
+class FakeImages:
+    def __init__(self, images, support, fail=()):
+        self.images = images
+        self.support = support
+        self.fail = set(fail)
+        self.cache = None
+        self.calls = []
+
+    def get_images(self, region_id, page_size=100, page_number=1, **kwargs):
+        page = self.images[(page_number - 1) * page_size:page_number * page_size]
+        return {'Images': {'Image': page}, 'TotalCount': len(self.images)}
+
+    def get_instance_type(self, region_id, image_id):
+        self.calls.append(image_id)
+        if image_id in self.fail:
+            raise Exception('Throttling')
+        return {'InstanceTypes': {'InstanceType': self.support[image_id]}}
+
+
+def _type(type_id, cpu, memory):
+    return {'InstanceTypeId': type_id, 'InstanceTypeFamily': type_id.rsplit('.', 1)[0], 'CpuCoreCount': cpu, 'MemorySize': memory}
+
+
+IMAGES = [{'ImageId': 'ubuntu', 'ImageName': 'ubuntu_22_04', 'OSType': 'linux'},
+          {'ImageId': 'win', 'ImageName': 'win2022', 'OSType': 'windows'}]
+SUPPORT = {'ubuntu': [_type('ecs.g6.large', 2, 8), _type('ecs.g6.2xlarge', 8, 32)],
+           'win': [_type('ecs.g6.2xlarge', 8, 32)]}
+
+
+def test_refresh_and_query():
+    matrix = Matrix()
+    counts = matrix.refresh(FakeImages(IMAGES, SUPPORT), 'cn-local')
+    assert counts == {'added': 2, 'updated': 0, 'removed': 0, 'unchanged': 0, 'failed': 0, 'errors': {}}
+    assert [t['InstanceTypeId'] for t in matrix.instance_types('cn-local', image_id='ubuntu', min_cpu=4)] == ['ecs.g6.2xlarge']
+    assert [i['ImageId'] for i in matrix.images('cn-local', instance_type='ecs.g6.large')] == ['ubuntu']
+    assert matrix.supports('cn-local', 'win', 'ecs.g6.2xlarge')
+
+
+def test_refresh_reports_failed_images():
+    matrix = Matrix()
+    counts = matrix.refresh(FakeImages(IMAGES, SUPPORT, fail=['win']), 'cn-local')
+    assert (counts['added'], counts['unchanged'], counts['failed']) == (1, 0, 1)
+    assert list(counts['errors']) == ['win']
+    # 失败的镜像下次刷新重试, 已刷新的不再查询
+    api = FakeImages(IMAGES, SUPPORT)
+    counts = matrix.refresh(api, 'cn-local')
+    assert api.calls == ['win']
+    assert (counts['added'], counts['unchanged'], counts['failed']) == (1, 1, 0)
+
+
+def test_refresh_bypasses_query_cache():
+    pytest.importorskip('alibabacloud_tea_openapi')
+    from ..cache import TTLCache
+    from ..client import ClientPool
+    from ..ecs import ECS
+
+    class Api:
+        def describe_images(self, req):
+            return Response({'Images': {'Image': IMAGES}, 'TotalCount': len(IMAGES)})
+
+        def describe_image_support_instance_types(self, req):
+            return Response({'InstanceTypes': {'InstanceType': SUPPORT[req.image_id]}})
+
+    cache = TTLCache()
+    ecs = ECS('ak', 'sk', 'ecs.cn-local.aliyuncs.com', pool=ClientPool(), cache=cache)
+    ecs._new_client = Api
+    Matrix().refresh(ecs, 'cn-local')
+    assert cache.stats() == {'size': 0, 'hits': 0, 'misses': 0}
+    assert ecs.cache is cache
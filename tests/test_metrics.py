@@ -0,0 +1,67 @@
+"""metrics.py 的调用记录和导出, 请求发往本地FakeCloud"""
+import pytest
+from ..client import ClientPool
+from ..ecs import ECS
+from ..metrics import Metrics
+from ..ratelimit import RateLimiter
+
+
+def _span(action='DescribeInstances', duration=0.02, status='ok', code=None, size=100):
+    return {'action': action, 'region': 'cn-local', 'endpoint': 'ep', 'start': 0, 'duration': duration,
+            'status': status, 'code': code, 'request_id': 'req', 'size': size}
+
+
+def test_stats_and_export():
+    metrics = Metrics(buckets=(0.01, 0.1))
+    metrics.record(_span(duration=0.005))
+    metrics.record(_span(duration=0.05, status='throttled', code='Throttling.User', size=0))
+    metrics.record(_span(duration=1, status='error', code='InternalError', size=0))
+    assert metrics.stats() == {'DescribeInstances': {'calls': 3, 'errors': 1, 'throttled': 1, 'seconds': pytest.approx(1.055), 'bytes': 100}}
+    text = metrics.export()
+    assert 'aliapi_requests_total{action="DescribeInstances",region="cn-local",status="throttled",code="Throttling.User"} 1' in text
+    assert 'aliapi_request_duration_seconds_bucket{action="DescribeInstances",region="cn-local",le="0.1"} 2' in text
+    assert 'aliapi_request_duration_seconds_bucket{action="DescribeInstances",region="cn-local",le="+Inf"} 3' in text
+    assert 'aliapi_response_bytes_total{action="DescribeInstances",region="cn-local"} 100' in text
+    metrics.clear()
+    assert metrics.stats() == {}
+
+
+def test_callbacks_subscribe_and_errors_are_contained(caplog):
+    seen = []
+    metrics = Metrics(on_span=lambda span: 1 / 0)
+    unsubscribe = metrics.subscribe(seen.append)
+    metrics.record(_span())
+    assert len(seen) == 1
+    assert 'metrics callback' in caplog.text
+    unsubscribe()
+    metrics.record(_span())
+    assert len(seen) == 1
+
+
+def test_records_calls_against_fake_cloud(cloud):
+    spans = []
+    metrics = Metrics(on_span=spans.append)
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), metrics=metrics, protocol='http')
+    ecs.get('cn-local', page_size=10)
+    span, = spans
+    assert (span['action'], span['region'], span['status']) == ('DescribeInstances', 'cn-local', 'ok')
+    assert span['request_id'] and span['size'] > 0 and span['duration'] > 0
+
+
+def test_each_retry_is_recorded(cloud):
+    cloud.throttle = 1.0
+    spans = []
+    metrics = Metrics(on_span=spans.append)
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), metrics=metrics, limiter=RateLimiter(rate=1000, retries=2),
+              protocol='http')
+    with pytest.raises(Exception):
+        ecs.get('cn-local', page_size=10)
+    assert [(s['status'], s['code']) for s in spans] == [('throttled', 'Throttling.User')] * 3
+    assert metrics.stats()['DescribeInstances']['throttled'] == 3
+
+
+def test_failing_callback_does_not_fail_call(cloud):
+    metrics = Metrics(on_span=lambda span: 1 / 0)
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), metrics=metrics, protocol='http')
+    assert ecs.get('cn-local', page_size=10)['TotalCount'] == 250
+    assert metrics.stats()['DescribeInstances']['calls'] == 1
@@ -0,0 +1,107 @@
+"""paginate.py 的自动翻页, 预取和异步翻页"""
+import asyncio
+import threading
+import time
+import pytest
+from ..paginate import paginate, apaginate, dig
+from ..ecs import ECS, AsyncECS
+from ..client import ClientPool
+
+
+def pages(total, page_size, calls=None, fail_at=None, delay=0):
+    def fetch(n):
+        if calls is not None:
+            calls.append(n)
+        if n == fail_at:
+            raise Exception('InternalError')
+        time.sleep(delay)
+        start = (n - 1) * page_size
+        return {'TotalCount': total, 'Items': {'Item': list(range(start, min(total, start + page_size)))}}
+    return fetch
+
+
+@pytest.mark.parametrize('prefetch', [0, 1, 3])
+def test_paginate_returns_every_record(prefetch):
+    calls = []
+    assert list(paginate(pages(250, 100, calls), 'Items.Item', 100, prefetch=prefetch)) == list(range(250))
+    assert calls == [1, 2, 3]
+
+
+def test_paginate_exact_multiple_stops_on_total():
+    calls = []
+    assert len(list(paginate(pages(200, 100, calls), 'Items.Item', 100))) == 200
+    assert calls == [1, 2]
+
+
+def test_paginate_raises_fetch_errors_after_earlier_pages():
+    seen = []
+    with pytest.raises(Exception, match='InternalError'):
+        for item in paginate(pages(300, 100, fail_at=2), 'Items.Item', 100):
+            seen.append(item)
+    assert seen == list(range(100))
+
+
+def test_paginate_prefetches_while_consuming():
+    calls = []
+    it = paginate(pages(500, 100, calls, delay=0.01), 'Items.Item', 100, prefetch=2)
+    next(it)
+    time.sleep(0.1)
+    # 只预取有限的页数
+    assert calls == [1, 2, 3, 4]
+
+
+def test_paginate_stops_worker_when_abandoned():
+    it = paginate(pages(10000, 10), 'Items.Item', 10, prefetch=1)
+    next(it)
+    before = threading.active_count()
+    it.close()
+    time.sleep(0.3)
+    assert threading.active_count() <= before - 1
+
+
+def test_paginate_projects_fields():
+    fetch = lambda n: {'TotalCount': 1, 'Items': {'Item': [{'Id': 'a', 'Spec': {'Cpu': 2}}]}}
+    record, = paginate(fetch, 'Items.Item', 100, fields=['Id', 'cpu=Spec.Cpu'])
+    assert (record.Id, record.cpu) == ('a', 2)
+
+
+def test_dig_missing_path():
+    assert dig({'A': None}, 'A.B') == []
+
+
+def test_apaginate_prefetches_next_page():
+    calls = []
+
+    async def fetch(n):
+        calls.append(('start', n))
+        await asyncio.sleep(0.01)
+        return pages(250, 100)(n)
+
+    async def consume():
+        items = []
+        async for item in apaginate(fetch, 'Items.Item', 100):
+            if item == 0:
+                # 处理第一页时第二页已经发出
+                await asyncio.sleep(0)
+                assert ('start', 2) in calls
+            items.append(item)
+        return items
+
+    assert asyncio.run(consume()) == list(range(250))
+
+
+def test_iter_instances_against_fake_cloud(cloud):
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), protocol='http')
+    ids = [i['InstanceId'] for i in ecs.iter_instances('cn-local', page_size=100)]
+    assert len(ids) == len(set(ids)) == 250
+    assert cloud.actions['DescribeInstances'] == 3
+
+
+def test_async_iter_instances_against_fake_cloud(cloud):
+    pytest.importorskip('aiohttp')
+
+    async def collect():
+        ecs = AsyncECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), protocol='http')
+        return [i async for i in ecs.iter_instances('cn-local', page_size=100)]
+
+    assert len(asyncio.run(collect())) == 250
@@ -0,0 +1,85 @@
+"""ratelimit.py 的令牌桶和AIMD降速, 请求发往本地FakeCloud"""
+import time
+import pytest
+from ..client import ClientPool
+from ..ecs import ECS
+from ..ratelimit import RateLimiter, TokenBucket
+
+
+def test_token_bucket_spaces_calls_after_burst():
+    bucket = TokenBucket(rate=100, burst=2)
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.01, abs=0.002)
+
+
+def test_rates_override_by_action_and_region():
+    limiter = RateLimiter(rate=10, rates={'DescribeInstances': 50, ('RunInstances', 'cn-hangzhou'): 5})
+    for action, region in [('DescribeInstances', 'cn-beijing'), ('RunInstances', 'cn-hangzhou'), ('RunInstances', 'cn-beijing')]:
+        limiter.reserve(action, region)
+    assert limiter.current_rates() == {('DescribeInstances', 'cn-beijing'): 50, ('RunInstances', 'cn-hangzhou'): 5,
+                                       ('RunInstances', 'cn-beijing'): 10}
+
+
+def test_throttle_halves_rate_once_per_second_and_recovers():
+    limiter = RateLimiter(rate=8, decrease=0.5, increase=4)
+    limiter.on_throttle('DescribeInstances')
+    limiter.on_throttle('DescribeInstances')  # 同一秒内的并发限流错误只降速一次
+    assert limiter.current_rates()[('DescribeInstances', None)] == 4
+    assert limiter.throttled == 2
+    limiter.on_success('DescribeInstances')
+    assert limiter.current_rates()[('DescribeInstances', None)] == 5
+    for _ in range(10):
+        limiter.on_success('DescribeInstances')
+    assert limiter.current_rates()[('DescribeInstances', None)] == 8
+
+
+def test_rate_never_below_min_rate():
+    limiter = RateLimiter(rate=1, min_rate=0.5)
+    limiter.on_throttle('A')
+    limiter._decreased.clear()
+    limiter.on_throttle('A')
+    assert limiter.current_rates()[('A', None)] == 0.5
+
+
+def _ecs(cloud, limiter):
+    return ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), limiter=limiter, protocol='http')
+
+
+def test_retries_throttled_calls(cloud):
+    cloud.fail = {}
+    cloud.throttle = 0.5
+    limiter = RateLimiter(rate=1000, retries=10)
+    ecs = _ecs(cloud, limiter)
+    for _ in range(10):
+        ecs.get('cn-local', page_size=10)
+    assert limiter.throttled == cloud.errors.get('Throttling.User', 0) > 0
+    # 遇到限流后该接口降速
+    assert limiter.current_rates()[('DescribeInstances', 'cn-local')] < 1000
+
+
+def test_gives_up_after_retries(cloud):
+    cloud.throttle = 1.0
+    limiter = RateLimiter(rate=1000, retries=2, decrease=1.0)
+    with pytest.raises(Exception) as exc:
+        _ecs(cloud, limiter).get('cn-local', page_size=10)
+    assert exc.value.code == 'Throttling.User'
+    assert cloud.actions['DescribeInstances'] == 3
+
+
+def test_backs_off_under_server_quota(cloud):
+    cloud.qps = 20
+    limiter = RateLimiter(rate=40, retries=30)
+    ecs = _ecs(cloud, limiter)
+    start = time.monotonic()
+    while time.monotonic() - start < 1.5:
+        ecs.get('cn-local', page_size=10)
+    assert limiter.throttled > 0
+    assert limiter.current_rates()[('DescribeInstances', 'cn-local')] < 40
+
+
+def test_non_throttling_errors_are_not_retried(cloud):
+    cloud.failures = 1.0
+    limiter = RateLimiter(rate=1000)
+    with pytest.raises(Exception):
+        _ecs(cloud, limiter).get('cn-local', page_size=10)
+    assert cloud.actions['DescribeInstances'] == 1 and limiter.throttled == 0
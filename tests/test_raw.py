@@ -0,0 +1,66 @@
+"""client.py 的raw模式, 请求发往本地FakeCloud"""
+import asyncio
+import threading
+import pytest
+from ..client import ClientPool, RawResponse
+from ..ecs import ECS, AsyncECS
+from ..singleflight import SingleFlight
+from ..vpc import VPC
+
+
+def body(res):
+    # 每次请求的RequestId不同
+    return {k: v for k, v in res.items() if k != 'RequestId'}
+
+
+def test_to_map_returns_independent_copies():
+    res = RawResponse({'headers': {'x': '1'}, 'statusCode': 200, 'body': '{"Items": {"Item": [1]}}'})
+    first, second = res.to_map(), res.to_map()
+    assert first == second == {'headers': {'x': '1'}, 'statusCode': 200, 'body': {'Items': {'Item': [1]}}}
+    # 第一次直接交出body, 之后重新解析
+    assert first['body'] is res.body and second['body'] is not res.body
+    second['body']['Items']['Item'].append(2)
+    assert res.to_map()['body'] == {'Items': {'Item': [1]}}
+
+
+def test_empty_body():
+    assert RawResponse({'statusCode': 200, 'body': ''}).to_map() == {'headers': {}, 'statusCode': 200, 'body': {}}
+
+
+def test_raw_matches_sdk_response(cloud):
+    pool = ClientPool()
+    sdk = ECS('ak', 'sk', cloud.endpoint, pool=pool, protocol='http')
+    raw = ECS('ak', 'sk', cloud.endpoint, pool=pool, raw=True, protocol='http')
+    assert body(raw.get('cn-local', page_size=10)) == body(sdk.get('cn-local', page_size=10))
+    assert list(raw.iter_instances('cn-local')) == list(sdk.iter_instances('cn-local'))
+    sdk, raw = (VPC('ak', 'sk', cloud.endpoint, pool=pool, raw=r, protocol='http') for r in (False, True))
+    assert list(raw.iter_vpcs('cn-local')) == list(sdk.iter_vpcs('cn-local'))
+
+
+def test_coalesced_raw_callers_get_own_dicts(cloud):
+    cloud.latency = 0.1
+    flight = SingleFlight()
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), singleflight=flight, raw=True, protocol='http')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ecs.get('cn-local', page_size=10)))
+               for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert flight.saved > 0 and len(results) == 6
+    assert len({id(body) for body in results}) == 6
+    assert all(body == results[0] for body in results)
+
+
+def test_async_raw(cloud):
+    pytest.importorskip('aiohttp')
+    pool = ClientPool()
+
+    async def main():
+        raw = AsyncECS('ak', 'sk', cloud.endpoint, pool=pool, raw=True, protocol='http')
+        sdk = AsyncECS('ak', 'sk', cloud.endpoint, pool=pool, protocol='http')
+        return await raw.get('cn-local', page_size=10), await sdk.get('cn-local', page_size=10)
+
+    raw, sdk = asyncio.run(main())
+    assert body(raw) == body(sdk) and raw['TotalCount'] == 250
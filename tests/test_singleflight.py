@@ -0,0 +1,152 @@
+"""singleflight.py 的请求合并, 请求发往本地FakeCloud"""
+import asyncio
+import threading
+import time
+import pytest
+from ..client import ClientPool
+from ..ecs import ECS, AsyncECS
+from ..singleflight import SingleFlight
+
+KEY = (('ak', 'sk', 'ep'), 'DescribeInstances', '{}')
+
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'TotalCount': 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(KEY, fn))) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [{'TotalCount': 1}] * 10
+    assert flight.stats() == {'DescribeInstances': {'calls': 10, 'saved': 9}}
+    # 请求结束后即失效, 不缓存结果
+    flight.do(KEY, fn)
+    assert len(calls) == 2
+
+
+def test_error_is_shared():
+    flight = SingleFlight()
+    errors = []
+
+    def fn():
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            flight.do(KEY, fn)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 5 and flight.saved == 4
+
+
+def test_async_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'ok'
+
+    async def main():
+        return await asyncio.gather(*[flight.do_async(KEY, fn) for _ in range(5)])
+
+    assert asyncio.run(main()) == ['ok'] * 5
+    assert len(calls) == 1 and flight.saved == 4
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    flight = SingleFlight()
+    calls = []
+
+    def fn(name):
+        async def call():
+            calls.append(name)
+            await asyncio.sleep(0.1)
+            return name
+        return call
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async(KEY, fn('leader')))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.ensure_future(flight.do_async(KEY, fn('waiter%d' % i))) for i in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(main())
+    # 等待者之一重新发起请求, 另一个等待它的结果
+    assert calls[0] == 'leader' and len(calls) == 2
+    assert results == [calls[1]] * 2
+    assert flight.stats() == {'DescribeInstances': {'calls': 3, 'saved': 1}}
+
+
+def test_coalesces_describe_calls(cloud):
+    cloud.latency = 0.1
+    flight = SingleFlight()
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), singleflight=flight, protocol='http')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ecs.get('cn-local', page_size=10)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 8 and all(body['TotalCount'] == 250 for body in results)
+    assert cloud.actions['DescribeInstances'] < 8
+    assert cloud.actions['DescribeInstances'] + flight.saved == 8
+
+
+def test_different_accounts_are_not_coalesced(cloud):
+    cloud.latency = 0.1
+    flight = SingleFlight()
+    pool = ClientPool()
+    clients = [ECS(ak, 'sk', cloud.endpoint, pool=pool, singleflight=flight, protocol='http') for ak in ('ak-a', 'ak-b')]
+    threads = [threading.Thread(target=ecs.get, args=('cn-local',)) for ecs in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cloud.actions['DescribeInstances'] == 2 and flight.saved == 0
+
+
+def test_writes_are_not_coalesced(cloud):
+    cloud.latency = 0.1
+    flight = SingleFlight()
+    ecs = ECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), singleflight=flight, protocol='http')
+    threads = [threading.Thread(target=ecs.start, args=('cn-local', 'i-0000000000000001')) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cloud.actions['StartInstance'] == 3 and flight.stats() == {}
+
+
+def test_async_coalesces_against_fake_cloud(cloud):
+    pytest.importorskip('aiohttp')
+    cloud.latency = 0.1
+    flight = SingleFlight()
+
+    async def main():
+        ecs = AsyncECS('ak', 'sk', cloud.endpoint, pool=ClientPool(), singleflight=flight, protocol='http')
+        return await asyncio.gather(*[ecs.get('cn-local', page_size=10) for _ in range(6)])
+
+    assert all(body['TotalCount'] == 250 for body in asyncio.run(main()))
+    assert cloud.actions['DescribeInstances'] == 1 and flight.saved == 5
@@ -0,0 +1,107 @@
+"""slb.py 的分批滚动更新, 负载均衡由替身对象模拟, 不访问接口"""
+import json
+from ..slb import SLB
+
+
+class FakeLoadBalancer:
+    """记录后端服务器和调用顺序; 新加入的服务器在 healthy_after 次健康检查后变为normal
+    unhealthy: 始终异常的服务器id
+    """
+    def __init__(self, attached=(), healthy_after=0, unhealthy=(), fail=()):
+        self.servers = {i: '100' for i in attached}
+        self.polls = {}
+        self.healthy_after = healthy_after
+        self.unhealthy = set(unhealthy)
+        self.fail = set(fail)
+        self.calls = []
+
+    def slb(self):
+        slb = SLB.__new__(SLB)
+        slb.get_attribute = lambda region_id, slb_id: {
+            'BackendServers': {'BackendServer': [{'ServerId': i, 'Weight': w} for i, w in self.servers.items()]}}
+        slb.get_health_status = self.health
+        slb.set_backend_servers = lambda r, s, servers: self.change('set', servers)
+        slb.add_backend_servers = lambda r, s, servers: self.change('add', servers)
+        slb.remove_backend_servers = lambda r, s, servers: self.change('remove', servers)
+        return slb
+
+    def change(self, action, servers):
+        servers = json.loads(servers)
+        self.calls.append((action, sorted(s['ServerId'] for s in servers)))
+        if action in self.fail:
+            raise Exception('%s failed' % action)
+        for s in servers:
+            if action == 'remove':
+                self.servers.pop(s['ServerId'])
+            else:
+                self.servers[s['ServerId']] = s['Weight']
+                self.polls.setdefault(s['ServerId'], 0)
+        return {'RequestId': 'req-%s' % action}
+
+    def health(self, region_id, slb_id):
+        self.calls.append(('health', None))
+        entries = []
+        for server_id in self.servers:
+            polls = self.polls.get(server_id, self.healthy_after)
+            normal = server_id not in self.unhealthy and polls >= self.healthy_after
+            self.polls[server_id] = polls + 1
+            entries.append({'ServerId': server_id, 'ServerHealthStatus': 'normal' if normal else 'abnormal'})
+        return {'BackendServers': {'BackendServer': entries}}
+
+
+def test_rollout_replaces_servers_wave_by_wave():
+    lb = FakeLoadBalancer(attached=['i-old1', 'i-old2', 'i-old3'])
+    new = [('i-new%d' % n, 100) for n in range(1, 4)]
+    result = lb.slb().rollout('cn-local', 'lb-1', new, remove=['i-old1', 'i-old2', 'i-old3'], batch_size=2, interval=0)
+    assert result.ok
+    assert lb.calls == [('add', ['i-new1', 'i-new2']), ('health', None), ('remove', ['i-old1', 'i-old2']),
+                        ('add', ['i-new3']), ('health', None), ('remove', ['i-old3'])]
+    assert sorted(lb.servers) == ['i-new1', 'i-new2', 'i-new3']
+    assert sorted({item['Wave'] for item in result.results}) == [0, 1]
+
+
+def test_rollout_sets_weight_of_attached_servers():
+    lb = FakeLoadBalancer(attached=['i-1'])
+    result = lb.slb().rollout('cn-local', 'lb-1', [('i-1', 0), ('i-2', 50)], interval=0)
+    assert result.ok
+    assert lb.calls[:2] == [('set', ['i-1']), ('add', ['i-2'])]
+    assert lb.servers == {'i-1': '0', 'i-2': '50'}
+
+
+def test_rollout_waits_until_healthy():
+    lb = FakeLoadBalancer(healthy_after=2)
+    result = lb.slb().rollout('cn-local', 'lb-1', [('i-1', 100)], interval=0, max_interval=0)
+    assert result.ok
+    assert lb.calls.count(('health', None)) == 3
+
+
+def test_rollout_halts_on_unhealthy_wave():
+    lb = FakeLoadBalancer(attached=['i-old1', 'i-old2'], unhealthy=['i-new1'])
+    result = lb.slb().rollout('cn-local', 'lb-1', [('i-new1', 100), ('i-new2', 100)], remove=['i-old1', 'i-old2'],
+                              batch_size=1, timeout=0, interval=0)
+    assert not result.ok
+    actions = {(item['Id'], item['Action']): item for item in result.results}
+    assert actions[('i-new1', 'health')]['Code'] == 'Unhealthy'
+    # 第一批不健康, 旧服务器不移除, 之后的批次跳过
+    assert ('remove', ['i-old1']) not in lb.calls
+    assert actions[('i-new2', 'skip')]['Code'] == 'Skipped'
+    assert actions[('i-old2', 'skip')]['Code'] == 'Skipped'
+    assert sorted(lb.servers) == ['i-new1', 'i-old1', 'i-old2']
+
+
+def test_rollout_halts_on_failed_request():
+    lb = FakeLoadBalancer(fail=['add'])
+    result = lb.slb().rollout('cn-local', 'lb-1', [('i-1', 100), ('i-2', 100)], batch_size=1, interval=0)
+    assert [(item['Id'], item['Action'], item['Success']) for item in result.results] == [
+        ('i-1', 'add', False), ('i-2', 'skip', False)]
+
+
+def test_rollout_many_reports_each_load_balancer():
+    lbs = {'lb-1': FakeLoadBalancer(), 'lb-2': FakeLoadBalancer(fail=['add'])}
+    slb = lbs['lb-1'].slb()
+    # 按slb_id分发到各自的替身
+    for name in ('get_attribute', 'get_health_status', 'set_backend_servers', 'add_backend_servers', 'remove_backend_servers'):
+        setattr(slb, name, lambda region_id, slb_id, *args, name=name: getattr(lbs[slb_id].slb(), name)(region_id, slb_id, *args))
+    results = slb.rollout_many('cn-local', {'lb-1': [('i-1', 100)], 'lb-2': {'servers': [('i-2', 100)]}}, interval=0)
+    assert results['lb-1'].ok
+    assert not results['lb-2'].ok
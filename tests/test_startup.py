@@ -0,0 +1,20 @@
+"""延迟导入: 导入wrapper模块时不加载sdk, 首次调用时才加载"""
+import pytest
+from ..benchmarks.startup import CASES, PACKAGE, importtime
+
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_import_does_not_load_sdk(name):
+    module = '%s.%s' % (PACKAGE, name)
+    _, modules = importtime(module)
+    assert module in modules
+    loaded = {m.split('.')[0] for m in modules} & set(CASES[name])
+    assert not loaded
+
+
+def test_lazy_module_loads_on_first_use():
+    from ..utils import LazyModule
+    module = LazyModule('json')
+    assert 'loaded' not in repr(module)
+    assert module.dumps([1]) == '[1]'
+    assert 'loaded' in repr(module)
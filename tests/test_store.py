@@ -0,0 +1,38 @@
+"""store.py 的快照刷新, 多地域查询结果来自本地FakeCloud"""
+import pytest
+from ..client import ClientPool
+from ..ecs import ECS
+from ..region import Fleet
+from ..store import Store
+
+
+class Broken:
+    def iter_instances(self, region_id, **kwargs):
+        raise Exception('ServiceUnavailable')
+
+
+@pytest.fixture
+def fleet(cloud, monkeypatch):
+    pool = ClientPool()
+    clients = {'cn-local': ECS('ak', 'sk', cloud.endpoint, pool=pool, protocol='http'), 'cn-broken': Broken()}
+    monkeypatch.setattr(Fleet, 'client', lambda self, cls, region_id: clients[region_id])
+    return Fleet('ak', 'sk', ['cn-local', 'cn-broken'])
+
+
+def test_refresh_sweep(fleet):
+    store = Store()
+    result = fleet.fan_out(ECS, 'iter_instances')
+    assert store.refresh_sweep('ecs', result) == {'cn-local': {'added': 250, 'updated': 0, 'removed': 0, 'unchanged': 0}}
+    assert len(store.query('ecs', region='cn-local', vswitch_id='vsw-local')) == 250
+    assert store.refresh_sweep('ecs', fleet.fan_out(ECS, 'iter_instances'))['cn-local']['unchanged'] == 250
+
+
+def test_refresh_sweep_with_projected_records(fleet):
+    store = Store()
+    result = fleet.fan_out(ECS, 'iter_instances', fields=['InstanceId', 'Status', 'ZoneId'])
+    assert not isinstance(result.records[0], dict)
+    counts = store.refresh_sweep('ecs', result)
+    assert counts == {'cn-local': {'added': 250, 'updated': 0, 'removed': 0, 'unchanged': 0}}
+    running = store.query('ecs', region='cn-local', status='Running', zone_id='cn-local-a')
+    assert len(running) == 250
+    assert set(running[0]) == {'InstanceId', 'Status', 'ZoneId', 'RegionId'}
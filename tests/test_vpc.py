@@ -0,0 +1,103 @@
+"""vpc.py 的DNAT同步, 转发表由替身对象模拟, 不访问接口"""
+import time
+from ..vpc import NAT
+
+
+class FakeForwardTable:
+    def __init__(self, entries, fail=(), delay=0):
+        self.entries = {e['ForwardEntryId']: e for e in entries}
+        self.fail = set(fail)
+        self.delay = delay
+        self.calls = []
+        self.serial = 0
+
+    def nat(self):
+        nat = NAT.__new__(NAT)
+        nat.iter_dnat = self.iter_dnat
+        nat.add_dnat = self.add
+        nat.update_dnat = self.update
+        nat.remove_dnat = self.remove
+        return nat
+
+    def iter_dnat(self, region_id, forward_table_id):
+        time.sleep(self.delay)
+        return [dict(e) for e in self.entries.values()]
+
+    def add(self, region_id, forward_table_id, external_ip, external_port, internal_ip, internal_port, ip_protocol, **kwargs):
+        self.calls.append(('add', external_ip, external_port, internal_ip, internal_port, ip_protocol))
+        if 'add' in self.fail:
+            raise Exception('ForwardEntryConflict')
+        self.serial += 1
+        entry_id = 'fwd-new%d' % self.serial
+        self.entries[entry_id] = _entry(entry_id, external_ip, external_port, internal_ip, internal_port, ip_protocol)
+        return {'body': {'RequestId': 'req', 'ForwardEntryId': entry_id}}
+
+    def update(self, region_id, forward_table_id, forward_entry_id, internal_ip, internal_port):
+        self.calls.append(('modify', forward_entry_id, internal_ip, internal_port))
+        self.entries[forward_entry_id].update(InternalIp=internal_ip, InternalPort=internal_port)
+        return {'body': {'RequestId': 'req'}}
+
+    def remove(self, region_id, forward_table_id, forward_entry_id):
+        self.calls.append(('remove', forward_entry_id))
+        del self.entries[forward_entry_id]
+        return {'body': {'RequestId': 'req'}}
+
+
+def _entry(entry_id, external_ip, external_port, internal_ip, internal_port, protocol='tcp'):
+    return {'ForwardEntryId': entry_id, 'ExternalIp': external_ip, 'ExternalPort': str(external_port),
+            'InternalIp': internal_ip, 'InternalPort': str(internal_port), 'IpProtocol': protocol}
+
+
+def test_plan_dnat_skips_identical_entries():
+    table = FakeForwardTable([_entry('fwd-1', '1.1.1.1', 22, '10.0.0.1', 22),
+                              _entry('fwd-2', '1.1.1.1', 80, '10.0.0.1', 80),
+                              _entry('fwd-3', '1.1.1.1', 53, '10.0.0.3', 53, 'udp')])
+    plan = table.nat().plan_dnat('cn-local', 'ftb-1', [
+        ('1.1.1.1', 22, '10.0.0.1', 22),
+        {'external_ip': '1.1.1.1', 'external_port': 80, 'internal_ip': '10.0.0.2', 'internal_port': 8080},
+        ('1.1.1.1', 53, '10.0.0.3', 53, 'UDP'),
+        ('1.1.1.1', 443, '10.0.0.1', 443),
+    ])
+    assert plan['unchanged'] == 2
+    assert [old['ForwardEntryId'] for old, _ in plan['modify']] == ['fwd-2']
+    assert plan['add'] == [{'external_ip': '1.1.1.1', 'external_port': '443', 'internal_ip': '10.0.0.1',
+                            'internal_port': '443', 'ip_protocol': 'tcp'}]
+    assert plan['remove'] == []
+
+
+def test_plan_dnat_dict_entries_with_int_ports_match():
+    table = FakeForwardTable([_entry('fwd-1', '1.1.1.1', 22, '10.0.0.1', 2222)])
+    plan = table.nat().plan_dnat('cn-local', 'ftb-1', [
+        {'external_ip': '1.1.1.1', 'external_port': 22, 'internal_ip': '10.0.0.1', 'internal_port': 2222}])
+    assert plan == {'add': [], 'modify': [], 'remove': [], 'unchanged': 1}
+
+
+def test_sync_dnat_applies_plan_and_prunes():
+    table = FakeForwardTable([_entry('fwd-1', '1.1.1.1', 22, '10.0.0.1', 22),
+                              _entry('fwd-2', '1.1.1.1', 80, '10.0.0.1', 80)])
+    desired = [('1.1.1.1', 22, '10.0.0.9', 22), ('1.1.1.1', 443, '10.0.0.1', 443)]
+    plan = table.nat().sync_dnat('cn-local', 'ftb-1', desired, prune=True)
+    assert plan['result'].ok
+    assert sorted(table.calls) == [('add', '1.1.1.1', '443', '10.0.0.1', '443', 'tcp'),
+                                   ('modify', 'fwd-1', '10.0.0.9', '22'),
+                                   ('remove', 'fwd-2')]
+    ids = {item['Action']: item['ForwardEntryId'] for item in plan['result'].results}
+    assert ids == {'add': 'fwd-new1', 'modify': 'fwd-1', 'remove': 'fwd-2'}
+    # 再次同步没有变化
+    again = table.nat().sync_dnat('cn-local', 'ftb-1', desired, prune=True)
+    assert again['unchanged'] == 2 and again['result'].results == []
+
+
+def test_sync_dnat_dry_run_and_failures():
+    table = FakeForwardTable([], fail=['add'])
+    plan = table.nat().sync_dnat('cn-local', 'ftb-1', [('1.1.1.1', 22, '10.0.0.1', 22)], dry_run=True)
+    assert 'result' not in plan and table.calls == []
+    plan = table.nat().sync_dnat('cn-local', 'ftb-1', [('1.1.1.1', 22, '10.0.0.1', 22)])
+    failed = plan['result'].failed
+    assert [(item['Id'], item['Message']) for item in failed] == [('1.1.1.1:22/tcp', 'ForwardEntryConflict')]
+
+
+def test_sync_dnat_elapsed_includes_reading_forward_table():
+    table = FakeForwardTable([], delay=0.05)
+    plan = table.nat().sync_dnat('cn-local', 'ftb-1', [])
+    assert plan['result'].elapsed >= 0.05
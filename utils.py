@@ -0,0 +1,97 @@
+"""批量操作的通用工具"""
+import importlib
+import random
+import time
+
+__all__ = ('chunked', 'run_parallel', 'BulkResult', 'error_info', 'backoff', 'WaitTimeout', 'LazyModule')
+
+
+class LazyModule:
+    """延迟导入的模块, 首次访问属性时才import
+    sdk的client和models模块较大, 只在实际使用对应产品时加载
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return '<LazyModule %s%s>' % (self._name, '' if self._module is None else ' (loaded)')
+
+
+def chunked(seq, size):
+    """按size切分列表"""
+    seq = list(seq)
+    return [seq[i:i + size] for i in range(0, len(seq), size)]
+
+
+def run_parallel(fn, items, parallel=4):
+    """并发执行fn(item), 按完成顺序逐个返回 (item, 结果, 异常)"""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        futures = {executor.submit(fn, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def backoff(attempt, base=1.0, cap=30.0):
+    """第attempt次重试前的等待秒数, 指数退避并加入随机抖动"""
+    delay = min(cap, base * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+class WaitTimeout(TimeoutError):
+    """等待超时, pending为未达到目标状态的对象, statuses为最后一次查询到的状态"""
+    def __init__(self, message, pending, statuses):
+        super().__init__(message)
+        self.pending = pending
+        self.statuses = statuses
+
+
+def error_info(e) -> dict:
+    """从sdk异常(TeaException)中取出错误码, 信息和RequestId"""
+    data = getattr(e, 'data', None) or {}
+    return {
+        'Code': getattr(e, 'code', None) or type(e).__name__,
+        'Message': getattr(e, 'message', None) or str(e),
+        'RequestId': data.get('RequestId') if isinstance(data, dict) else None,
+    }
+
+
+class BulkResult:
+    """批量操作结果
+    results: 每个对象一条 {'Id', 'Success', 'Code', 'Message', 'RequestId', ...}
+    """
+    def __init__(self):
+        self.results = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def add(self, id, success, code=None, message=None, request_id=None, **extra):
+        self.results.append(dict(Id=id, Success=success, Code=code, Message=message, RequestId=request_id, **extra))
+
+    def done(self):
+        self.elapsed = time.monotonic() - self.started
+        return self
+
+    @property
+    def succeeded(self) -> list:
+        return [r['Id'] for r in self.results if r['Success']]
+
+    @property
+    def failed(self) -> list:
+        return [r for r in self.results if not r['Success']]
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __repr__(self):
+        return '<BulkResult ok=%d failed=%d elapsed=%.2fs>' % (len(self.succeeded), len(self.failed), self.elapsed)
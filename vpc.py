@@ -1,200 +1,433 @@
-"""
-专有网络等接口
-https://next.api.aliyun.com/api/Vpc/2016-04-28/CreateVpc?params={}
-流程 创建VPC时并创建交换机,交换机绑定VPC
-"""
-from alibabacloud_vpc20160428 import models
-from .client import VPCClient
-from pprint import pprint
-
-class VPC(VPCClient):
-    """vpc接口"""
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def create(self, region_id, name, **kwargs):
-        # cidr_block='192.168.0.0/16' 代表网段
-        # 默认3个网段,随机分配 10.0.0.0/8,172.16.0.0/12,192.168.0.0/16
-        with self as cli:
-            req = models.CreateVpcRequest(region_id=region_id, vpc_name=name, **kwargs)
-            res = cli.create_vpc(req)
-            return res.to_map() # vpc_id: res['VpcId']
-
-    def delete(self, region_id, vpcid):
-        with self as cli:
-            req = models.DeleteVpcRequest(region_id=region_id, vpc_id=vpcid,)
-            res = cli.delete_vpc(req)
-            return res.to_map()
-
-    def get(self, region_id, **kwargs):
-        with self as cli:
-            req = models.DescribeVpcsRequest(region_id=region_id, **kwargs)
-            res = cli.describe_vpcs(req)
-            return res.to_map()
-
-    def get_zone_id(self, region_id, **kwargs):
-        """查询指定地域中可用区的列表"""
-        with self as cli:
-            req = models.DescribeZonesRequest(region_id=region_id, **kwargs)
-            res = cli.describe_zones(req)
-            return res.to_map()
-
-
-class VSwitch(VPCClient):
-    """交换机接口"""
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def create(self, region_id, vpcid, zone_id, name, cidr_block, **kwargs):
-        """
-        vpcid: vpc_id
-        cidr_block: 地址段 10.1.0.0/24
-        """
-        with self as cli:
-            req = models.CreateVSwitchRequest(
-                region_id=region_id, 
-                zone_id=zone_id, 
-                cidr_block=cidr_block, 
-                vpc_id=vpcid, **kwargs)
-            res = cli.create_vswitch(req)
-            return res.to_map() # vs_id: res['VSwitchId']
-
-    def delete(self, region_id, vs_id):
-        with self as cli:
-            req = models.DeleteVSwitchRequest(region_id=region_id, v_switch_id=vs_id)
-            res = cli.delete_vswitch(req)
-            return res.to_map()
-
-    def get(self, region_id, vpcid, **kwargs):
-        with self as cli:
-            req = models.DescribeVSwitchesRequest(region_id=region_id, vpc_id=vpcid, **kwargs)
-            res = cli.describe_vswitches(req)
-            return res.to_map()['body']
-
-    def get_zone_id(self, region_id, **kwargs):
-        """查询指定地域中可用区的列表"""
-        with self as cli:
-            req = models.DescribeZonesRequest(region_id=region_id, **kwargs)
-            res = cli.describe_zones(req)
-            return res.to_map()
-
-
-class NAT(VPCClient):
-    """NAT网关接口"""
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def create(self, region_id, vpcid, v_switch_id, name, nat_type='Enhanced', instance_charge_type='PostPaid', **kwargs):
-        with self as cli:
-            req = models.CreateNatGatewayRequest(
-                region_id=region_id, 
-                vpc_id=vpcid, 
-                name=name,
-                v_switch_id=v_switch_id,
-                instance_charge_type=instance_charge_type,
-                nat_type=nat_type,
-                **kwargs)
-            res = cli.create_nat_gateway(req)
-            return res.to_map() # nat_id: res['NatGatewayId'], forward_table_id: res['ForwardTableIds']['ForwardTableId']
-
-    def delete(self, region_id, natid):
-        with self as cli:
-            req = models.DeleteNatGatewayRequest(region_id=region_id, nat_gateway_id=natid)
-            res = cli.delete_nat_gateway(req)
-            return res.to_map()
-
-    def get(self, region_id, **kwargs):
-        with self as cli:
-            req = models.DescribeNatGatewaysRequest(region_id=region_id, **kwargs)
-            res = cli.describe_nat_gateways(req)
-            return res.to_map()
-
-    def get_dnat(self, region_id, forward_table_id, **kwargs):
-        """查询已创建的DNAT条目,主要用于内网机器端口转发nat网关
-        forward_table_id(ForwardTableId): 转发表id
-        """
-        with self as cli:
-            req = models.DescribeForwardTableEntriesRequest(region_id=region_id, forward_table_id=forward_table_id, **kwargs)
-            res = cli.describe_forward_table_entries(req)
-            return res.to_map()
-
-    def add_dnat(self, region_id, forward_table_id, external_ip, external_port, internal_ip, internal_port, ip_protocol='tcp', **kwargs):
-        """在DNAT列表中添加DNAT条目
-        external_ip, external_port: 外部ip, 端口
-        internal_ip, internal_port: 内部ip, 端口
-        forward_entry_name:名称，跟服务器实例名绑定
-        """
-        with self as cli:
-            req = models.CreateForwardEntryRequest(
-                        region_id=region_id, 
-                        forward_table_id=forward_table_id, 
-                        external_ip=external_ip, 
-                        external_port=external_port, 
-                        internal_ip=internal_ip, 
-                        internal_port=internal_port,
-                        ip_protocol=ip_protocol,
-                        **kwargs)
-            res = cli.create_forward_entry(req)
-            return res.to_map()
-
-    def remove_dnat(self, region_id, forward_table_id, forward_entry_id):
-        """删除指定的DNAT条目
-        """
-        with self as cli:
-            req = models.DeleteForwardEntryRequest(region_id=region_id, forward_table_id=forward_table_id, forward_entry_id=forward_entry_id)
-            res = cli.delete_forward_entry(req)
-            return res.to_map()
-
-    def update_dnat(self, region_id, forward_table_id, **kwargs):
-        with self as cli:
-            req = models.ModifyForwardEntryRequest(region_id=region_id, forward_table_id=forward_table_id, **kwargs)
-            res = cli.modify_forward_entry(req)
-            return res.to_map()
-
-
-class EIP(VPCClient):
-    """EIP弹性ip接口"""
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def create(self, region_id, type='PayByTraffic', bandwidth='200', **kwargs):
-        bandwidth = str(bandwidth)
-        with self as cli:
-            req = models.AllocateEipAddressRequest(region_id=region_id, bandwidth=bandwidth, internet_charge_type=type, **kwargs)
-            res = cli.allocate_eip_address(req)
-            return res.to_map()
-
-    def delete(self, region_id, eip_id):
-        with self as cli:
-            req = models.ReleaseEipAddressRequest(region_id=region_id, allocation_id=eip_id)
-            res = cli.release_eip_address(req)
-            return res.to_map()
-
-    def update(self, region_id, eip_id, bandwidth):
-        bandwidth = str(bandwidth)
-        with self as cli:
-            req = models.ModifyEipAddressAttributeRequest(region_id=region_id, allocation_id=eip_id, bandwidth=bandwidth)
-            res = cli.modify_eip_address_attribute(req)
-            return res.to_map() 
-
-    def get(self, region_id, **kwargs):
-        with self as cli:
-            req = models.DescribeEipAddressesRequest(region_id=region_id, **kwargs)
-            res = cli.describe_eip_addresses(req)
-            return res.to_map()
-
-    def associate(self, region_id, eip_id, in_id, type='Nat'):
-        """绑定到实例上,如ECS,NAT"""
-        with self as cli:
-            req = models.AssociateEipAddressRequest(region_id=region_id, allocation_id=eip_id, instance_id=in_id, instance_type=type)
-            res = cli.associate_eip_address(req)
-            return res.to_map()
-
-    def unassociate(self, region_id, eip_id, in_id, type='Nat'):
-        """解绑,如ECS
-        暂时不支持NAT
-        """
-        with self as cli:
-            req = models.UnassociateEipAddressRequest(region_id=region_id, allocation_id=eip_id, instance_id=in_id, instance_type=type)
-            res = cli.unassociate_eip_address(req)
-            return res.to_map()
+"""
+专有网络等接口
+https://next.api.aliyun.com/api/Vpc/2016-04-28/CreateVpc?params={}
+流程 创建VPC时并创建交换机,交换机绑定VPC
+"""
+from .utils import LazyModule, run_parallel, error_info, BulkResult
+from .client import VPCClient, AsyncClient
+from .paginate import paginate, apaginate
+from .cache import cached, invalidates
+
+models = LazyModule('alibabacloud_vpc20160428.models')
+
+class VPC(VPCClient):
+    """vpc接口"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def create(self, region_id, name, **kwargs):
+        # cidr_block='192.168.0.0/16' 代表网段
+        # 默认3个网段,随机分配 10.0.0.0/8,172.16.0.0/12,192.168.0.0/16
+        with self as cli:
+            req = models.CreateVpcRequest(region_id=region_id, vpc_name=name, **kwargs)
+            res = cli.create_vpc(req)
+            return res.to_map() # vpc_id: res['VpcId']
+
+    def delete(self, region_id, vpcid):
+        with self as cli:
+            req = models.DeleteVpcRequest(region_id=region_id, vpc_id=vpcid,)
+            res = cli.delete_vpc(req)
+            return res.to_map()
+
+    def get(self, region_id, **kwargs):
+        with self as cli:
+            req = models.DescribeVpcsRequest(region_id=region_id, **kwargs)
+            res = cli.describe_vpcs(req)
+            return res.to_map()
+
+    def iter_vpcs(self, region_id, page_size=50, fields=None, **kwargs):
+        """逐条返回全部vpc, 自动翻页"""
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)['body']
+        return paginate(fetch, 'Vpcs.Vpc', page_size, fields=fields)
+
+    @cached('vpc_zones', ttl=86400)
+    def get_zone_id(self, region_id, **kwargs):
+        """查询指定地域中可用区的列表"""
+        with self as cli:
+            req = models.DescribeZonesRequest(region_id=region_id, **kwargs)
+            res = cli.describe_zones(req)
+            return res.to_map()
+
+
+class VSwitch(VPCClient):
+    """交换机接口"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    @invalidates(('vswitches', 'region_id'))
+    def create(self, region_id, vpcid, zone_id, name, cidr_block, **kwargs):
+        """
+        vpcid: vpc_id
+        cidr_block: 地址段 10.1.0.0/24
+        """
+        with self as cli:
+            req = models.CreateVSwitchRequest(
+                region_id=region_id, 
+                zone_id=zone_id, 
+                cidr_block=cidr_block, 
+                vpc_id=vpcid, **kwargs)
+            res = cli.create_vswitch(req)
+            return res.to_map() # vs_id: res['VSwitchId']
+
+    @invalidates(('vswitches', 'region_id'))
+    def delete(self, region_id, vs_id):
+        with self as cli:
+            req = models.DeleteVSwitchRequest(region_id=region_id, v_switch_id=vs_id)
+            res = cli.delete_vswitch(req)
+            return res.to_map()
+
+    @cached('vswitches', ttl=60)
+    def get(self, region_id, vpcid, **kwargs):
+        with self as cli:
+            req = models.DescribeVSwitchesRequest(region_id=region_id, vpc_id=vpcid, **kwargs)
+            res = cli.describe_vswitches(req)
+            return res.to_map()['body']
+
+    def iter_vswitches(self, region_id, vpcid=None, page_size=50, fields=None, **kwargs):
+        """逐条返回交换机, 自动翻页, vpcid为空时返回地域下全部交换机
+        不经过get的缓存, 总是读取最新状态
+        """
+        def fetch(n):
+            with self as cli:
+                req = models.DescribeVSwitchesRequest(region_id=region_id, vpc_id=vpcid, page_size=page_size, page_number=n, **kwargs)
+                return cli.describe_vswitches(req).to_map()['body']
+        return paginate(fetch, 'VSwitches.VSwitch', page_size, fields=fields)
+
+    @cached('vpc_zones', ttl=86400)
+    def get_zone_id(self, region_id, **kwargs):
+        """查询指定地域中可用区的列表"""
+        with self as cli:
+            req = models.DescribeZonesRequest(region_id=region_id, **kwargs)
+            res = cli.describe_zones(req)
+            return res.to_map()
+
+
+class NAT(VPCClient):
+    """NAT网关接口"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def create(self, region_id, vpcid, v_switch_id, name, nat_type='Enhanced', instance_charge_type='PostPaid', **kwargs):
+        with self as cli:
+            req = models.CreateNatGatewayRequest(
+                region_id=region_id, 
+                vpc_id=vpcid, 
+                name=name,
+                v_switch_id=v_switch_id,
+                instance_charge_type=instance_charge_type,
+                nat_type=nat_type,
+                **kwargs)
+            res = cli.create_nat_gateway(req)
+            return res.to_map() # nat_id: res['NatGatewayId'], forward_table_id: res['ForwardTableIds']['ForwardTableId']
+
+    def delete(self, region_id, natid):
+        with self as cli:
+            req = models.DeleteNatGatewayRequest(region_id=region_id, nat_gateway_id=natid)
+            res = cli.delete_nat_gateway(req)
+            return res.to_map()
+
+    def get(self, region_id, **kwargs):
+        with self as cli:
+            req = models.DescribeNatGatewaysRequest(region_id=region_id, **kwargs)
+            res = cli.describe_nat_gateways(req)
+            return res.to_map()
+
+    def iter_nat_gateways(self, region_id, page_size=50, fields=None, **kwargs):
+        """逐条返回NAT网关, 自动翻页"""
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)['body']
+        return paginate(fetch, 'NatGateways.NatGateway', page_size, fields=fields)
+
+    def get_dnat(self, region_id, forward_table_id, **kwargs):
+        """查询已创建的DNAT条目,主要用于内网机器端口转发nat网关
+        forward_table_id(ForwardTableId): 转发表id
+        """
+        with self as cli:
+            req = models.DescribeForwardTableEntriesRequest(region_id=region_id, forward_table_id=forward_table_id, **kwargs)
+            res = cli.describe_forward_table_entries(req)
+            return res.to_map()
+
+    def add_dnat(self, region_id, forward_table_id, external_ip, external_port, internal_ip, internal_port, ip_protocol='tcp', **kwargs):
+        """在DNAT列表中添加DNAT条目
+        external_ip, external_port: 外部ip, 端口
+        internal_ip, internal_port: 内部ip, 端口
+        forward_entry_name:名称，跟服务器实例名绑定
+        """
+        with self as cli:
+            req = models.CreateForwardEntryRequest(
+                        region_id=region_id, 
+                        forward_table_id=forward_table_id, 
+                        external_ip=external_ip, 
+                        external_port=external_port, 
+                        internal_ip=internal_ip, 
+                        internal_port=internal_port,
+                        ip_protocol=ip_protocol,
+                        **kwargs)
+            res = cli.create_forward_entry(req)
+            return res.to_map()
+
+    def remove_dnat(self, region_id, forward_table_id, forward_entry_id):
+        """删除指定的DNAT条目
+        """
+        with self as cli:
+            req = models.DeleteForwardEntryRequest(region_id=region_id, forward_table_id=forward_table_id, forward_entry_id=forward_entry_id)
+            res = cli.delete_forward_entry(req)
+            return res.to_map()
+
+    def update_dnat(self, region_id, forward_table_id, **kwargs):
+        with self as cli:
+            req = models.ModifyForwardEntryRequest(region_id=region_id, forward_table_id=forward_table_id, **kwargs)
+            res = cli.modify_forward_entry(req)
+            return res.to_map()
+
+    def iter_dnat(self, region_id, forward_table_id, page_size=50, fields=None, **kwargs):
+        """逐条返回转发表中的全部DNAT条目, 自动翻页"""
+        fetch = lambda n: self.get_dnat(region_id, forward_table_id, page_size=page_size, page_number=n, **kwargs)['body']
+        return paginate(fetch, 'ForwardTableEntries.ForwardTableEntry', page_size, fields=fields)
+
+    @staticmethod
+    def dnat_key(external_ip, external_port, ip_protocol='tcp'):
+        """DNAT条目的比较键 (外部ip, 外部端口, 协议)"""
+        return external_ip, str(external_port), ip_protocol.lower()
+
+    def plan_dnat(self, region_id, forward_table_id, entries, prune=False) -> dict:
+        """对比转发表的当前条目与期望条目, 返回需要执行的最少操作
+        entries: [(外部ip, 外部端口, 内部ip, 内部端口[, 协议])] 或
+                 [{'external_ip', 'external_port', 'internal_ip', 'internal_port', 'ip_protocol', ...}], 协议默认tcp
+        prune: 是否删除期望条目之外的条目
+        返回 {'add': [期望条目], 'modify': [(当前条目, 期望条目)], 'remove': [当前条目], 'unchanged': n}
+        """
+        current = {}
+        for e in self.iter_dnat(region_id, forward_table_id):
+            current[self.dnat_key(e['ExternalIp'], e['ExternalPort'], e['IpProtocol'])] = e
+        desired = {}
+        for entry in entries:
+            entry = _dnat_entry(entry)
+            desired[self.dnat_key(entry['external_ip'], entry['external_port'], entry['ip_protocol'])] = entry
+        plan = {'add': [], 'modify': [], 'remove': [], 'unchanged': 0}
+        for key, entry in desired.items():
+            old = current.get(key)
+            if old is None:
+                plan['add'].append(entry)
+            elif (old['InternalIp'], str(old['InternalPort'])) != (entry['internal_ip'], entry['internal_port']):
+                plan['modify'].append((old, entry))
+            else:
+                plan['unchanged'] += 1
+        if prune:
+            plan['remove'] = [e for key, e in current.items() if key not in desired]
+        return plan
+
+    def sync_dnat(self, region_id, forward_table_id, entries, prune=False, dry_run=False, parallel=4) -> dict:
+        """将转发表的DNAT条目同步为entries
+        分页读取一次整个转发表, 按(外部ip, 外部端口, 协议)比较, 已存在且相同的条目跳过,
+        只新增, 修改内部地址或(prune=True时)删除有差异的条目, 并发执行
+        dry_run=True 时只返回plan, 不做修改
+        返回plan, 执行后增加 'result': BulkResult, 每个条目一条, 附带 Action 和 ForwardEntryId,
+        elapsed 包含读取转发表的时间
+        """
+        result = BulkResult()
+        plan = self.plan_dnat(region_id, forward_table_id, entries, prune)
+        if dry_run:
+            return plan
+        calls = [('add', e) for e in plan['add']] + [('modify', e) for e in plan['modify']] + [('remove', e) for e in plan['remove']]
+
+        def send(call):
+            action, entry = call
+            if action == 'add':
+                kwargs = dict(entry)
+                return self.add_dnat(region_id, forward_table_id, kwargs.pop('external_ip'), kwargs.pop('external_port'),
+                                     kwargs.pop('internal_ip'), kwargs.pop('internal_port'), kwargs.pop('ip_protocol'), **kwargs)['body']
+            if action == 'modify':
+                old, new = entry
+                return self.update_dnat(region_id, forward_table_id, forward_entry_id=old['ForwardEntryId'],
+                                        internal_ip=new['internal_ip'], internal_port=new['internal_port'])['body']
+            return self.remove_dnat(region_id, forward_table_id, entry['ForwardEntryId'])['body']
+
+        for (action, entry), body, e in run_parallel(send, calls, parallel):
+            if action == 'add':
+                key, entry_id = self.dnat_key(entry['external_ip'], entry['external_port'], entry['ip_protocol']), None
+            else:
+                old = entry[0] if action == 'modify' else entry
+                key, entry_id = self.dnat_key(old['ExternalIp'], old['ExternalPort'], old['IpProtocol']), old['ForwardEntryId']
+            key = '%s:%s/%s' % key
+            if e is None:
+                result.add(key, True, request_id=body.get('RequestId'), Action=action,
+                           ForwardEntryId=entry_id or body.get('ForwardEntryId'))
+            else:
+                info = error_info(e)
+                result.add(key, False, info['Code'], info['Message'], info['RequestId'], Action=action, ForwardEntryId=entry_id)
+        plan['result'] = result.done()
+        return plan
+
+
+def _dnat_entry(entry):
+    # 元组或dict转为add_dnat的参数, 端口统一为str, 与转发表中的条目一致
+    if isinstance(entry, dict):
+        entry = dict({'ip_protocol': 'tcp'}, **entry)
+    else:
+        external_ip, external_port, internal_ip, internal_port, *proto = entry
+        entry = {'external_ip': external_ip, 'external_port': external_port, 'internal_ip': internal_ip,
+                 'internal_port': internal_port, 'ip_protocol': proto[0] if proto else 'tcp'}
+    entry['external_port'] = str(entry['external_port'])
+    entry['internal_port'] = str(entry['internal_port'])
+    return entry
+
+
+class EIP(VPCClient):
+    """EIP弹性ip接口"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def create(self, region_id, type='PayByTraffic', bandwidth='200', **kwargs):
+        bandwidth = str(bandwidth)
+        with self as cli:
+            req = models.AllocateEipAddressRequest(region_id=region_id, bandwidth=bandwidth, internet_charge_type=type, **kwargs)
+            res = cli.allocate_eip_address(req)
+            return res.to_map()
+
+    def delete(self, region_id, eip_id):
+        with self as cli:
+            req = models.ReleaseEipAddressRequest(region_id=region_id, allocation_id=eip_id)
+            res = cli.release_eip_address(req)
+            return res.to_map()
+
+    def update(self, region_id, eip_id, bandwidth):
+        bandwidth = str(bandwidth)
+        with self as cli:
+            req = models.ModifyEipAddressAttributeRequest(region_id=region_id, allocation_id=eip_id, bandwidth=bandwidth)
+            res = cli.modify_eip_address_attribute(req)
+            return res.to_map() 
+
+    def get(self, region_id, **kwargs):
+        with self as cli:
+            req = models.DescribeEipAddressesRequest(region_id=region_id, **kwargs)
+            res = cli.describe_eip_addresses(req)
+            return res.to_map()
+
+    def iter_eips(self, region_id, page_size=100, fields=None, **kwargs):
+        """逐条返回全部eip, 自动翻页"""
+        fetch = lambda n: self.get(region_id, page_size=page_size, page_number=n, **kwargs)['body']
+        return paginate(fetch, 'EipAddresses.EipAddress', page_size, fields=fields)
+
+    def associate(self, region_id, eip_id, in_id, type='Nat'):
+        """绑定到实例上,如ECS,NAT"""
+        with self as cli:
+            req = models.AssociateEipAddressRequest(region_id=region_id, allocation_id=eip_id, instance_id=in_id, instance_type=type)
+            res = cli.associate_eip_address(req)
+            return res.to_map()
+
+    def unassociate(self, region_id, eip_id, in_id, type='Nat'):
+        """解绑,如ECS
+        暂时不支持NAT
+        """
+        with self as cli:
+            req = models.UnassociateEipAddressRequest(region_id=region_id, allocation_id=eip_id, instance_id=in_id, instance_type=type)
+            res = cli.unassociate_eip_address(req)
+            return res.to_map()
+
+
+class AsyncVPC(AsyncClient, VPCClient):
+    """VPC的异步版本, 方法与VPC一致, 需await调用"""
+    async def create(self, region_id, name, **kwargs):
+        req = models.CreateVpcRequest(region_id=region_id, vpc_name=name, **kwargs)
+        return await self._call('create_vpc', req)
+
+    async def delete(self, region_id, vpcid):
+        req = models.DeleteVpcRequest(region_id=region_id, vpc_id=vpcid)
+        return await self._call('delete_vpc', req)
+
+    async def get(self, region_id, **kwargs):
+        req = models.DescribeVpcsRequest(region_id=region_id, **kwargs)
+        return await self._call('describe_vpcs', req)
+
+    def iter_vpcs(self, region_id, page_size=50, fields=None, **kwargs):
+        async def fetch(n):
+            return (await self.get(region_id, page_size=page_size, page_number=n, **kwargs))['body']
+        return apaginate(fetch, 'Vpcs.Vpc', page_size, fields=fields)
+
+    @cached('vpc_zones', ttl=86400)
+    async def get_zone_id(self, region_id, **kwargs):
+        req = models.DescribeZonesRequest(region_id=region_id, **kwargs)
+        return await self._call('describe_zones', req)
+
+
+class AsyncNAT(AsyncClient, VPCClient):
+    """NAT的异步版本"""
+    async def create(self, region_id, vpcid, v_switch_id, name, nat_type='Enhanced', instance_charge_type='PostPaid', **kwargs):
+        req = models.CreateNatGatewayRequest(
+            region_id=region_id,
+            vpc_id=vpcid,
+            name=name,
+            v_switch_id=v_switch_id,
+            instance_charge_type=instance_charge_type,
+            nat_type=nat_type,
+            **kwargs)
+        return await self._call('create_nat_gateway', req)
+
+    async def delete(self, region_id, natid):
+        req = models.DeleteNatGatewayRequest(region_id=region_id, nat_gateway_id=natid)
+        return await self._call('delete_nat_gateway', req)
+
+    async def get(self, region_id, **kwargs):
+        req = models.DescribeNatGatewaysRequest(region_id=region_id, **kwargs)
+        return await self._call('describe_nat_gateways', req)
+
+    async def get_dnat(self, region_id, forward_table_id, **kwargs):
+        req = models.DescribeForwardTableEntriesRequest(region_id=region_id, forward_table_id=forward_table_id, **kwargs)
+        return await self._call('describe_forward_table_entries', req)
+
+    async def add_dnat(self, region_id, forward_table_id, external_ip, external_port, internal_ip, internal_port, ip_protocol='tcp', **kwargs):
+        req = models.CreateForwardEntryRequest(
+                    region_id=region_id,
+                    forward_table_id=forward_table_id,
+                    external_ip=external_ip,
+                    external_port=external_port,
+                    internal_ip=internal_ip,
+                    internal_port=internal_port,
+                    ip_protocol=ip_protocol,
+                    **kwargs)
+        return await self._call('create_forward_entry', req)
+
+    async def remove_dnat(self, region_id, forward_table_id, forward_entry_id):
+        req = models.DeleteForwardEntryRequest(region_id=region_id, forward_table_id=forward_table_id, forward_entry_id=forward_entry_id)
+        return await self._call('delete_forward_entry', req)
+
+    async def update_dnat(self, region_id, forward_table_id, **kwargs):
+        req = models.ModifyForwardEntryRequest(region_id=region_id, forward_table_id=forward_table_id, **kwargs)
+        return await self._call('modify_forward_entry', req)
+
+    def iter_dnat(self, region_id, forward_table_id, page_size=50, fields=None, **kwargs):
+        async def fetch(n):
+            return (await self.get_dnat(region_id, forward_table_id, page_size=page_size, page_number=n, **kwargs))['body']
+        return apaginate(fetch, 'ForwardTableEntries.ForwardTableEntry', page_size, fields=fields)
+
+
+class AsyncEIP(AsyncClient, VPCClient):
+    """EIP的异步版本"""
+    async def create(self, region_id, type='PayByTraffic', bandwidth='200', **kwargs):
+        req = models.AllocateEipAddressRequest(region_id=region_id, bandwidth=str(bandwidth), internet_charge_type=type, **kwargs)
+        return await self._call('allocate_eip_address', req)
+
+    async def delete(self, region_id, eip_id):
+        req = models.ReleaseEipAddressRequest(region_id=region_id, allocation_id=eip_id)
+        return await self._call('release_eip_address', req)
+
+    async def update(self, region_id, eip_id, bandwidth):
+        req = models.ModifyEipAddressAttributeRequest(region_id=region_id, allocation_id=eip_id, bandwidth=str(bandwidth))
+        return await self._call('modify_eip_address_attribute', req)
+
+    async def get(self, region_id, **kwargs):
+        req = models.DescribeEipAddressesRequest(region_id=region_id, **kwargs)
+        return await self._call('describe_eip_addresses', req)
+
+    def iter_eips(self, region_id, page_size=100, fields=None, **kwargs):
+        async def fetch(n):
+            return (await self.get(region_id, page_size=page_size, page_number=n, **kwargs))['body']
+        return apaginate(fetch, 'EipAddresses.EipAddress', page_size, fields=fields)
+
+    async def associate(self, region_id, eip_id, in_id, type='Nat'):
+        req = models.AssociateEipAddressRequest(region_id=region_id, allocation_id=eip_id, instance_id=in_id, instance_type=type)
+        return await self._call('associate_eip_address', req)
+
+    async def unassociate(self, region_id, eip_id, in_id, type='Nat'):
+        req = models.UnassociateEipAddressRequest(region_id=region_id, allocation_id=eip_id, instance_id=in_id, instance_type=type)
+        return await self._call('unassociate_eip_address', req)